@@ -0,0 +1,97 @@
+"""Compares the timer queues provided by :mod:`timerutil.scheduling`.
+
+For each number of outstanding timers, every queue is loaded with timers whose deadlines are spread uniformly
+over a minute. Most of them are then cancelled (as happens to the majority of real-world timeouts),
+and the clock is advanced until the rest have fired. The throughput of each phase is reported,
+along with the peak memory allocated while the queue was full.
+
+Usage:
+    .. code-block:: shell
+
+        python benchmarks/timer_queues.py --timers 1000 100000 1000000 --cancel-fraction .9
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from timerutil.scheduling import HeapTimerQueue, TimingWheel
+
+HORIZON = 60.0
+
+
+def _noop():
+    pass
+
+
+def run(name, queue, count, cancel_fraction, rng):
+    deadlines = [rng.uniform(0, HORIZON) for _ in range(count)]
+    cancel_order = list(range(count))
+    rng.shuffle(cancel_order)
+    cancel_order = cancel_order[:int(count * cancel_fraction)]
+
+    gc.collect()
+    tracemalloc.start()
+    push = queue.push
+
+    start = time.perf_counter()
+    handles = [push(deadline, _noop) for deadline in deadlines]
+    arm_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    cancel = queue.cancel
+    start = time.perf_counter()
+    for index in cancel_order:
+        cancel(handles[index])
+    cancel_time = time.perf_counter() - start
+
+    remaining = len(queue)
+    fired = 0
+    start = time.perf_counter()
+    now = 0.0
+    while now <= HORIZON + 1:
+        now += .01
+        fired += len(queue.pop_expired(now))
+    fire_time = time.perf_counter() - start
+    assert fired == remaining, (fired, remaining)
+
+    def rate(operations, seconds):
+        return '{:>12,.0f}/s'.format(operations / seconds) if seconds else '{:>14}'.format('-')
+
+    print('{:<14} {:>10,} {} {} {} {:>10.1f} MiB'.format(
+        name,
+        count,
+        rate(count, arm_time),
+        rate(len(cancel_order), cancel_time),
+        rate(fired, fire_time),
+        peak / 2.0 ** 20
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--timers', type=int, nargs='+', default=[1000, 100000, 1000000],
+                        help='numbers of outstanding timers to benchmark')
+    parser.add_argument('--cancel-fraction', type=float, default=.9,
+                        help='fraction of timers cancelled before their deadlines')
+    parser.add_argument('--resolution', type=float, default=.001, help='timing wheel tick resolution, in seconds')
+    parser.add_argument('--wheel-size', type=int, default=256, help='number of slots in each timing wheel')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('{:<14} {:>10} {:>14} {:>14} {:>14} {:>14}'.format('queue', 'timers', 'arm', 'cancel', 'fire', 'peak memory'))
+    for count in args.timers:
+        run('heap', HeapTimerQueue(), count, args.cancel_fraction, random.Random(args.seed))
+        run(
+            'timing wheel',
+            TimingWheel(resolution=args.resolution, wheel_size=args.wheel_size, start=0),
+            count,
+            args.cancel_fraction,
+            random.Random(args.seed)
+        )
+
+
+if __name__ == '__main__':
+    main()
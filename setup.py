@@ -1,5 +1,4 @@
 from setuptools import setup
-import sys
 
 
 def get_long_description():
@@ -14,10 +13,6 @@ def get_long_description():
         return open('README.md').read()
 
 
-test_requirements = []
-if sys.version_info < (3, 3):
-    test_requirements = ['mock']
-
 setup(
     name='timerutil',
     version='1.0.0',
@@ -28,19 +23,20 @@ setup(
     long_description=get_long_description(),
     packages=['timerutil'],
     zip_safe=True,
-    tests_require=test_requirements,
+    python_requires='>=3.7',
     test_suite='tests',
     classifiers=[
         'Intended Audience :: Developers',
         'Operating System :: POSIX :: Linux'
         'Programming Language :: Python',
-        'Programming Language :: Python :: 2',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3 :: Only',
         'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12',
         'Topic :: Software Development :: Libraries :: Python Modules',
         'Topic :: Utilities',
     ]
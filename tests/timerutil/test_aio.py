@@ -0,0 +1,339 @@
+import asyncio
+import time
+import unittest
+
+from timerutil import aio
+from timerutil.limits import RateLimitExceeded
+from timerutil.scheduling import SleepScheduler
+from timerutil import tracing
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class AsyncWaiterTestCase(unittest.TestCase):
+    def test_context_manager_is_self(self):
+        waiter = aio.AsyncWaiter(0)
+
+        async def main():
+            async with waiter as waiter_ctx:
+                return waiter_ctx
+
+        self.assertIs(run(main()), waiter)
+
+    def test_waits_for_minimum_time(self):
+        async def main():
+            start = aio.get_time()
+            async with aio.AsyncWaiter(.2):
+                pass
+            return aio.get_time() - start
+
+        self.assertGreaterEqual(run(main()), .2)
+
+    def test_does_not_block_event_loop(self):
+        @aio.AsyncWaiter(.2)
+        async def padded():
+            pass
+
+        async def main():
+            start = aio.get_time()
+            await asyncio.gather(*[padded() for _ in range(10)])
+            return aio.get_time() - start
+
+        self.assertLess(run(main()), 1)
+
+    def test_decorated_function_returns_result(self):
+        @aio.AsyncWaiter(0)
+        async def func(value):
+            return value
+
+        self.assertEqual(run(func('result')), 'result')
+
+
+class AsyncObservableWaiterTestCase(unittest.TestCase):
+    def test_records_last_runtime_and_last_elapsed(self):
+        waiter = aio.AsyncObservableWaiter(.2)
+
+        async def main():
+            async with waiter:
+                await asyncio.sleep(.1)
+
+        run(main())
+
+        self.assertAlmostEqual(waiter.last_runtime, .1, delta=.05)
+        self.assertGreaterEqual(waiter.last_elapsed, .2)
+        self.assertLess(waiter.last_elapsed, .3)
+
+
+class AsyncStopWatchTestCase(unittest.TestCase):
+    def test_does_not_wait(self):
+        timer = aio.AsyncStopWatch()
+
+        @timer
+        async def func():
+            await asyncio.sleep(.1)
+
+        run(func())
+
+        self.assertEqual(timer.minimum_time, 0)
+        self.assertAlmostEqual(timer.last_runtime, .1, delta=.05)
+        self.assertAlmostEqual(timer.last_elapsed, timer.last_runtime, delta=.01)
+
+
+class AsyncTimeoutManagerTestCase(unittest.TestCase):
+    def test_raises_TimeoutError(self):
+        async def main():
+            async with aio.AsyncTimeoutManager(.1, timeout_message='A Message'):
+                await asyncio.sleep(1)
+
+        start = time.time()
+        with self.assertRaises(aio.TimeoutError) as ctx:
+            run(main())
+
+        self.assertEqual(str(ctx.exception), 'A Message')
+        self.assertLess(time.time() - start, .5)
+
+    def test_suppresses_TimeoutError(self):
+        manager = aio.AsyncTimeoutManager(.1, suppress_timeout_errors=True)
+
+        @manager
+        async def func():
+            await asyncio.sleep(1)
+            return 'finished'
+
+        self.assertIsNone(run(func()))
+        self.assertEqual(manager.last_remaining, 0)
+
+    def test_records_last_remaining(self):
+        manager = aio.AsyncTimeoutManager(10)
+
+        async def main():
+            async with manager:
+                await asyncio.sleep(.1)
+
+        run(main())
+
+        self.assertGreater(manager.last_remaining, 9)
+        self.assertLess(manager.last_remaining, 9.95)
+
+    def test_does_not_suppress_other_cancellations(self):
+        async def main():
+            async with aio.AsyncTimeoutManager(10, suppress_timeout_errors=True):
+                task = asyncio.current_task()
+                asyncio.get_running_loop().call_later(.05, task.cancel)
+                await asyncio.sleep(1)
+
+        with self.assertRaises(asyncio.CancelledError):
+            run(main())
+
+    @unittest.skipUnless(hasattr(asyncio.Task, 'uncancel'), 'Task.uncancel was added in Python 3.11')
+    def test_uncancels_when_block_replaces_cancellation(self):
+        async def main():
+            try:
+                async with aio.AsyncTimeoutManager(.05):
+                    try:
+                        await asyncio.sleep(1)
+                    except asyncio.CancelledError:
+                        raise RuntimeError('cleanup failed')
+            except RuntimeError:
+                pass
+            return asyncio.current_task().cancelling()
+
+        self.assertEqual(run(main()), 0)
+
+    def test_outer_timeout_is_not_suppressed_by_inner_manager(self):
+        outer = aio.AsyncTimeoutManager(.1, suppress_timeout_errors=True)
+        inner = aio.AsyncTimeoutManager(10, suppress_timeout_errors=True)
+
+        async def main():
+            async with outer:
+                async with inner:
+                    await asyncio.sleep(1)
+                return 'not suppressed by outer'
+
+        self.assertIsNone(run(main()))
+        self.assertEqual(outer.last_remaining, 0)
+        self.assertGreater(inner.last_remaining, 0)
+
+    def test_concurrent_tasks_share_decorator(self):
+        manager = aio.AsyncTimeoutManager(.2, suppress_timeout_errors=True)
+
+        @manager
+        async def func(seconds):
+            await asyncio.sleep(seconds)
+            return seconds
+
+        async def main():
+            return await asyncio.gather(*[func(seconds) for seconds in (0, .1, 1, 1)])
+
+        self.assertEqual(run(main()), [0, .1, None, None])
+
+
+class AsyncObservableWaiterConcurrencyTestCase(unittest.TestCase):
+    def test_concurrent_tasks_keep_separate_state(self):
+        waiter = aio.AsyncObservableWaiter(.2)
+
+        @waiter
+        async def func(seconds):
+            await asyncio.sleep(seconds)
+
+        async def observe(seconds):
+            await func(seconds)
+            return waiter.last_runtime, waiter.last_elapsed
+
+        async def main():
+            return await asyncio.gather(*[observe(seconds) for seconds in (0, .1, .3)])
+
+        for seconds, (runtime, elapsed) in zip((0, .1, .3), run(main())):
+            self.assertAlmostEqual(runtime, seconds, delta=.05)
+            self.assertAlmostEqual(elapsed, max(seconds, .2), delta=.05)
+
+        self.assertEqual(waiter.stats.count, 3)
+
+
+class AsyncWaiterPrecisionTestCase(unittest.TestCase):
+    def test_precise_wait_does_not_exit_early(self):
+        waiter = aio.AsyncObservableWaiter(.05, precise=True)
+
+        async def main():
+            async with waiter:
+                pass
+            return waiter.last_error
+
+        self.assertGreaterEqual(run(main()), 0)
+
+
+class AsyncWaiterSchedulerTestCase(unittest.TestCase):
+    def test_waits_through_scheduler_without_blocking_event_loop(self):
+        sleeper = SleepScheduler(window=.01)
+
+        @aio.AsyncWaiter(.2, scheduler=sleeper)
+        async def padded():
+            pass
+
+        async def main():
+            start = aio.get_time()
+            await asyncio.gather(*[padded() for _ in range(100)])
+            return aio.get_time() - start
+
+        self.assertGreaterEqual(run(main()), .2)
+        self.assertEqual(len(sleeper), 0)
+
+
+class AsyncRateLimiterTestCase(unittest.TestCase):
+    def test_waits_without_blocking_event_loop(self):
+        limiter = aio.AsyncGCRA(rate=20)
+
+        async def main():
+            start = aio.get_time()
+            for _ in range(3):
+                async with limiter:
+                    pass
+            return aio.get_time() - start
+
+        self.assertGreaterEqual(run(main()), .09)
+
+    def test_decorator_and_non_blocking_acquire(self):
+        limiter = aio.AsyncTokenBucket(rate=1, block=False)
+
+        @limiter
+        async def call():
+            return 'called'
+
+        async def main():
+            self.assertEqual(await call(), 'called')
+            with self.assertRaises(RateLimitExceeded):
+                await limiter.acquire_async()
+
+        run(main())
+
+
+class AsyncTimeoutManagerGracePeriodTestCase(unittest.TestCase):
+    def test_requires_soft_timeout_callback(self):
+        async def main():
+            async with aio.AsyncTimeoutManager(1, grace_period=1):
+                pass
+
+        with self.assertRaises(ValueError):
+            run(main())
+
+    def test_soft_callback_then_hard_timeout(self):
+        calls = []
+
+        async def main():
+            async with aio.AsyncTimeoutManager(.05, grace_period=.05, soft_timeout_callback=lambda: calls.append(1)):
+                await asyncio.sleep(1)
+
+        with self.assertRaises(aio.TimeoutError):
+            run(main())
+        self.assertEqual(calls, [1])
+
+
+class AsyncStopWatchTracerTestCase(unittest.TestCase):
+    def test_tasks_nest_spans_under_their_creator(self):
+        tracer = tracing.Tracer()
+
+        @aio.AsyncStopWatch(tracer=tracer)
+        async def child():
+            await asyncio.sleep(0)
+
+        async def main():
+            async with aio.AsyncStopWatch(name='parent', tracer=tracer):
+                await asyncio.gather(child(), child())
+
+        run(main())
+
+        spans = tracer.spans()
+        self.assertEqual([span.name for span in spans], ['parent', child.__qualname__, child.__qualname__])
+        self.assertEqual([span.parent for span in spans], [None, 0, 0])
+
+
+class AsyncTimeoutManagerWatchdogTestCase(unittest.TestCase):
+    def test_watchdog_is_not_supported(self):
+        async def main():
+            async with aio.AsyncTimeoutManager(1, watchdog=True):
+                pass
+
+        with self.assertRaises(ValueError):
+            run(main())
+
+
+class AsyncRetryTestCase(unittest.TestCase):
+    def test_retries_until_success(self):
+        calls = []
+        retry = aio.AsyncRetry(attempts=3, backoff=.001, attempt_timeout=.05)
+
+        @retry
+        async def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise ValueError()
+            if len(calls) == 2:
+                await asyncio.sleep(1)
+            return 'ok'
+
+        self.assertEqual(run(flaky()), 'ok')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(retry.last_attempts, 3)
+        self.assertEqual(retry.attempt_stats.count, 3)
+
+    def test_async_for(self):
+        async def main():
+            numbers = []
+            async for attempt in aio.AsyncRetry(attempts=3, backoff=.001):
+                async with attempt:
+                    numbers.append(attempt.number)
+                    if attempt.number < 2:
+                        raise ValueError()
+            return numbers
+
+        self.assertEqual(run(main()), [1, 2])
+
+    def test_raises_last_error(self):
+        @aio.AsyncRetry(attempts=2, backoff=.001)
+        async def failing():
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            run(failing())
@@ -0,0 +1,51 @@
+import time
+import unittest
+
+from timerutil import compat
+
+
+class ClockTestCase(unittest.TestCase):
+    def test_default_clock_matches_get_time(self):
+        clock = compat.get_clock()
+
+        self.assertEqual(clock.name, 'monotonic')
+        self.assertFalse(clock.cpu_time)
+        self.assertAlmostEqual(clock(), compat.get_time(), places=2)
+
+    def test_get_clock_by_name_or_instance(self):
+        clock = compat.get_clock('perf_counter')
+
+        self.assertIs(compat.get_clock(clock), clock)
+        self.assertIs(compat.CLOCKS['perf_counter'], clock)
+
+    def test_get_clock_raises_ValueError_for_unknown_clock(self):
+        with self.assertRaises(ValueError):
+            compat.get_clock('sundial')
+
+    def test_nanosecond_readings_agree_with_seconds(self):
+        for clock in compat.CLOCKS.values():
+            self.assertIsInstance(clock.time_ns(), int)
+            self.assertAlmostEqual(clock.time_ns() / 1e9, clock.time(), places=2, msg=clock.name)
+
+    def test_cpu_clocks_do_not_advance_while_sleeping(self):
+        clock = compat.get_clock('process_time')
+        start = clock()
+        time.sleep(.05)
+
+        self.assertTrue(clock.cpu_time)
+        self.assertLess(clock() - start, .05)
+
+    def test_calibrate(self):
+        clock = compat.Clock('monotonic', time.monotonic)
+        clock.calibrate(samples=100)
+
+        self.assertGreater(clock.overhead, 0)
+        self.assertLess(clock.overhead, 1e-3)
+        self.assertGreater(clock.resolution, 0)
+        self.assertLess(clock.resolution, 1e-3)
+
+    def test_resolution_falls_back_to_clock_info_for_stalled_clocks(self):
+        clock = compat.Clock('monotonic', lambda: 1.0)
+        clock.calibrate(samples=10, budget=.001)
+
+        self.assertEqual(clock.resolution, time.get_clock_info('monotonic').resolution)
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import unittest
+
+from timerutil import deadlines
+from timerutil.timeouts import TimeoutManager
+
+
+class DeadlineTestCase(unittest.TestCase):
+    def test_no_deadline_by_default(self):
+        self.assertIsNone(deadlines.current_deadline())
+        self.assertIsNone(deadlines.remaining())
+        self.assertEqual(deadlines.remaining(default=30), 30)
+
+    def test_remaining_within_deadline(self):
+        with deadlines.Deadline(10) as deadline:
+            self.assertAlmostEqual(deadlines.remaining(), 10, places=1)
+            self.assertAlmostEqual(deadline.remaining(), 10, places=1)
+            self.assertEqual(deadlines.current_deadline(), deadline.expires_at)
+            self.assertFalse(deadline.expired)
+
+        self.assertIsNone(deadlines.remaining())
+
+    def test_expired_deadline_has_nothing_remaining(self):
+        with deadlines.Deadline(-1) as deadline:
+            self.assertEqual(deadlines.remaining(), 0)
+            self.assertTrue(deadline.expired)
+
+    def test_child_deadline_is_clamped_to_parent(self):
+        with deadlines.Deadline(1) as parent:
+            with deadlines.Deadline(10) as child:
+                self.assertEqual(child.expires_at, parent.expires_at)
+                self.assertLessEqual(deadlines.remaining(), 1)
+
+            with deadlines.Deadline(.5) as child:
+                self.assertLess(child.expires_at, parent.expires_at)
+
+            self.assertEqual(deadlines.current_deadline(), parent.expires_at)
+
+    def test_decorator_establishes_deadline_per_call(self):
+        @deadlines.Deadline(5)
+        def budget():
+            return deadlines.remaining()
+
+        self.assertAlmostEqual(budget(), 5, places=1)
+        self.assertAlmostEqual(budget(), 5, places=1)
+        self.assertIsNone(deadlines.remaining())
+
+    def test_inactive_deadline_raises_RuntimeError(self):
+        with self.assertRaises(RuntimeError):
+            deadlines.Deadline(1).remaining()
+
+    def test_timeout_manager_establishes_deadline(self):
+        with deadlines.Deadline(60):
+            with TimeoutManager(5):
+                self.assertAlmostEqual(deadlines.remaining(), 5, places=1)
+
+            with TimeoutManager(120):
+                self.assertLessEqual(deadlines.remaining(), 60)
+
+            self.assertGreater(deadlines.remaining(), 5)
+
+    def test_threads_start_without_deadline_unless_propagated(self):
+        results = {}
+
+        def worker(key):
+            results[key] = deadlines.remaining()
+
+        with deadlines.Deadline(10):
+            plain = threading.Thread(target=worker, args=('plain',))
+            propagated = threading.Thread(target=deadlines.propagate(worker), args=('propagated',))
+            plain.start()
+            propagated.start()
+            plain.join()
+            propagated.join()
+
+        self.assertIsNone(results['plain'])
+        self.assertAlmostEqual(results['propagated'], 10, places=1)
+
+    def test_propagates_to_asyncio_tasks(self):
+        async def child():
+            return deadlines.remaining()
+
+        async def main():
+            with deadlines.Deadline(10):
+                return await asyncio.ensure_future(child())
+
+        self.assertAlmostEqual(asyncio.run(main()), 10, places=1)
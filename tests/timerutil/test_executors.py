@@ -0,0 +1,121 @@
+import threading
+import time
+import unittest
+
+from timerutil import deadlines, executors, timeouts
+
+from tests.compat import mock
+
+
+def _busy_wait(seconds):
+    # Spin in Python bytecode (rather than blocking in C) so that asynchronous exceptions are delivered promptly
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        pass
+
+
+class TimeoutExecutorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.executor = executors.TimeoutExecutor(max_workers=1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_returns_result_and_stats(self):
+        future = self.executor.submit_with_timeout(5, pow, 2, 10)
+
+        self.assertEqual(future.result(), 1024)
+        self.assertIsInstance(future, executors.TimedFuture)
+        self.assertFalse(future.stats.timed_out)
+        self.assertGreaterEqual(future.stats.queued_time, 0)
+        self.assertGreaterEqual(future.stats.run_time, 0)
+        self.assertGreater(future.stats.remaining, 4)
+        self.assertEqual(self.executor.stats.count, 1)
+
+    def test_no_deadline_by_default(self):
+        future = self.executor.submit(deadlines.remaining)
+
+        self.assertIsNone(future.result())
+        self.assertIsNone(future.stats.remaining)
+
+    def test_task_sees_its_deadline(self):
+        future = self.executor.submit_with_timeout(5, deadlines.remaining)
+
+        self.assertAlmostEqual(future.result(), 5, places=1)
+
+    def test_reraises_task_exceptions(self):
+        future = self.executor.submit_with_timeout(5, int, 'x')
+
+        with self.assertRaises(ValueError):
+            future.result()
+        self.assertFalse(future.stats.timed_out)
+
+    def test_own_timeout_at_deadline_is_not_timing_out(self):
+        patcher = mock.patch.object(timeouts, 'get_time', side_effect=lambda: time.monotonic() + 20)
+
+        def fail_at_deadline():
+            # The task gives up on its own once its deadline has passed, before the timer fires
+            patcher.start()
+            raise executors.TimeoutError('socket timed out')
+
+        future = self.executor.submit_with_timeout(5, fail_at_deadline)
+
+        with self.assertRaises(executors.TimeoutError):
+            future.result()
+        patcher.stop()
+        self.assertEqual(future.stats.remaining, 0)
+        self.assertFalse(future.stats.timed_out)
+        self.assertEqual(self.executor.timed_out, 0)
+
+    def test_interrupts_running_task(self):
+        future = self.executor.submit_with_timeout(.1, _busy_wait, 5)
+
+        with self.assertRaises(executors.TimeoutError):
+            future.result(timeout=2)
+        self.assertTrue(future.stats.timed_out)
+        self.assertEqual(future.stats.remaining, 0)
+        self.assertEqual(self.executor.timed_out, 1)
+        self.assertEqual(self.executor.dropped, 0)
+
+    def test_drops_tasks_which_expire_while_queued(self):
+        ran = threading.Event()
+        self.executor.submit(_busy_wait, .2)
+        future = self.executor.submit_with_timeout(.1, ran.set)
+
+        with self.assertRaises(executors.TimeoutError):
+            future.result(timeout=2)
+        self.assertFalse(ran.is_set())
+        self.assertTrue(future.stats.timed_out)
+        self.assertEqual(future.stats.run_time, 0)
+        self.assertGreaterEqual(future.stats.queued_time, .1)
+        self.assertEqual(self.executor.dropped, 1)
+
+    def test_suppresses_timeout_errors(self):
+        executor = executors.TimeoutExecutor(max_workers=1, timeout=.1, suppress_timeout_errors=True)
+        try:
+            running = executor.submit(_busy_wait, 5)
+            queued = executor.submit(_busy_wait, 5)
+
+            self.assertIsNone(running.result(timeout=2))
+            self.assertIsNone(queued.result(timeout=2))
+            self.assertTrue(running.stats.timed_out)
+            self.assertTrue(queued.stats.timed_out)
+        finally:
+            executor.shutdown()
+
+    def test_submit_after_shutdown_raises_RuntimeError(self):
+        self.executor.shutdown()
+
+        with self.assertRaises(RuntimeError):
+            self.executor.submit(pow, 2, 2)
+
+    def test_shutdown_cancels_queued_futures(self):
+        self.executor.submit(_busy_wait, .1)
+        future = self.executor.submit(pow, 2, 2)
+
+        self.executor.shutdown(cancel_futures=True)
+
+        self.assertTrue(future.cancelled())
+
+    def test_map(self):
+        self.assertEqual(list(self.executor.map(abs, [-1, -2, 3])), [1, 2, 3])
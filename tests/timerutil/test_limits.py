@@ -0,0 +1,191 @@
+import threading
+import time
+import unittest
+
+from timerutil import deadlines, limits
+
+from tests.compat import mock
+
+
+class RateLimiterTestMixin(object):
+    limiter_class = None
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(limits, 'get_time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_validates_arguments(self):
+        with self.assertRaises(ValueError):
+            self.limiter_class(0)
+        with self.assertRaises(ValueError):
+            self.limiter_class(1, burst=0)
+        with self.assertRaises(ValueError):
+            self.limiter_class(1, burst=2).try_acquire(3)
+
+    def test_allows_burst_then_rate(self):
+        limiter = self.limiter_class(rate=10, burst=3)
+
+        self.assertEqual([limiter.try_acquire() for _ in range(4)], [True, True, True, False])
+        self.assertAlmostEqual(limiter.wait_time(), .1)
+
+        self.now += .1
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+
+        self.now += 10
+        self.assertEqual([limiter.try_acquire() for _ in range(4)], [True, True, True, False])
+
+    def test_acquire_multiple_tokens(self):
+        limiter = self.limiter_class(rate=10, burst=5)
+
+        self.assertTrue(limiter.try_acquire(5))
+        self.assertAlmostEqual(limiter.wait_time(2), .2)
+
+    def test_non_blocking_acquire_raises_RateLimitExceeded(self):
+        limiter = self.limiter_class(rate=2, block=False)
+        limiter.acquire()
+
+        with self.assertRaises(limits.RateLimitExceeded) as ctx:
+            limiter.acquire()
+
+        self.assertAlmostEqual(ctx.exception.retry_after, .5)
+
+    def test_blocking_acquire_sleeps_until_allowed(self):
+        limiter = self.limiter_class(rate=4)
+        limiter.acquire()
+
+        def sleep(seconds):
+            self.now += seconds
+
+        with mock.patch.object(limits.time, 'sleep', side_effect=sleep) as mock_sleep:
+            limiter.acquire()
+
+        mock_sleep.assert_called_once_with(.25)
+
+    def test_blocking_acquire_respects_timeout(self):
+        limiter = self.limiter_class(rate=1, timeout=.5)
+        limiter.acquire()
+
+        with mock.patch.object(limits.time, 'sleep') as mock_sleep:
+            with self.assertRaises(limits.RateLimitExceeded):
+                limiter.acquire()
+
+        mock_sleep.assert_not_called()
+
+    def test_context_manager_and_decorator(self):
+        limiter = self.limiter_class(rate=1, burst=2, block=False)
+
+        @limiter
+        def call():
+            return 'called'
+
+        with limiter as limiter_ctx:
+            self.assertIs(limiter_ctx, limiter)
+        self.assertEqual(call(), 'called')
+        with self.assertRaises(limits.RateLimitExceeded):
+            call()
+
+
+class TokenBucketTestCase(RateLimiterTestMixin, unittest.TestCase):
+    limiter_class = limits.TokenBucket
+
+    def test_tokens(self):
+        limiter = limits.TokenBucket(rate=10, burst=5)
+        limiter.try_acquire(5)
+        self.now += .2
+
+        self.assertAlmostEqual(limiter.tokens, 2)
+
+
+class GCRATestCase(RateLimiterTestMixin, unittest.TestCase):
+    limiter_class = limits.GCRA
+
+
+class RateLimiterDeadlineTestCase(unittest.TestCase):
+    def test_blocking_never_outlasts_deadline(self):
+        limiter = limits.GCRA(rate=1)
+        limiter.acquire()
+
+        with deadlines.Deadline(.1):
+            with self.assertRaises(limits.RateLimitExceeded):
+                limiter.acquire()
+
+    def test_thread_safety(self):
+        limiter = limits.GCRA(rate=1, burst=100)
+        allowed = []
+
+        def worker():
+            allowed.extend(limiter.try_acquire() for _ in range(100))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIn(sum(allowed), (100, 101))
+
+    def test_blocking_acquire_paces_callers(self):
+        limiter = limits.TokenBucket(rate=50)
+        start = time.time()
+
+        for _ in range(6):
+            limiter.acquire()
+
+        self.assertGreaterEqual(time.time() - start, .09)
+
+
+class KeyedRateLimiterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(limits, 'get_time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_limits_keys_independently(self):
+        limiter = limits.KeyedRateLimiter(rate=1, burst=2)
+
+        self.assertEqual([limiter.try_acquire('a') for _ in range(3)], [True, True, False])
+        self.assertTrue(limiter.try_acquire('b'))
+        self.assertAlmostEqual(limiter.wait_time('a'), 1)
+        self.assertEqual(limiter.wait_time('c'), 0)
+
+        with self.assertRaises(limits.RateLimitExceeded) as ctx:
+            limiter.acquire('a')
+        self.assertAlmostEqual(ctx.exception.retry_after, 1)
+
+    def test_evicts_keys_whose_limiters_are_full(self):
+        limiter = limits.KeyedRateLimiter(rate=1, max_keys=2)
+
+        limiter.acquire('a')
+        limiter.acquire('b')
+        self.now += 1
+        limiter.acquire('a')
+        limiter.acquire('c')
+
+        self.assertEqual(len(limiter), 2)
+        self.assertEqual(list(limiter._tats), ['a', 'c'])
+
+    def test_evicts_keys_closest_to_full(self):
+        limiter = limits.KeyedRateLimiter(rate=1, burst=20, max_keys=16)
+
+        for key in range(1, 18):
+            limiter.acquire(key, tokens=key)
+
+        self.assertEqual(len(limiter), 14)
+        self.assertEqual(sorted(limiter._tats), list(range(4, 18)))
+        self.assertAlmostEqual(limiter.wait_time(17, tokens=4), 1)
+
+    def test_rejects_more_tokens_than_burst(self):
+        with self.assertRaises(ValueError):
+            limits.KeyedRateLimiter(rate=1, burst=2).try_acquire('a', 3)
+
+    def test_clear(self):
+        limiter = limits.KeyedRateLimiter(rate=1)
+        limiter.acquire('a')
+        limiter.clear()
+
+        self.assertEqual(len(limiter), 0)
+        self.assertTrue(limiter.try_acquire('a'))
@@ -0,0 +1,119 @@
+import os
+import time
+import unittest
+
+from timerutil import processes
+
+
+def _add(a, b=0):
+    return a + b
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def _raise(exc):
+    raise exc
+
+
+def _size_and_type(data):
+    return len(data), type(data).__name__
+
+
+def _echo(data):
+    return bytes(data)
+
+
+@processes.ProcessTimeoutManager(.5)
+def _decorated_pid(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+class ProcessPoolTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = processes.ProcessPool(processes=2, shared_memory_threshold=1024)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def test_returns_result(self):
+        self.assertEqual(self.pool.call(5, _add, (1,), {'b': 2}), 3)
+
+    def test_reuses_workers(self):
+        pids = set(self.pool.call(5, _sleep, (0,)) for _ in range(10))
+
+        self.assertLessEqual(len(pids), 2)
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_reraises_exceptions(self):
+        with self.assertRaises(ValueError):
+            self.pool.call(5, _raise, (ValueError('boom'),))
+
+    def test_kills_and_replaces_worker_on_timeout(self):
+        start = time.time()
+
+        with self.assertRaises(processes.TimeoutError):
+            self.pool.call(.2, _sleep, (10,))
+
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual(len(self.pool._idle), 2)
+        self.assertEqual(self.pool.call(5, _add, (1, 1)), 2)
+
+    def test_large_arguments_and_results_use_shared_memory(self):
+        data = b'x' * 4096
+
+        self.assertEqual(self.pool.call(5, _size_and_type, (data,)), (4096, 'memoryview'))
+        self.assertEqual(self.pool.call(5, _size_and_type, (b'small',)), (5, 'bytes'))
+        self.assertEqual(self.pool.call(5, _echo, (data,)), data)
+
+    def test_closed_pool_raises_RuntimeError(self):
+        pool = processes.ProcessPool(processes=1)
+        pool.close()
+
+        with self.assertRaises(RuntimeError):
+            pool.call(1, _add, (1,))
+
+
+class ProcessTimeoutManagerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = processes.ProcessPool(processes=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def test_run(self):
+        manager = processes.ProcessTimeoutManager(5, pool=self.pool)
+
+        self.assertEqual(manager.run(_add, 2, b=3), 5)
+
+    def test_custom_timeout_message(self):
+        manager = processes.ProcessTimeoutManager(.1, timeout_message='too slow', pool=self.pool)
+
+        with self.assertRaises(processes.TimeoutError) as ctx:
+            manager.run(_sleep, 10)
+
+        self.assertEqual(str(ctx.exception), 'too slow')
+
+    def test_suppresses_timeout_errors(self):
+        manager = processes.ProcessTimeoutManager(.1, suppress_timeout_errors=True, pool=self.pool)
+
+        self.assertIsNone(manager.run(_sleep, 10))
+
+    def test_does_not_suppress_timeout_errors_raised_by_callable(self):
+        manager = processes.ProcessTimeoutManager(5, suppress_timeout_errors=True, pool=self.pool)
+
+        with self.assertRaises(processes.TimeoutError):
+            manager.run(_raise, processes.TimeoutError('mine'))
+
+    def test_decorator(self):
+        self.assertNotEqual(_decorated_pid(0), os.getpid())
+
+        with self.assertRaises(processes.TimeoutError):
+            _decorated_pid(10)
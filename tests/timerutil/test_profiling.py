@@ -0,0 +1,184 @@
+import asyncio
+import contextvars
+import sys
+import time
+import unittest
+
+from timerutil import profiling
+
+from tests.compat import mock
+
+
+def _busy_wait(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+def _slow_stage(seconds):
+    _busy_wait(seconds)
+
+
+def _sampled_stage(sampling_thread, samples):
+    for i in range(samples):
+        # Each sample is taken as if an interval had passed
+        sampling_thread.sample(now=profiling.get_time() + i + 1)
+
+
+class SamplingStopWatchTestCase(unittest.TestCase):
+    def test_validates_interval(self):
+        with self.assertRaises(ValueError):
+            profiling.SamplingStopWatch(1, interval=0)
+
+    def test_fast_calls_are_discarded(self):
+        timer = profiling.SamplingStopWatch(threshold=10, interval=.001)
+
+        with timer:
+            _busy_wait(.02)
+
+        self.assertEqual(timer.profiles, {})
+        self.assertEqual(len(profiling._sampling_thread), 0)
+
+    def test_slow_calls_are_profiled_per_call_site(self):
+        # Samples are taken explicitly (rather than by a background thread), so that they can be counted
+        sampling_thread = profiling._SamplingThread()
+        timer = profiling.SamplingStopWatch(threshold=0, interval=.001)
+
+        @timer
+        def handle():
+            _sampled_stage(sampling_thread, 6)
+
+        with mock.patch.object(profiling, '_sampling_thread', sampling_thread):
+            with mock.patch.object(sampling_thread, '_start'):
+                handle()
+                handle()
+
+        profile = timer.profiles[handle.__qualname__]
+        self.assertEqual(profile.calls, 2)
+        self.assertEqual(profile.samples, 12)
+        stack, count = profile.most_common(1)[0]
+        self.assertEqual(count, 12)
+        self.assertEqual([frame[1] for frame in stack], ['handle', '_sampled_stage', 'sample'])
+        self.assertIn(handle.__qualname__ + ';', timer.collapsed())
+
+    def test_context_manager_site_is_its_location(self):
+        timer = profiling.SamplingStopWatch(threshold=0, interval=.001)
+
+        with timer:
+            _slow_stage(.02)
+
+        (site, profile), = timer.profiles.items()
+        self.assertTrue(site.startswith(__file__.rstrip('c') + ':'))
+        stack, _ = profile.most_common(1)[0]
+        self.assertEqual(stack[0][1], 'test_context_manager_site_is_its_location')
+
+    def test_memory_is_bounded(self):
+        timer = profiling.SamplingStopWatch(threshold=0, interval=.001, max_samples=3, max_sites=1)
+
+        with timer:
+            _slow_stage(.05)
+        with timer:
+            _slow_stage(.05)
+
+        (profile,) = timer.profiles.values()
+        self.assertLessEqual(profile.samples, 3)
+        self.assertEqual(timer.dropped, 1)
+
+        timer.clear_profiles()
+        self.assertEqual(timer.profiles, {})
+        self.assertEqual(timer.dropped, 0)
+
+    def test_keeps_sampling_suspended_coroutines(self):
+        timer = profiling.SamplingStopWatch(threshold=0, interval=.001, name='handle')
+
+        async def handle():
+            with timer:
+                # Not on the thread's stack while suspended, so the first samples are skipped
+                await asyncio.sleep(.02)
+                _slow_stage(.05)
+
+        asyncio.run(handle())
+
+        profile = timer.profiles['handle']
+        self.assertGreater(profile.samples, 0)
+        self.assertIn('_slow_stage', [frame[1] for frame in profile.most_common(1)[0][0]])
+
+    def test_nested_stopwatches_keep_their_own_samples(self):
+        outer = profiling.SamplingStopWatch(threshold=0, interval=.001, name='outer')
+        inner = profiling.SamplingStopWatch(threshold=10, interval=.001, name='inner')
+
+        with outer:
+            with inner:
+                _slow_stage(.02)
+
+        self.assertEqual(list(outer.profiles), ['outer'])
+        self.assertEqual(inner.profiles, {})
+
+    def test_does_not_grow_the_context(self):
+        with profiling.SamplingStopWatch(threshold=1):
+            pass
+        size = len(contextvars.copy_context())
+
+        for _ in range(100):
+            with profiling.SamplingStopWatch(threshold=1):
+                pass
+
+        self.assertEqual(len(contextvars.copy_context()), size)
+
+    def test_records_runtime(self):
+        timer = profiling.SamplingStopWatch(threshold=1)
+
+        with timer:
+            pass
+
+        self.assertEqual(timer.stats.count, 1)
+        self.assertIsNotNone(timer.last_runtime)
+
+
+class CallSiteProfileTestCase(unittest.TestCase):
+    def test_collapsed(self):
+        profile = profiling.CallSiteProfile('handle', max_stacks=1)
+
+        profile._add([(('a.py', 'f', 1), ('b.py', 'g', 2))] * 2 + [(('a.py', 'f', 3),), ()])
+
+        self.assertEqual(profile.collapsed(), 'handle;a.py:f:1;b.py:g:2 2\n')
+        self.assertEqual(profile.samples, 4)
+        self.assertEqual(profile.dropped, 2)
+
+
+
+class SamplingThreadTestCase(unittest.TestCase):
+    def test_waits_until_the_next_sample_is_due(self):
+        sampling_thread = profiling._SamplingThread()
+        self.assertIsNone(sampling_thread.sample())
+
+        frame = sys._getframe()
+        with mock.patch.object(profiling, 'get_time', return_value=100):
+            fast = profiling._Sampler(frame, True, .01, 10)
+            slow = profiling._Sampler(frame, True, 1, 10)
+        with mock.patch.object(sampling_thread, '_start'):
+            sampling_thread.register(fast)
+            sampling_thread.register(slow)
+
+        self.assertAlmostEqual(sampling_thread.sample(now=100), .01)
+        self.assertAlmostEqual(sampling_thread.sample(now=100.01), .01)
+        self.assertEqual((len(fast.samples), len(slow.samples)), (1, 0))
+
+        sampling_thread.unregister(fast)
+        self.assertAlmostEqual(sampling_thread.sample(now=100.02), .98)
+        sampling_thread.unregister(slow)
+        self.assertIsNone(sampling_thread.sample(now=100.02))
+
+    def test_thread_blocks_while_idle(self):
+        sampling_thread = profiling._SamplingThread()
+        sampler = profiling._Sampler(sys._getframe(), True, .001, 10)
+
+        sampling_thread.register(sampler)
+        _busy_wait(.05)
+        sampling_thread.unregister(sampler)
+        self.assertTrue(sampler.samples)
+
+        end = time.time() + 1
+        while sampling_thread._registered.is_set() and time.time() < end:
+            time.sleep(.001)
+        self.assertFalse(sampling_thread._registered.is_set())
@@ -0,0 +1,118 @@
+import json
+import threading
+import unittest
+
+import timerutil
+from timerutil import registry, waits
+
+
+class TimerRegistryTimerTestCase(unittest.TestCase):
+    def test_returns_same_timer_for_same_name(self):
+        timer_registry = registry.TimerRegistry()
+
+        self.assertIs(timer_registry.timer('db.query'), timer_registry.timer('db.query'))
+        self.assertIsNot(timer_registry.timer('db.query'), timer_registry.timer('cache.fill'))
+
+    def test_creates_stopwatch_by_default(self):
+        timer = registry.TimerRegistry().timer('db.query')
+
+        self.assertIsInstance(timer, waits.StopWatch)
+        self.assertIsInstance(timer.stats, registry.ShardedTimingStats)
+
+    def test_creates_observable_waiter_with_minimum_time(self):
+        timer = registry.TimerRegistry().timer('login', minimum_time=.5)
+
+        self.assertIsInstance(timer, waits.ObservableWaiter)
+        self.assertNotIsInstance(timer, waits.StopWatch)
+        self.assertEqual(timer.minimum_time, .5)
+
+    def test_rejects_conflicting_minimum_time(self):
+        timer_registry = registry.TimerRegistry()
+        timer_registry.timer('login', minimum_time=.5)
+
+        with self.assertRaises(ValueError):
+            timer_registry.timer('login')
+
+    def test_unregister(self):
+        timer_registry = registry.TimerRegistry()
+        timer_registry.timer('db.query')
+
+        timer_registry.unregister('db.query')
+
+        self.assertNotIn('db.query', timer_registry)
+        self.assertEqual(list(timer_registry), [])
+
+    def test_default_registry(self):
+        self.assertIs(timerutil.timer('tests.default'), registry.default_registry.timer('tests.default'))
+        registry.default_registry.unregister('tests.default')
+
+
+class TimerRegistryExportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.registry = registry.TimerRegistry()
+
+        @self.registry.timer('db.query')
+        def query():
+            pass
+
+        def run_queries():
+            for _ in range(10):
+                query()
+
+        threads = [threading.Thread(target=run_queries) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with self.registry.timer('say "hi"\n'):
+            pass
+
+    def test_snapshot_merges_thread_shards(self):
+        snapshot = self.registry.snapshot()
+
+        self.assertEqual(snapshot['db.query'].count, 40)
+        self.assertEqual(snapshot['db.query'].runtime_histogram.count, 40)
+        # The threads have exited, so their shards were folded into the retired shard
+        self.assertEqual(self.registry.timer('db.query').stats._shards, [])
+        self.assertEqual(self.registry.timer('db.query').stats.mean_runtime, snapshot['db.query'].mean_runtime)
+
+    def test_snapshot_reset(self):
+        self.registry.snapshot(reset=True)
+
+        self.assertEqual(self.registry.snapshot()['db.query'].count, 0)
+
+    def test_to_json(self):
+        document = json.loads(self.registry.to_json())
+
+        self.assertEqual(sorted(document), ['db.query', 'say "hi"\n'])
+        self.assertEqual(document['db.query']['count'], 40)
+        self.assertIn('p99', document['db.query']['runtime_histogram'])
+
+    def test_prometheus_text(self):
+        lines = self.registry.prometheus_text().splitlines()
+
+        self.assertIn('# TYPE timerutil_runtime_seconds summary', lines)
+        self.assertIn('# TYPE timerutil_elapsed_seconds summary', lines)
+        self.assertIn('timerutil_runtime_seconds_count{timer="db.query"} 40', lines)
+        self.assertIn('timerutil_elapsed_seconds_count{timer="say \\"hi\\"\\n"} 1', lines)
+        self.assertTrue(any(line.startswith('timerutil_runtime_seconds{timer="db.query",quantile="0.99"} ')
+                            for line in lines))
+        self.assertTrue(any(line.startswith('timerutil_runtime_seconds_sum{timer="db.query"} ') for line in lines))
+
+    def test_formats_special_sample_values(self):
+        self.assertEqual(registry._format_sample(float('inf')), '+Inf')
+        self.assertEqual(registry._format_sample(float('-inf')), '-Inf')
+        self.assertEqual(registry._format_sample(float('nan')), 'NaN')
+        self.assertEqual(registry._format_sample(None), 'NaN')
+        self.assertEqual(registry._format_sample(2), '2.0')
+
+    def test_prometheus_text_without_histograms(self):
+        timer_registry = registry.TimerRegistry(histograms=False)
+        with timer_registry.timer('db.query'):
+            pass
+
+        text = timer_registry.prometheus_text(prefix='app')
+
+        self.assertNotIn('quantile', text)
+        self.assertIn('app_runtime_seconds_count{timer="db.query"} 1\n', text)
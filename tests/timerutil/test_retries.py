@@ -0,0 +1,151 @@
+import time
+import unittest
+
+from timerutil import deadlines, retries, timeouts
+
+from tests.compat import mock
+
+
+class _Flaky(object):
+    """Fails the given number of times, then succeeds"""
+
+    def __init__(self, failures, error=ValueError, duration=0):
+        self.failures = failures
+        self.error = error
+        self.duration = duration
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.duration:
+            end = time.time() + self.duration
+            while time.time() < end:
+                pass
+        if self.calls <= self.failures:
+            raise self.error(self.calls)
+        return 'ok'
+
+
+class RetryTestCase(unittest.TestCase):
+    def test_validates_attempts(self):
+        with self.assertRaises(ValueError):
+            retries.Retry(attempts=0)
+
+    def test_retries_until_success(self):
+        retry = retries.Retry(attempts=3, backoff=.001)
+        flaky = _Flaky(2)
+
+        self.assertEqual(retry(flaky)(), 'ok')
+        self.assertEqual(flaky.calls, 3)
+        self.assertEqual(retry.last_attempts, 3)
+        self.assertEqual(retry.stats.count, 1)
+        self.assertEqual(retry.attempt_stats.count, 3)
+        self.assertGreaterEqual(retry.last_elapsed, retry.last_runtime)
+
+    def test_raises_last_error_once_attempts_run_out(self):
+        flaky = _Flaky(5)
+
+        with self.assertRaises(ValueError) as ctx:
+            retries.Retry(attempts=3, backoff=.001)(flaky)()
+
+        self.assertEqual(ctx.exception.args, (3,))
+        self.assertEqual(flaky.calls, 3)
+
+    def test_does_not_retry_other_errors(self):
+        flaky = _Flaky(1, error=KeyError)
+
+        with self.assertRaises(KeyError):
+            retries.Retry(attempts=3, backoff=.001, retry_on=ValueError)(flaky)()
+
+        self.assertEqual(flaky.calls, 1)
+
+    def test_backoff(self):
+        retry = retries.Retry(backoff=.1, multiplier=3, max_backoff=.5, jitter=False)
+        self.assertEqual([round(retry._delay(n), 6) for n in (1, 2, 3)], [.1, .3, .5])
+
+        retry = retries.Retry(backoff=.1, multiplier=2)
+        with mock.patch.object(retry._random, 'uniform', return_value=.05) as uniform:
+            self.assertEqual(retry._delay(2), .05)
+        uniform.assert_called_once_with(0, .2)
+
+    def test_stops_when_budget_cannot_fit_another_attempt(self):
+        flaky = _Flaky(10, duration=.03)
+        start = time.time()
+
+        with self.assertRaises(ValueError):
+            retries.Retry(attempts=10, timeout=.1, backoff=.01, jitter=False, multiplier=1)(flaky)()
+
+        self.assertLess(time.time() - start, .1)
+        self.assertLessEqual(flaky.calls, 3)
+
+    def test_respects_enclosing_deadline(self):
+        flaky = _Flaky(10, duration=.03)
+
+        with deadlines.Deadline(.1):
+            with self.assertRaises(ValueError):
+                retries.Retry(attempts=10, backoff=.01, jitter=False, multiplier=1)(flaky)()
+
+        self.assertLessEqual(flaky.calls, 3)
+
+    def test_attempts_which_time_out_are_retried(self):
+        calls = []
+
+        @retries.Retry(attempts=3, attempt_timeout=.05, backoff=.001, retry_on=())
+        def slow_then_fast():
+            calls.append(deadlines.remaining())
+            if len(calls) < 2:
+                time.sleep(.01)
+                while True:
+                    pass
+            return 'ok'
+
+        self.assertEqual(slow_then_fast(), 'ok')
+        self.assertEqual(len(calls), 2)
+        self.assertLessEqual(calls[0], .05)
+
+    def test_errors_at_attempt_deadline_are_not_timeouts(self):
+        flaky = _Flaky(1, error=KeyError)
+        patcher = mock.patch.object(timeouts, 'get_time', side_effect=lambda: time.monotonic() + 20)
+
+        def fail_at_deadline():
+            # The attempt fails on its own once its deadline has passed, before the timer fires
+            patcher.start()
+            flaky()
+
+        try:
+            with self.assertRaises(KeyError):
+                retries.Retry(attempts=3, attempt_timeout=5, backoff=.001, retry_on=ValueError)(fail_at_deadline)()
+        finally:
+            patcher.stop()
+        self.assertEqual(flaky.calls, 1)
+
+    def test_iterating_over_attempts(self):
+        flaky = _Flaky(1)
+        numbers = []
+
+        for attempt in retries.Retry(attempts=3, backoff=.001):
+            with attempt:
+                numbers.append(attempt.number)
+                result = flaky()
+
+        self.assertEqual(result, 'ok')
+        self.assertEqual(numbers, [1, 2])
+
+    def test_not_a_context_manager(self):
+        with self.assertRaises(TypeError):
+            with retries.Retry():
+                pass
+
+    def test_overall_timeout_is_propagated(self):
+        @retries.Retry(timeout=5)
+        def get_remaining():
+            return deadlines.remaining()
+
+        self.assertLessEqual(get_remaining(), 5)
+        self.assertIsNone(deadlines.remaining())
+
+    def test_timeout_error_without_budget(self):
+        with timeouts.TimeoutManager(1):
+            with deadlines.Deadline(0):
+                with self.assertRaises(timeouts.TimeoutError):
+                    retries.Retry()(_Flaky(0))()
@@ -0,0 +1,291 @@
+import threading
+import time
+import unittest
+
+from timerutil import scheduling
+
+from tests.compat import mock
+
+
+class DeadlineSchedulerScheduleTestCase(unittest.TestCase):
+    def test_runs_callback_after_deadline(self):
+        scheduler = scheduling.DeadlineScheduler()
+        event = threading.Event()
+        deadline = scheduling.get_time() + .1
+
+        scheduler.schedule(deadline, event.set)
+
+        self.assertTrue(event.wait(1))
+        self.assertGreaterEqual(scheduling.get_time(), deadline)
+
+    def test_runs_callbacks_in_deadline_order(self):
+        scheduler = scheduling.DeadlineScheduler()
+        calls = []
+        done = threading.Event()
+        now = scheduling.get_time()
+
+        scheduler.schedule(now + .2, done.set)
+        scheduler.schedule(now + .1, lambda: calls.append('second'))
+        scheduler.schedule(now + .05, lambda: calls.append('first'))
+
+        self.assertTrue(done.wait(1))
+        self.assertEqual(calls, ['first', 'second'])
+
+    def test_uses_a_single_thread(self):
+        scheduler = scheduling.DeadlineScheduler()
+        threads = set()
+        done = threading.Event()
+        now = scheduling.get_time()
+
+        for i in range(100):
+            scheduler.schedule(now + i / 1000.0, lambda: threads.add(threading.current_thread()))
+        scheduler.schedule(now + .2, done.set)
+
+        self.assertTrue(done.wait(1))
+        self.assertEqual(len(threads), 1)
+
+    def test_survives_callback_exceptions(self):
+        scheduler = scheduling.DeadlineScheduler()
+        event = threading.Event()
+        now = scheduling.get_time()
+
+        with mock.patch.object(scheduling.logger, 'exception') as mock_exception:
+            scheduler.schedule(now, lambda: 1 / 0)
+            scheduler.schedule(now + .05, event.set)
+            self.assertTrue(event.wait(1))
+
+        self.assertEqual(mock_exception.call_count, 1)
+
+
+class DeadlineSchedulerCancelTestCase(unittest.TestCase):
+    def test_cancelled_callback_is_not_run(self):
+        scheduler = scheduling.DeadlineScheduler()
+        calls = []
+
+        handle = scheduler.schedule(scheduling.get_time() + .1, lambda: calls.append(True))
+
+        self.assertTrue(scheduler.cancel(handle))
+        time.sleep(.2)
+        self.assertEqual(calls, [])
+
+    def test_cannot_cancel_callback_which_has_run(self):
+        scheduler = scheduling.DeadlineScheduler()
+        event = threading.Event()
+
+        handle = scheduler.schedule(scheduling.get_time(), event.set)
+
+        self.assertTrue(event.wait(1))
+        self.assertFalse(scheduler.cancel(handle))
+
+    def test_cancelled_callbacks_are_not_counted(self):
+        scheduler = scheduling.DeadlineScheduler()
+        deadline = scheduling.get_time() + 60
+
+        handles = [scheduler.schedule(deadline, lambda: None) for _ in range(10)]
+        for handle in handles[:4]:
+            scheduler.cancel(handle)
+
+        self.assertEqual(len(scheduler), 6)
+
+
+class DeadlineSchedulerTimingWheelTestCase(unittest.TestCase):
+    def test_runs_callbacks_from_timing_wheel(self):
+        scheduler = scheduling.DeadlineScheduler(queue=scheduling.TimingWheel(resolution=.01, wheel_size=8))
+        calls = []
+        done = threading.Event()
+        now = scheduling.get_time()
+
+        scheduler.schedule(now + .3, done.set)
+        scheduler.schedule(now + .2, lambda: calls.append('second'))
+        scheduler.schedule(now + .05, lambda: calls.append('first'))
+        scheduler.cancel(scheduler.schedule(now + .1, lambda: calls.append('cancelled')))
+
+        self.assertTrue(done.wait(1))
+        self.assertEqual(calls, ['first', 'second'])
+
+
+class TimerQueueTestMixin(object):
+    def make_queue(self):
+        raise NotImplementedError
+
+    def test_pops_nothing_before_deadline(self):
+        queue = self.make_queue()
+        queue.push(10, 'item')
+
+        self.assertEqual(queue.pop_expired(9.99), [])
+        self.assertEqual(len(queue), 1)
+
+    def test_pops_items_in_deadline_order(self):
+        queue = self.make_queue()
+        for deadline in (5, 1, 300, 3, 70000):
+            queue.push(deadline, deadline)
+
+        self.assertEqual(queue.pop_expired(4), [1, 3])
+        self.assertEqual(queue.pop_expired(400), [5, 300])
+        self.assertEqual(queue.pop_expired(100000), [70000])
+        self.assertEqual(len(queue), 0)
+
+    def test_pops_items_which_are_already_due(self):
+        queue = self.make_queue()
+        queue.pop_expired(100)
+        queue.push(50, 'late')
+
+        self.assertEqual(queue.pop_expired(101), ['late'])
+
+    def test_cancel(self):
+        queue = self.make_queue()
+        handle = queue.push(5, 'cancelled')
+        queue.push(6, 'kept')
+
+        self.assertTrue(queue.cancel(handle))
+        self.assertFalse(queue.cancel(handle))
+        self.assertEqual(len(queue), 1)
+        self.assertEqual(queue.pop_expired(10), ['kept'])
+
+    def test_cannot_cancel_expired_item(self):
+        queue = self.make_queue()
+        handle = queue.push(5, 'item')
+        queue.pop_expired(10)
+
+        self.assertFalse(queue.cancel(handle))
+
+    def test_next_deadline(self):
+        queue = self.make_queue()
+        self.assertIsNone(queue.next_deadline())
+
+        queue.push(7, 'item')
+
+        self.assertIsNotNone(queue.next_deadline())
+        self.assertLessEqual(queue.next_deadline(), 7)
+
+    def test_clear(self):
+        queue = self.make_queue()
+        handle = queue.push(7, 'item')
+        queue.clear()
+
+        self.assertEqual(len(queue), 0)
+        self.assertFalse(queue.cancel(handle))
+        self.assertEqual(queue.pop_expired(10), [])
+
+
+class HeapTimerQueueTestCase(TimerQueueTestMixin, unittest.TestCase):
+    def make_queue(self):
+        return scheduling.HeapTimerQueue()
+
+    def test_next_deadline_is_exact(self):
+        queue = self.make_queue()
+        queue.push(7.5, 'item')
+
+        self.assertEqual(queue.next_deadline(), 7.5)
+
+    def test_cancelled_entries_are_compacted(self):
+        queue = self.make_queue()
+
+        handles = [queue.push(60, 'item') for _ in range(1000)]
+        for handle in handles[:900]:
+            queue.cancel(handle)
+
+        self.assertEqual(len(queue), 100)
+        self.assertLess(len(queue._heap), 1000)
+
+
+class TimingWheelTestCase(TimerQueueTestMixin, unittest.TestCase):
+    def make_queue(self):
+        return scheduling.TimingWheel(resolution=1, wheel_size=4, levels=3, start=0)
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            scheduling.TimingWheel(resolution=0)
+
+    def test_never_expires_items_early(self):
+        queue = scheduling.TimingWheel(resolution=.5, wheel_size=4, levels=2, start=0)
+        deadlines = [i * .37 for i in range(200)]
+        for deadline in deadlines:
+            queue.push(deadline, deadline)
+
+        now = 0
+        while len(queue):
+            now += .25
+            for deadline in queue.pop_expired(now):
+                self.assertLessEqual(deadline, now)
+                self.assertGreater(deadline, now - .5 - .25)
+
+    def test_wraps_deadlines_beyond_wheel_range(self):
+        queue = self.make_queue()
+        queue.push(1000, 'far')
+
+        self.assertEqual(queue.pop_expired(999), [])
+        self.assertEqual(queue.pop_expired(1000), ['far'])
+
+    def test_next_deadline_is_no_later_than_earliest_item(self):
+        queue = self.make_queue()
+        queue.push(30, 'item')
+
+        while len(queue):
+            next_deadline = queue.next_deadline()
+            self.assertLessEqual(next_deadline, 30)
+            queue.pop_expired(next_deadline)
+
+
+class SleepSchedulerTestCase(unittest.TestCase):
+    def test_window_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            scheduling.SleepScheduler(window=0)
+
+    def test_coalesces_deadlines_within_a_window(self):
+        sleeper = scheduling.SleepScheduler(window=1)
+        deadline = scheduling.get_time() + 60
+
+        with mock.patch.object(sleeper.scheduler, 'schedule') as schedule:
+            for offset in (0, .001, .002):
+                sleeper.call_at(deadline + offset, lambda: None)
+
+        self.assertEqual(len(sleeper), 3)
+        self.assertLessEqual(schedule.call_count, 2)
+
+    def test_releases_callbacks_at_end_of_window(self):
+        sleeper = scheduling.SleepScheduler(window=.05)
+        released = []
+        start = scheduling.get_time()
+
+        for _ in range(100):
+            sleeper.call_at(start + .1, lambda: released.append(scheduling.get_time()))
+        time.sleep(.3)
+
+        self.assertEqual(len(released), 100)
+        self.assertGreaterEqual(min(released), start + .1)
+        self.assertEqual(len(sleeper), 0)
+
+    def test_sleep(self):
+        sleeper = scheduling.SleepScheduler(window=.01)
+        start = scheduling.get_time()
+
+        sleeper.sleep(.1)
+
+        self.assertGreaterEqual(scheduling.get_time() - start, .1)
+
+    def test_sleep_until_past_deadline_returns_immediately(self):
+        sleeper = scheduling.SleepScheduler()
+
+        with mock.patch.object(sleeper, 'call_at') as call_at:
+            sleeper.sleep_until(scheduling.get_time() - 1)
+
+        call_at.assert_not_called()
+
+    def test_future(self):
+        sleeper = scheduling.SleepScheduler(window=.01)
+
+        future = sleeper.future(scheduling.get_time() + .05)
+
+        self.assertIsNone(future.result(timeout=1))
+
+    def test_logs_callback_exceptions(self):
+        sleeper = scheduling.SleepScheduler(window=.01)
+        released = threading.Event()
+
+        with mock.patch.object(scheduling.logger, 'exception') as log_exception:
+            sleeper.call_at(scheduling.get_time(), lambda: 1 / 0)
+            sleeper.call_at(scheduling.get_time(), released.set)
+            self.assertTrue(released.wait(1))
+
+        self.assertEqual(log_exception.call_count, 1)
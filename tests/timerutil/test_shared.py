@@ -0,0 +1,288 @@
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import unittest
+
+from timerutil import shared
+from timerutil.waits import StopWatch
+
+from tests.compat import mock
+
+
+def _record(shared_stats, records):
+    for i in range(records):
+        shared_stats.record(i + 1, 2 * (i + 1))
+    shared_stats.release()
+
+
+def _exit_unless_sharing_claim_lock(shared_stats):
+    sys.exit(0 if shared_stats.claim_lock is not None else 1)
+
+
+@unittest.skipIf(shared.shared_memory is None, 'multiprocessing.shared_memory is not available')
+class SharedTimingStatsTestCase(unittest.TestCase):
+    def _create(self, **kwargs):
+        shared_stats = shared.SharedTimingStats(**kwargs)
+        self.addCleanup(shared_stats.unlink)
+        self.addCleanup(shared_stats.close)
+        return shared_stats
+
+    def _attach(self, name):
+        shared_stats = shared.SharedTimingStats.attach(name)
+        self.addCleanup(shared_stats.close)
+        return shared_stats
+
+    def test_records_like_timing_stats(self):
+        shared_stats = self._create(histograms=True)
+
+        shared_stats.record(1, 2)
+        shared_stats.record(3, 4)
+        snapshot = shared_stats.snapshot()
+
+        self.assertEqual(snapshot.count, 2)
+        self.assertEqual(snapshot.total_runtime, 4)
+        self.assertEqual((snapshot.min_runtime, snapshot.max_runtime), (1, 3))
+        self.assertEqual((snapshot.min_elapsed, snapshot.max_elapsed), (2, 4))
+        self.assertEqual(snapshot.runtime_histogram.count, 2)
+        self.assertEqual(snapshot.runtime_histogram.max, 3)
+        self.assertAlmostEqual(snapshot.elapsed_histogram.p50, 2, delta=.02)
+        self.assertEqual(shared_stats.count, 2)
+        self.assertEqual(shared_stats.as_dict()['mean_elapsed'], 3)
+
+    def test_drop_in_for_stopwatch(self):
+        shared_stats = self._create()
+        timer = StopWatch()
+        timer.stats = shared_stats
+
+        with timer:
+            pass
+
+        self.assertEqual(shared_stats.count, 1)
+        self.assertEqual(list(shared_stats.per_process()), [os.getpid()])
+
+    def test_attached_instances_share_slots(self):
+        shared_stats = self._create(histograms=True)
+        attached = self._attach(shared_stats.name)
+
+        attached.record(1, 2)
+
+        self.assertEqual(shared_stats.count, 1)
+        self.assertTrue(attached.histograms)
+        self.assertEqual(attached.slots, shared_stats.slots)
+
+    def test_attach_rejects_other_blocks(self):
+        block = shared.shared_memory.SharedMemory(create=True, size=64)
+        self.addCleanup(block.unlink)
+        self.addCleanup(block.close)
+
+        with self.assertRaises(ValueError):
+            shared.SharedTimingStats.attach(block.name)
+
+    def test_pickles_by_name(self):
+        shared_stats = self._create()
+
+        copy = pickle.loads(pickle.dumps(shared_stats))
+        self.addCleanup(copy.close)
+        copy.record(1, 2)
+
+        self.assertEqual(copy.name, shared_stats.name)
+        self.assertEqual(shared_stats.count, 1)
+        # The lock is only shared with processes spawned with the instance
+        self.assertIsNone(copy.claim_lock)
+
+    def test_processes_share_claim_lock(self):
+        shared_stats = self._create()
+
+        for method in multiprocessing.get_all_start_methods():
+            worker = multiprocessing.get_context(method).Process(
+                target=_exit_unless_sharing_claim_lock, args=(shared_stats,)
+            )
+            worker.start()
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+
+    def test_claims_slots_under_claim_lock(self):
+        shared_stats = self._create()
+        shared_stats.claim_lock = mock.MagicMock()
+
+        shared_stats.record(1, 2)
+        shared_stats.record(1, 2)
+
+        self.assertEqual(shared_stats.claim_lock.__enter__.call_count, 1)
+
+    def test_merges_processes(self):
+        shared_stats = self._create(slots=4, histograms=True)
+
+        for method in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context(method)
+            workers = [context.Process(target=_record, args=(shared_stats, 100)) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+                self.assertEqual(worker.exitcode, 0)
+
+        snapshot = shared_stats.snapshot()
+        processes = 2 * len(multiprocessing.get_all_start_methods())
+        self.assertEqual(snapshot.count, 100 * processes)
+        self.assertEqual(snapshot.total_runtime, 5050 * processes)
+        self.assertEqual(snapshot.max_elapsed, 200)
+        self.assertEqual(snapshot.runtime_histogram.count, 100 * processes)
+        # Every worker released its slot
+        self.assertEqual(shared_stats.per_process(), {})
+
+    def test_unrelated_process_can_attach(self):
+        shared_stats = self._create()
+        code = 'from timerutil.shared import SharedTimingStats; SharedTimingStats.attach({!r}).record(1, 2)'.format(
+            shared_stats.name
+        )
+
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(shared.__file__)))
+
+        subprocess.check_call([sys.executable, '-c', code], env=env)
+        subprocess.check_call([sys.executable, '-c', code], env=env)
+
+        self.assertEqual(shared_stats.count, 2)
+        self.assertEqual(len(shared_stats.per_process()), 2)
+
+    def test_reclaims_released_and_dead_slots(self):
+        shared_stats = self._create(slots=1)
+        shared_stats.record(1, 2)
+        shared_stats.release()
+
+        # Another process claims the released slot, and adds to its statistics
+        with mock.patch.object(shared.os, 'getpid', return_value=os.getpid() + 1):
+            shared_stats.record(1, 2)
+
+        with mock.patch.object(shared, '_process_exists', return_value=True):
+            with self.assertRaises(RuntimeError):
+                shared_stats.record(1, 2)
+
+        with mock.patch.object(shared, '_process_exists', return_value=False):
+            shared_stats.record(1, 2)
+
+        self.assertEqual(shared_stats.count, 3)
+        self.assertEqual(list(shared_stats.per_process()), [os.getpid()])
+
+    def test_reclaims_slot_taken_by_another_process(self):
+        shared_stats = self._create(slots=2)
+        shared_stats.record(1, 2)
+        offset = shared_stats._offset(shared_stats._slot)
+        shared_stats._ints[offset + shared._SLOT_OWNER] = os.getpid() + 1
+
+        shared_stats.record(1, 2)
+
+        self.assertEqual(shared_stats.per_process()[os.getpid()].count, 1)
+        self.assertEqual(shared_stats.count, 2)
+
+    def test_failed_record_does_not_block_readers(self):
+        shared_stats = self._create(histograms=True)
+
+        with self.assertRaises(ValueError):
+            shared_stats.record(float('nan'), 1)
+        with mock.patch.object(shared_stats._histogram, '_index', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                shared_stats.record(1, 2)
+
+        self.assertEqual(shared_stats.count, 0)
+        shared_stats.record(1, 2)
+        self.assertEqual(shared_stats.snapshot().runtime_histogram.count, 1)
+
+    def test_write_interrupted_mid_way_ends(self):
+        shared_stats = self._create()
+        shared_stats.record(1, 2)
+        offset = shared_stats._offset(shared_stats._slot)
+        begin_write = shared_stats._begin_write
+
+        def interrupted_write(offset):
+            begin_write(offset)
+            raise KeyboardInterrupt()
+
+        with mock.patch.object(shared_stats, '_begin_write', side_effect=interrupted_write):
+            with self.assertRaises(KeyboardInterrupt):
+                shared_stats.record(1, 2)
+
+        self.assertFalse(shared_stats._ints[offset + shared._SLOT_SEQUENCE] % 2)
+        self.assertEqual(shared_stats.count, 1)
+
+    def test_readers_skip_slots_left_mid_write(self):
+        shared_stats = self._create(slots=2)
+        shared_stats.record(1, 2)
+        offset = shared_stats._offset(shared_stats._slot)
+        # The slot's owner is killed mid-write
+        shared_stats._ints[offset + shared._SLOT_SEQUENCE] += 1
+        shared_stats._ints[offset + shared._SLOT_OWNER] = os.getpid() + 1
+
+        with mock.patch.object(shared, '_READ_TIMEOUT', .01):
+            self.assertEqual(shared_stats.count, 0)
+
+        # The dead owner's slot is repaired when another process claims it
+        with mock.patch.object(shared, '_process_exists', return_value=False):
+            shared_stats._ints[shared_stats._offset(1 - shared_stats._slot) + shared._SLOT_OWNER] = os.getpid() + 2
+            shared_stats.record(1, 2)
+        self.assertFalse(shared_stats._ints[offset + shared._SLOT_SEQUENCE] % 2)
+        self.assertEqual(shared_stats.count, 2)
+
+    def test_reset(self):
+        shared_stats = self._create(histograms=True)
+        shared_stats.record(1, 2)
+
+        shared_stats.reset()
+
+        self.assertEqual(shared_stats.count, 0)
+        self.assertEqual(shared_stats.per_process(), {})
+
+        shared_stats.record(3, 4)
+        snapshot = shared_stats.snapshot()
+        self.assertEqual((snapshot.count, snapshot.min_runtime), (1, 3))
+        self.assertEqual(snapshot.runtime_histogram.count, 1)
+
+    def test_snapshot_reset(self):
+        shared_stats = self._create()
+        shared_stats.record(1, 2)
+
+        self.assertEqual(shared_stats.snapshot(reset=True).count, 1)
+        self.assertEqual(shared_stats.count, 0)
+
+    def test_merge(self):
+        shared_stats = self._create(histograms=True)
+        other = shared.TimingStats(histograms=True)
+        other.record(1, 2)
+        other.record(5, 6)
+        shared_stats.record(3, 4)
+
+        shared_stats.merge(other)
+        snapshot = shared_stats.snapshot()
+
+        self.assertEqual(snapshot.count, 3)
+        self.assertEqual((snapshot.min_runtime, snapshot.max_runtime), (1, 5))
+        self.assertEqual(snapshot.elapsed_histogram.count, 3)
+
+    def test_reader_waits_for_writer(self):
+        shared_stats = self._create()
+        shared_stats.record(1, 2)
+        offset = shared_stats._offset(shared_stats._slot)
+        ints = shared_stats._ints
+
+        def finish_write(seconds):
+            ints[offset + shared._SLOT_SEQUENCE] += 1
+
+        # The slot is mid-write, until the reader yields to the writer
+        ints[offset + shared._SLOT_SEQUENCE] += 1
+        with mock.patch.object(shared.time, 'sleep', side_effect=finish_write) as sleep:
+            self.assertEqual(shared_stats.count, 1)
+
+        sleep.assert_called_once_with(0)
+
+    def test_only_creator_unlinks(self):
+        shared_stats = self._create()
+        attached = self._attach(shared_stats.name)
+
+        with self.assertRaises(RuntimeError):
+            attached.unlink()
+
+    def test_invalid_slots(self):
+        with self.assertRaises(ValueError):
+            shared.SharedTimingStats(slots=0)
@@ -0,0 +1,320 @@
+import threading
+import unittest
+from array import array
+
+from timerutil import stats
+
+from tests.compat import mock
+
+
+class TimingStatsTestCase(unittest.TestCase):
+    def test_initial_state(self):
+        timing_stats = stats.TimingStats()
+
+        self.assertEqual(timing_stats.count, 0)
+        self.assertIsNone(timing_stats.min_runtime)
+        self.assertIsNone(timing_stats.max_elapsed)
+        self.assertIsNone(timing_stats.mean_runtime)
+        self.assertIsNone(timing_stats.mean_elapsed)
+
+    def test_record(self):
+        timing_stats = stats.TimingStats()
+
+        timing_stats.record(1, 2)
+        timing_stats.record(3, 4)
+
+        self.assertEqual(timing_stats.as_dict(), {
+            'count': 2,
+            'total_runtime': 4,
+            'min_runtime': 1,
+            'max_runtime': 3,
+            'mean_runtime': 2,
+            'total_elapsed': 6,
+            'min_elapsed': 2,
+            'max_elapsed': 4,
+            'mean_elapsed': 3,
+        })
+
+    def test_reset(self):
+        timing_stats = stats.TimingStats()
+        timing_stats.record(1, 2)
+
+        timing_stats.reset()
+
+        self.assertEqual(timing_stats.count, 0)
+        self.assertEqual(timing_stats.total_runtime, 0)
+        self.assertIsNone(timing_stats.max_runtime)
+
+    def test_record_is_thread_safe(self):
+        timing_stats = stats.TimingStats()
+
+        threads = [
+            threading.Thread(target=lambda: [timing_stats.record(1, 1) for _ in range(10000)]) for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(timing_stats.count, 40000)
+        self.assertEqual(timing_stats.total_runtime, 40000)
+
+
+class TimingStatsHistogramTestCase(unittest.TestCase):
+    def test_histograms_are_disabled_by_default(self):
+        timing_stats = stats.TimingStats()
+
+        self.assertIsNone(timing_stats.runtime_histogram)
+        self.assertIsNone(timing_stats.elapsed_histogram)
+        self.assertNotIn('runtime_histogram', timing_stats.as_dict())
+
+    def test_records_histograms(self):
+        timing_stats = stats.TimingStats(histograms=True)
+
+        timing_stats.record(1, 2)
+
+        self.assertEqual(timing_stats.runtime_histogram.count, 1)
+        self.assertEqual(timing_stats.elapsed_histogram.max, 2)
+        self.assertEqual(timing_stats.as_dict()['runtime_histogram']['p50'], 1)
+
+    def test_merge(self):
+        first = stats.TimingStats(histograms=True)
+        second = stats.TimingStats(histograms=True)
+        first.record(1, 2)
+        second.record(3, 4)
+
+        first.merge(second)
+
+        self.assertEqual(first.count, 2)
+        self.assertEqual(first.min_runtime, 1)
+        self.assertEqual(first.max_elapsed, 4)
+        self.assertEqual(first.runtime_histogram.count, 2)
+        self.assertEqual(second.count, 1)
+
+    def test_snapshot_and_reset(self):
+        timing_stats = stats.TimingStats(histograms=True)
+        timing_stats.record(1, 2)
+
+        snapshot = timing_stats.snapshot(reset=True)
+
+        self.assertEqual(snapshot.count, 1)
+        self.assertEqual(snapshot.runtime_histogram.count, 1)
+        self.assertEqual(timing_stats.count, 0)
+        self.assertEqual(timing_stats.runtime_histogram.count, 0)
+
+
+class LapBufferTestCase(unittest.TestCase):
+    def test_capacity_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            stats.LapBuffer(0)
+
+    def test_records_timestamps_in_order(self):
+        laps = stats.LapBuffer(4)
+
+        for timestamp in (10, 15, 30):
+            laps.record(timestamp)
+
+        self.assertEqual(len(laps), 3)
+        self.assertEqual(laps.dropped, 0)
+        self.assertEqual([list(part) for part in laps.timestamps()], [[10, 15, 30]])
+        self.assertEqual(laps.deltas(), array('q', [5, 15]))
+
+    def test_overwrites_oldest_timestamps_when_full(self):
+        laps = stats.LapBuffer(3)
+
+        for timestamp in range(1, 6):
+            laps.record(timestamp)
+
+        self.assertEqual(len(laps), 3)
+        self.assertEqual(laps.dropped, 2)
+        self.assertEqual([value for part in laps.timestamps() for value in part], [3, 4, 5])
+        self.assertEqual(laps.deltas(), array('q', [1, 1]))
+
+    def test_timestamps_share_memory_with_buffer(self):
+        laps = stats.LapBuffer(2)
+        laps.record(1)
+
+        view, = laps.timestamps()
+        laps.record(2)
+        laps._timestamps[0] = 7
+
+        self.assertEqual(view[0], 7)
+
+    def test_lap_and_split_read_the_clock(self):
+        clock = mock.Mock(side_effect=[100, 250, 400])
+        laps = stats.LapBuffer(2, clock=clock)
+
+        self.assertEqual(laps.split(), 0)
+        laps.lap()
+        self.assertEqual(laps.split(), 150)
+        self.assertEqual([value for part in laps.timestamps() for value in part], [250, 400])
+
+    def test_clear(self):
+        laps = stats.LapBuffer(2)
+        laps.record(1)
+        laps.clear()
+
+        self.assertEqual(len(laps), 0)
+        self.assertEqual(laps.deltas(), array('q'))
+
+    def test_to_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('NumPy is not installed')
+
+        laps = stats.LapBuffer(3)
+        for timestamp in range(1, 5):
+            laps.record(timestamp)
+
+        self.assertEqual(laps.to_numpy().tolist(), [2, 3, 4])
+        self.assertEqual(laps.to_numpy().dtype, numpy.int64)
+
+
+class LogHistogramTestCase(unittest.TestCase):
+    def test_initial_state(self):
+        histogram = stats.LogHistogram()
+
+        self.assertEqual(histogram.count, 0)
+        self.assertIsNone(histogram.min)
+        self.assertIsNone(histogram.mean)
+        self.assertIsNone(histogram.p99)
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            stats.LogHistogram(lowest=0)
+        with self.assertRaises(ValueError):
+            stats.LogHistogram(lowest=2, highest=1)
+
+    def test_percentiles_are_within_precision(self):
+        histogram = stats.LogHistogram(precision=.01)
+        values = [i / 1000.0 for i in range(1, 1001)]
+        for value in values:
+            histogram.record(value)
+
+        for percentile, expected in ((50, .5), (99, .99), (99.9, .999), (100, 1)):
+            self.assertAlmostEqual(histogram.percentile(percentile), expected, delta=expected * .01)
+
+        self.assertEqual(histogram.count, 1000)
+        self.assertEqual(histogram.min, .001)
+        self.assertEqual(histogram.max, 1)
+        self.assertAlmostEqual(histogram.mean, .5005)
+
+    def test_out_of_range_values_are_clamped(self):
+        histogram = stats.LogHistogram(lowest=1, highest=10)
+
+        histogram.record(.5)
+        histogram.record(50)
+
+        self.assertEqual(histogram.percentile(0), 1)
+        self.assertEqual(histogram.percentile(100), 10)
+        self.assertEqual(histogram.max, 50)
+
+    def test_memory_is_fixed(self):
+        histogram = stats.LogHistogram()
+        size = len(histogram._counts)
+
+        for i in range(10000):
+            histogram.record(i / 100.0)
+
+        self.assertEqual(len(histogram._counts), size)
+
+    def test_merge(self):
+        first = stats.LogHistogram()
+        second = stats.LogHistogram()
+        first.record(1)
+        second.record(2)
+
+        first.merge(second)
+
+        self.assertEqual(first.count, 2)
+        self.assertEqual(first.max, 2)
+        self.assertAlmostEqual(first.p99, 2, delta=.02)
+
+    def test_merge_rejects_different_configuration(self):
+        with self.assertRaises(ValueError):
+            stats.LogHistogram().merge(stats.LogHistogram(precision=.1))
+
+    def test_reset(self):
+        histogram = stats.LogHistogram()
+        histogram.record(1)
+
+        histogram.reset()
+
+        self.assertEqual(histogram.count, 0)
+        self.assertEqual(sum(histogram._counts), 0)
+
+
+class ShardedTimingStatsTestCase(unittest.TestCase):
+    def _record_in_threads(self, sharded_stats, threads=4, records=100, while_running=None):
+        barrier = threading.Barrier(threads + 1)
+
+        def record():
+            for _ in range(records):
+                sharded_stats.record(1, 2)
+            barrier.wait()
+            barrier.wait()
+
+        workers = [threading.Thread(target=record) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        if while_running is not None:
+            while_running()
+        barrier.wait()
+        for worker in workers:
+            worker.join()
+
+    def test_records_into_one_shard_per_thread(self):
+        sharded_stats = stats.ShardedTimingStats()
+
+        def check_shards():
+            self.assertEqual(len(sharded_stats._shards), 4)
+            self.assertTrue(all(shard.count == 100 for _, shard in sharded_stats._shards))
+
+        self._record_in_threads(sharded_stats, while_running=check_shards)
+
+    def test_retires_shards_of_exited_threads(self):
+        sharded_stats = stats.ShardedTimingStats(histograms=True)
+
+        for _ in range(3):
+            self._record_in_threads(sharded_stats)
+        sharded_stats.record(1, 2)
+
+        self.assertEqual(len(sharded_stats._shards), 1)
+        self.assertEqual(sharded_stats._retired.count, 1200)
+        self.assertEqual(sharded_stats.count, 1201)
+
+    def test_reads_like_timing_stats(self):
+        sharded_stats = stats.ShardedTimingStats(histograms=True)
+        sharded_stats.record(1, 2)
+        self._record_in_threads(sharded_stats, threads=1, records=1)
+        sharded_stats.record(3, 4)
+
+        self.assertEqual(sharded_stats.total_runtime, 5)
+        self.assertEqual((sharded_stats.min_runtime, sharded_stats.max_runtime), (1, 3))
+        self.assertEqual((sharded_stats.min_elapsed, sharded_stats.max_elapsed), (2, 4))
+        self.assertEqual(sharded_stats.mean_elapsed, 8 / 3.0)
+        self.assertEqual(sharded_stats.runtime_histogram.count, 3)
+        self.assertEqual(sharded_stats.elapsed_histogram.max, 4)
+        self.assertIsNone(stats.ShardedTimingStats().runtime_histogram)
+
+    def test_snapshot_merges_shards(self):
+        sharded_stats = stats.ShardedTimingStats(histograms=True)
+
+        self._record_in_threads(sharded_stats)
+        snapshot = sharded_stats.snapshot()
+
+        self.assertEqual(snapshot.count, 400)
+        self.assertEqual(snapshot.total_elapsed, 800)
+        self.assertEqual(snapshot.runtime_histogram.count, 400)
+        self.assertEqual(sharded_stats.count, 400)
+
+    def test_reset(self):
+        sharded_stats = stats.ShardedTimingStats()
+        self._record_in_threads(sharded_stats)
+
+        sharded_stats.reset()
+
+        self.assertEqual(sharded_stats.count, 0)
+        self.assertEqual(sharded_stats.as_dict()['count'], 0)
@@ -1,4 +1,5 @@
 import signal
+import threading
 import time
 import unittest
 
@@ -14,7 +15,7 @@ class TimeoutManagerInitTestCase(unittest.TestCase):
         self.assertEqual(manager.seconds, 1)
         self.assertEqual(manager.timeout_message, timeouts.DEFAULT_TIMEOUT_MESSAGE)
         self.assertFalse(manager.suppress_errors)
-        self.assertIsNone(manager._original_alarm_handler)
+        self.assertIsNone(manager.last_remaining)
 
     def test_init_with_explicit_args(self):
         manager = timeouts.TimeoutManager(seconds=1, timeout_message='A Message', suppress_timeout_errors=True)
@@ -22,7 +23,6 @@ class TimeoutManagerInitTestCase(unittest.TestCase):
         self.assertEqual(manager.seconds, 1)
         self.assertEqual(manager.timeout_message, 'A Message')
         self.assertTrue(manager.suppress_errors)
-        self.assertIsNone(manager._original_alarm_handler)
 
 
 class TimeoutManagerReprTestCase(unittest.TestCase):
@@ -44,17 +44,47 @@ class TimeoutManagerTimeoutHandlerTestCase(unittest.TestCase):
 
 
 class TimeoutManagerEnterTestCase(unittest.TestCase):
+    def _get_delay_argument_for_mocked_setitimer(self, mock_setitimer):
+        self.assertEqual(mock_setitimer.call_count, 1)
+        (which, delay), _ = mock_setitimer.call_args
+        self.assertEqual(which, signal.ITIMER_REAL)
+        return delay
+
     def test_alarm_handler_is_replaced(self):
         original_handler = signal.getsignal(signal.SIGALRM)
 
-        with timeouts.TimeoutManager(10) as manager:
-            self.assertIs(original_handler, manager._original_alarm_handler)
-            self.assertEqual(signal.getsignal(signal.SIGALRM), manager._timeout_handler)
+        with timeouts.TimeoutManager(10):
+            self.assertIs(original_handler, timeouts.signal_engine._original_alarm_handler)
+            self.assertEqual(signal.getsignal(signal.SIGALRM), timeouts.signal_engine._alarm_handler)
 
     def test_arranges_alarm_arrival(self):
-        with mock.patch('signal.alarm') as mock_alarm:
+        with mock.patch('signal.setitimer', return_value=(0, 0)) as mock_setitimer:
             with timeouts.TimeoutManager(10) as manager:
-                mock_alarm.assert_called_once_with(manager.seconds)
+                delay = self._get_delay_argument_for_mocked_setitimer(mock_setitimer)
+
+        self.assertAlmostEqual(delay, manager.seconds, delta=.1)
+
+    def test_arranges_sub_second_alarm_arrival(self):
+        with mock.patch('signal.setitimer', return_value=(0, 0)) as mock_setitimer:
+            with timeouts.TimeoutManager(.25):
+                delay = self._get_delay_argument_for_mocked_setitimer(mock_setitimer)
+
+        self.assertAlmostEqual(delay, .25, delta=.1)
+
+    def test_nested_alarm_is_armed_for_earliest_deadline(self):
+        with timeouts.TimeoutManager(10):
+            with timeouts.TimeoutManager(.5):
+                delay, _ = signal.getitimer(signal.ITIMER_REAL)
+                self.assertLessEqual(delay, .5)
+
+            delay, _ = signal.getitimer(signal.ITIMER_REAL)
+            self.assertGreater(delay, 9)
+
+    def test_nested_alarm_keeps_earlier_outer_deadline(self):
+        with timeouts.TimeoutManager(.5):
+            with timeouts.TimeoutManager(10):
+                delay, _ = signal.getitimer(signal.ITIMER_REAL)
+                self.assertLessEqual(delay, .5)
 
 
 class TimeoutManagerExitTestCase(unittest.TestCase):
@@ -66,6 +96,68 @@ class TimeoutManagerExitTestCase(unittest.TestCase):
 
         self.assertIs(original_handler, signal.getsignal(signal.SIGALRM))
 
+    def test_alarm_is_disarmed(self):
+        with timeouts.TimeoutManager(10):
+            pass
+
+        self.assertEqual(signal.getitimer(signal.ITIMER_REAL), (0, 0))
+
+    def test_records_last_remaining(self):
+        with timeouts.TimeoutManager(10) as manager:
+            time.sleep(.1)
+
+        self.assertGreater(manager.last_remaining, 0)
+        self.assertLess(manager.last_remaining, 9.9)
+
+    def test_records_no_time_remaining_after_timeout(self):
+        with timeouts.TimeoutManager(.1, suppress_timeout_errors=True) as manager:
+            time.sleep(1)
+
+        self.assertEqual(manager.last_remaining, 0)
+        self.assertTrue(manager.last_timed_out)
+
+    def test_finishing_at_deadline_is_not_timing_out(self):
+        with timeouts.TimeoutManager(10) as manager:
+            # The operation finishes once its deadline has passed, but before the timer fires
+            patcher = mock.patch.object(timeouts, 'get_time', return_value=timeouts.get_time() + 20)
+            patcher.start()
+        patcher.stop()
+
+        self.assertEqual(manager.last_remaining, 0)
+        self.assertFalse(manager.last_timed_out)
+
+    def test_raises_TimeoutError_after_sub_second_timeout(self):
+        start = time.time()
+        with self.assertRaises(timeouts.TimeoutError):
+            with timeouts.TimeoutManager(.1):
+                time.sleep(1)
+
+        self.assertLess(time.time() - start, .5)
+
+    def test_inner_exit_does_not_cancel_outer_deadline(self):
+        with self.assertRaises(timeouts.TimeoutError):
+            with timeouts.TimeoutManager(.2):
+                with timeouts.TimeoutManager(10):
+                    pass
+                time.sleep(1)
+
+    def test_outer_timeout_is_not_suppressed_by_inner_manager(self):
+        with timeouts.TimeoutManager(.2, suppress_timeout_errors=True) as outer:
+            with timeouts.TimeoutManager(10, suppress_timeout_errors=True) as inner:
+                time.sleep(1)
+            self.fail('Inner manager unexpectedly suppressed the outer timeout')
+
+        self.assertEqual(outer.last_remaining, 0)
+        self.assertGreater(inner.last_remaining, 0)
+
+    def test_inner_timeout_is_delivered_to_inner_manager(self):
+        with timeouts.TimeoutManager(10) as outer:
+            with timeouts.TimeoutManager(.1, timeout_message='inner', suppress_timeout_errors=True) as inner:
+                time.sleep(1)
+
+        self.assertEqual(inner.last_remaining, 0)
+        self.assertGreater(outer.last_remaining, 8)
+
     def test_raises_TimeoutError_when_suppress_errors_is_False(self):
         with self.assertRaises(timeouts.TimeoutError) as ctx:
             with timeouts.TimeoutManager(1, suppress_timeout_errors=False) as manager:
@@ -84,3 +176,274 @@ class TimeoutManagerExitTestCase(unittest.TestCase):
         with self.assertRaises(ValueError) as ctx:
             with timeouts.TimeoutManager(1, suppress_timeout_errors=True):
                 raise ValueError('Not a TimeoutError')
+
+
+def _busy_wait(seconds):
+    # Spin in Python bytecode (rather than blocking in C) so that asynchronous exceptions are delivered promptly
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        pass
+
+
+class ThreadTimeoutEngineTestCase(unittest.TestCase):
+    def _run_in_thread(self, func):
+        outcome = {}
+
+        def target():
+            try:
+                outcome['result'] = func()
+            except BaseException as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+        return outcome
+
+    def test_used_by_default_outside_of_main_thread(self):
+        def func():
+            with timeouts.TimeoutManager(10) as manager:
+                return manager._entries[-1].engine
+
+        self.assertIs(self._run_in_thread(func)['result'], timeouts.thread_engine)
+
+    def test_raises_TimeoutError_in_worker_thread(self):
+        def func():
+            with timeouts.TimeoutManager(.1, timeout_message='A Message'):
+                _busy_wait(1)
+
+        error = self._run_in_thread(func)['error']
+
+        self.assertIsInstance(error, timeouts.TimeoutError)
+        self.assertEqual(str(error), 'A Message')
+
+    def test_suppresses_TimeoutError_in_worker_thread(self):
+        def func():
+            with timeouts.TimeoutManager(.1, suppress_timeout_errors=True) as manager:
+                _busy_wait(1)
+            return manager.last_remaining
+
+        self.assertEqual(self._run_in_thread(func), {'result': 0})
+
+    def test_does_not_raise_after_exit(self):
+        def func():
+            with timeouts.TimeoutManager(.1):
+                pass
+            _busy_wait(.3)
+            return True
+
+        self.assertEqual(self._run_in_thread(func), {'result': True})
+
+    def test_nested_outer_timeout_is_not_suppressed_by_inner_manager(self):
+        def func():
+            with timeouts.TimeoutManager(.1, suppress_timeout_errors=True) as outer:
+                with timeouts.TimeoutManager(10, suppress_timeout_errors=True):
+                    _busy_wait(1)
+                return 'not suppressed by outer'
+            return outer.last_remaining
+
+        self.assertEqual(self._run_in_thread(func), {'result': 0})
+
+    def test_can_be_used_from_main_thread(self):
+        with self.assertRaises(timeouts.TimeoutError):
+            with timeouts.TimeoutManager(.1, engine=timeouts.thread_engine):
+                _busy_wait(1)
+
+    def test_decorated_function_is_thread_safe(self):
+        manager = timeouts.TimeoutManager(.2, suppress_timeout_errors=True)
+        results = []
+
+        @manager
+        def func(seconds):
+            _busy_wait(seconds)
+            results.append(seconds)
+
+        threads = [threading.Thread(target=func, args=(seconds,)) for seconds in (0, .05, 1, 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), [0, .05])
+
+
+class CooperativeTimeoutTestCase(unittest.TestCase):
+    def _loop_until_timeout(self, timeout):
+        iterations = 0
+        with timeout:
+            while True:
+                timeout.checkpoint()
+                iterations += 1
+        return iterations
+
+    def test_checkpoint_raises_after_flagged_deadline(self):
+        timeout = timeouts.CooperativeTimeout(.1, timeout_message='too slow')
+        start = time.time()
+
+        with self.assertRaises(timeouts.TimeoutError) as ctx:
+            self._loop_until_timeout(timeout)
+
+        self.assertEqual(str(ctx.exception), 'too slow')
+        self.assertAlmostEqual(time.time() - start, .1, delta=.1)
+        self.assertEqual(timeout.last_remaining, 0)
+
+    def test_checkpoint_polls_clock_every_check_interval(self):
+        timeout = timeouts.CooperativeTimeout(.1, check_interval=100)
+
+        with mock.patch.object(timeouts.cooperative_engine.scheduler, 'schedule') as schedule:
+            with self.assertRaises(timeouts.TimeoutError):
+                self._loop_until_timeout(timeout)
+
+        schedule.assert_not_called()
+
+    def test_check_interval_amortizes_clock_reads(self):
+        timeout = timeouts.CooperativeTimeout(10, check_interval=100)
+
+        with mock.patch.object(timeouts, 'get_time', return_value=0) as get_time:
+            with timeout:
+                get_time.reset_mock()
+                for _ in range(1000):
+                    timeout.checkpoint()
+
+        self.assertEqual(get_time.call_count, 10 + 1)
+
+    def test_check_interval_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            timeouts.CooperativeTimeout(1, check_interval=0)
+
+    def test_suppresses_timeout_errors(self):
+        timeout = timeouts.CooperativeTimeout(.05, suppress_timeout_errors=True)
+
+        self._loop_until_timeout(timeout)
+
+        self.assertEqual(timeout.last_remaining, 0)
+
+    def test_does_not_interrupt_without_checkpoint(self):
+        with timeouts.CooperativeTimeout(.05) as timeout:
+            _busy_wait(.1)
+
+        self.assertEqual(timeout.last_remaining, 0)
+
+    def test_works_in_threads(self):
+        errors = []
+
+        def worker():
+            try:
+                self._loop_until_timeout(timeouts.CooperativeTimeout(.05))
+            except timeouts.TimeoutError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 4)
+
+
+class GracePeriodTestCase(unittest.TestCase):
+    def _run_in_thread(self, func):
+        result = {}
+
+        def target():
+            try:
+                result['value'] = func()
+            except BaseException as e:
+                result['error'] = e
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join(5)
+        return result
+
+    def _soft_then_hard(self, manager, stages):
+        with manager:
+            try:
+                _busy_wait(1)
+            except timeouts.SoftTimeoutError:
+                stages.append('soft')
+                _busy_wait(1)
+
+    def test_soft_timeout_error_requires_grace_period_for_callback(self):
+        with self.assertRaises(ValueError):
+            timeouts.TimeoutManager(1, soft_timeout_callback=lambda: None)
+
+    def test_soft_timeout_error_is_a_timeout_error(self):
+        self.assertTrue(issubclass(timeouts.SoftTimeoutError, timeouts.TimeoutError))
+
+    def test_soft_then_hard_timeout_in_main_thread(self):
+        stages = []
+        start = time.time()
+
+        with self.assertRaises(timeouts.TimeoutError) as ctx:
+            self._soft_then_hard(timeouts.TimeoutManager(.1, grace_period=.1, timeout_message='too slow'), stages)
+
+        self.assertEqual(stages, ['soft'])
+        self.assertNotIsInstance(ctx.exception, timeouts.SoftTimeoutError)
+        self.assertEqual(str(ctx.exception), 'too slow')
+        self.assertAlmostEqual(time.time() - start, .2, delta=.1)
+
+    def test_finishing_within_grace_period(self):
+        manager = timeouts.TimeoutManager(.05, grace_period=1)
+        saved = []
+
+        with manager:
+            try:
+                _busy_wait(1)
+            except timeouts.SoftTimeoutError:
+                saved.append('partial results')
+
+        self.assertEqual(saved, ['partial results'])
+        self.assertEqual(manager.last_remaining, 0)
+        self.assertEqual(signal.getitimer(signal.ITIMER_REAL), (0.0, 0.0))
+
+    def test_soft_timeout_callback_instead_of_error(self):
+        calls = []
+        manager = timeouts.TimeoutManager(
+            .05, grace_period=.05, soft_timeout_callback=lambda: calls.append(time.time()), suppress_timeout_errors=True
+        )
+
+        with manager:
+            _busy_wait(1)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(manager.last_remaining, 0)
+
+    def test_uncaught_soft_timeout_is_suppressed(self):
+        with timeouts.TimeoutManager(.05, grace_period=1, suppress_timeout_errors=True):
+            _busy_wait(1)
+
+    def test_soft_then_hard_timeout_in_thread(self):
+        stages = []
+
+        result = self._run_in_thread(
+            lambda: self._soft_then_hard(timeouts.TimeoutManager(.1, grace_period=.1), stages)
+        )
+
+        self.assertEqual(stages, ['soft'])
+        self.assertIsInstance(result['error'], timeouts.TimeoutError)
+        self.assertNotIsInstance(result['error'], timeouts.SoftTimeoutError)
+
+    def test_cooperative_soft_then_hard_timeout(self):
+        for check_interval in (None, 100):
+            timeout = timeouts.CooperativeTimeout(.05, grace_period=.05, check_interval=check_interval)
+            stages = []
+
+            with self.assertRaises(timeouts.TimeoutError) as ctx:
+                with timeout:
+                    checkpoint = timeout.checkpoint
+                    while True:
+                        try:
+                            checkpoint()
+                        except timeouts.SoftTimeoutError:
+                            stages.append('soft')
+
+            self.assertEqual(stages, ['soft'])
+            self.assertNotIsInstance(ctx.exception, timeouts.SoftTimeoutError)
+
+    def test_deadline_propagates_soft_deadline(self):
+        from timerutil import deadlines
+
+        with timeouts.TimeoutManager(1, grace_period=10):
+            self.assertLessEqual(deadlines.remaining(), 1)
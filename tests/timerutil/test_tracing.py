@@ -0,0 +1,154 @@
+import contextvars
+import io
+import json
+import threading
+import unittest
+
+from timerutil import compat, tracing
+
+from tests.compat import mock
+
+
+class TracerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000
+        self.clock = compat.Clock('fake', mock.Mock(), time_ns=lambda: self.now)
+        self.tracer = tracing.Tracer(capacity=8, clock=self.clock)
+
+    def advance(self, ns):
+        self.now += ns
+
+    def record_request(self):
+        with self.tracer.span('request'):
+            self.advance(1000)
+            with self.tracer.span('query'):
+                self.advance(3000)
+            with self.tracer.span('render'):
+                self.advance(2000)
+                with self.tracer.span('query'):
+                    self.advance(1000)
+
+    def test_validates_capacity(self):
+        with self.assertRaises(ValueError):
+            tracing.Tracer(capacity=0)
+
+    def test_spans_form_a_tree(self):
+        self.record_request()
+
+        spans = self.tracer.spans()
+
+        self.assertEqual([span.name for span in spans], ['request', 'query', 'render', 'query'])
+        self.assertEqual([span.parent for span in spans], [None, 0, 0, 2])
+        self.assertEqual([span.inclusive_time for span in spans], [7e-6, 3e-6, 3e-6, 1e-6])
+        self.assertEqual([span.exclusive_time for span in spans], [1e-6, 3e-6, 2e-6, 1e-6])
+        self.assertEqual(spans[0].thread_id, threading.current_thread().ident)
+
+    def test_collapsed_aggregates_exclusive_time_by_stack(self):
+        self.record_request()
+        self.record_request()
+
+        self.assertEqual(
+            self.tracer.collapsed(),
+            'request 2\nrequest;query 6\nrequest;render 4\nrequest;render;query 2\n'
+        )
+
+    def test_collapsed_escapes_separators(self):
+        with self.tracer.span('a;b'):
+            self.advance(1000)
+
+        self.assertEqual(self.tracer.collapsed(), 'a:b 1\n')
+
+    def test_chrome_trace(self):
+        self.record_request()
+        output = io.StringIO()
+
+        self.tracer.write_chrome_trace(output)
+
+        events = json.loads(output.getvalue())['traceEvents']
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events[0]['name'], 'request')
+        self.assertEqual(events[0]['ph'], 'X')
+        self.assertEqual(events[0]['ts'], 1.0)
+        self.assertEqual(events[0]['dur'], 7.0)
+
+    def test_open_spans_are_not_exported(self):
+        with self.tracer.span('outer'):
+            with self.tracer.span('inner'):
+                self.advance(1000)
+
+            self.assertEqual([span.name for span in self.tracer.spans()], ['inner'])
+
+    def test_full_tracer_drops_spans(self):
+        for _ in range(10):
+            with self.tracer.span('step'):
+                self.advance(1)
+
+        self.assertEqual(len(self.tracer), 8)
+        self.assertEqual(self.tracer.dropped, 2)
+        self.assertEqual(len(self.tracer.spans()), 8)
+
+        self.tracer.clear()
+        self.assertEqual(len(self.tracer), 0)
+        self.assertEqual(self.tracer.dropped, 0)
+        self.assertEqual(self.tracer.spans(), [])
+
+    def test_threads_start_without_a_parent(self):
+        tracer = tracing.Tracer()
+
+        def work():
+            with tracer.span('worker'):
+                pass
+
+        with tracer.span('main'):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+        spans = dict((span.name, span) for span in tracer.spans())
+        self.assertIsNone(spans['worker'].parent)
+        self.assertNotEqual(spans['worker'].thread_id, spans['main'].thread_id)
+
+    def test_threads_in_a_copied_context_nest_under_the_open_span(self):
+        tracer = tracing.Tracer()
+
+        def work():
+            with tracer.span('worker'):
+                pass
+
+        with tracer.span('main'):
+            thread = threading.Thread(target=contextvars.copy_context().run, args=(work,))
+            thread.start()
+            thread.join()
+
+        spans = dict((span.name, span) for span in tracer.spans())
+        self.assertEqual(spans['worker'].parent, spans['main'].index)
+
+    def test_tracers_nest_independently(self):
+        other = tracing.Tracer(capacity=8, clock=self.clock)
+
+        with self.tracer.span('outer'):
+            with other.span('other'):
+                with self.tracer.span('inner'):
+                    pass
+
+        self.assertEqual([span.parent for span in self.tracer.spans()], [None, 0])
+        self.assertEqual([span.parent for span in other.spans()], [None])
+
+    def test_tracers_do_not_grow_the_context(self):
+        with self.tracer.span('first'):
+            pass
+        size = len(contextvars.copy_context())
+
+        for _ in range(100):
+            with tracing.Tracer(capacity=1).span('span'):
+                pass
+
+        self.assertEqual(len(contextvars.copy_context()), size)
+
+
+class DefaultTracerTestCase(unittest.TestCase):
+    def test_created_on_first_use(self):
+        with mock.patch.object(tracing, '_default_tracer', None):
+            tracer = tracing.get_default_tracer()
+            self.assertIsInstance(tracer, tracing.Tracer)
+            self.assertIs(tracing.get_default_tracer(), tracer)
@@ -1,7 +1,9 @@
+import contextvars
+import threading
 import time
 import unittest
 
-from timerutil import waits
+from timerutil import compat, scheduling, tracing, waits
 
 from tests.compat import mock
 
@@ -157,3 +159,456 @@ class StopWatchSetAttrTestCase(unittest.TestCase):
             timer.last_elapsed = 1
         except Exception as e:
             self.fail('{} unexpectedly raised'.format(repr(e)))
+
+
+class ObservableWaiterConcurrencyTestCase(unittest.TestCase):
+    def test_concurrent_calls_keep_separate_state(self):
+        waiter = waits.ObservableWaiter(.2)
+        results = {}
+
+        @waiter
+        def func(seconds):
+            time.sleep(seconds)
+
+        def target(seconds):
+            func(seconds)
+            results[seconds] = (waiter.last_runtime, waiter.last_elapsed)
+
+        threads = [threading.Thread(target=target, args=(seconds,)) for seconds in (0, .05, .1, .3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for seconds, (runtime, elapsed) in results.items():
+            self.assertAlmostEqual(runtime, seconds, delta=.04)
+            self.assertAlmostEqual(elapsed, max(seconds, .2), delta=.04)
+
+    def test_nested_calls_keep_separate_state(self):
+        waiter = waits.ObservableWaiter(0)
+
+        with waiter:
+            outer_start = waiter._start_time
+            with waiter:
+                self.assertGreaterEqual(waiter._start_time, outer_start)
+            time.sleep(.1)
+            self.assertEqual(waiter._start_time, outer_start)
+
+        self.assertGreaterEqual(waiter.last_runtime, .1)
+
+    def test_last_stats_fall_back_to_other_threads(self):
+        waiter = waits.ObservableWaiter(0)
+
+        thread = threading.Thread(target=waiter(lambda: None))
+        thread.start()
+        thread.join()
+
+        self.assertIsNotNone(waiter.last_runtime)
+        self.assertIsNotNone(waiter.last_elapsed)
+
+    def test_aggregates_stats_across_threads(self):
+        waiter = waits.ObservableWaiter(0)
+        func = waiter(lambda: None)
+
+        threads = [threading.Thread(target=lambda: [func() for _ in range(100)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(waiter.stats.count, 800)
+        self.assertLessEqual(waiter.stats.min_runtime, waiter.stats.max_runtime)
+        self.assertGreaterEqual(waiter.stats.total_elapsed, waiter.stats.total_runtime)
+
+    def test_fresh_instances_do_not_grow_context(self):
+        def use_fresh_instances():
+            for _ in range(1000):
+                with waits.ObservableWaiter(0):
+                    pass
+            return len(contextvars.copy_context())
+
+        context_size = contextvars.copy_context().run(use_fresh_instances)
+
+        self.assertLessEqual(context_size, len(contextvars.copy_context()) + 2)
+
+    def test_reused_variables_ignore_stale_records(self):
+        waiter = waits.ObservableWaiter(0)
+        with waiter:
+            pass
+        var = waiter._last_call_var
+        del waiter
+
+        reused = waits.ObservableWaiter(0)
+
+        self.assertIs(reused._last_call_var, var)
+        self.assertIsNone(reused.last_elapsed)
+
+    def test_out_of_order_exits(self):
+        outer = waits.ObservableWaiter(0)
+        inner = waits.ObservableWaiter(0)
+
+        outer.__enter__()
+        inner.__enter__()
+        outer.__exit__(None, None, None)
+        inner.__exit__(None, None, None)
+
+        self.assertIsNotNone(outer.last_elapsed)
+        self.assertIsNotNone(inner.last_elapsed)
+        self.assertEqual(waits._active_calls.get(), ())
+
+
+class WaiterPrecisionTestCase(unittest.TestCase):
+    def test_precise_is_disabled_by_default(self):
+        self.assertFalse(waits.Waiter(1).precise)
+
+    def test_precise_wait_does_not_exit_early(self):
+        waiter = waits.ObservableWaiter(.05, precise=True)
+
+        for _ in range(5):
+            with waiter:
+                pass
+            self.assertGreaterEqual(waiter.last_elapsed, waiter.minimum_time)
+            self.assertGreaterEqual(waiter.last_error, 0)
+
+    def test_precise_wait_spins_for_final_margin(self):
+        waiter = waits.Waiter(.05, precise=True)
+        margin = waits._sleep_calibrator.margin
+
+        with mock.patch('time.sleep', side_effect=time.sleep) as mock_sleep:
+            with waiter:
+                pass
+
+        coarse_sleep = mock_sleep.call_args_list[0][0][0]
+        self.assertAlmostEqual(coarse_sleep, waiter.minimum_time - margin, delta=.01)
+        self.assertLess(coarse_sleep, waiter.minimum_time)
+        self.assertTrue(all(call[0][0] == 0 for call in mock_sleep.call_args_list[1:]))
+
+    def test_records_last_error(self):
+        waiter = waits.ObservableWaiter(.05)
+
+        with waiter:
+            pass
+
+        self.assertAlmostEqual(waiter.last_error, waiter.last_elapsed - waiter.minimum_time)
+
+
+class SleepCalibratorTestCase(unittest.TestCase):
+    def test_calibrates_margin_lazily(self):
+        calibrator = waits._SleepCalibrator()
+
+        self.assertIsNone(calibrator._margin)
+        self.assertGreaterEqual(calibrator.margin, waits._MINIMUM_SPIN_MARGIN)
+        self.assertLessEqual(calibrator.margin, waits._MAXIMUM_SPIN_MARGIN)
+
+    def test_margin_follows_observed_overshoot(self):
+        calibrator = waits._SleepCalibrator(samples=16, safety_factor=1)
+
+        for _ in range(16):
+            calibrator.observe(.002)
+
+        self.assertAlmostEqual(calibrator.margin, .002)
+
+    def test_margin_is_bounded(self):
+        calibrator = waits._SleepCalibrator(samples=8)
+
+        for _ in range(8):
+            calibrator.observe(10)
+
+        self.assertEqual(calibrator.margin, waits._MAXIMUM_SPIN_MARGIN)
+
+
+class AdaptiveWaiterTestCase(unittest.TestCase):
+    def _observe(self, waiter, runtimes):
+        # Feed runtimes to the waiter without actually waiting
+        for runtime in runtimes:
+            call = waits._WaiterCall(0)
+            call.runtime = runtime
+            call.elapsed = max(runtime, waiter.minimum_time)
+            with mock.patch.object(waits, 'get_time', return_value=call.elapsed):
+                waiter._record_elapsed(call)
+
+    def test_initial_state(self):
+        waiter = waits.AdaptiveWaiter(.5)
+
+        self.assertEqual(waiter.minimum_time, .5)
+        self.assertEqual(waiter.overruns, 0)
+        self.assertEqual(waiter.overrun_rate, 0)
+
+    def test_rejects_non_positive_initial_time(self):
+        with self.assertRaises(ValueError):
+            waits.AdaptiveWaiter(0)
+
+    def test_target_is_not_updated_between_intervals(self):
+        waiter = waits.AdaptiveWaiter(.5, update_interval=10)
+
+        self._observe(waiter, [.1] * 9)
+
+        self.assertEqual(waiter.minimum_time, .5)
+
+    def test_target_decreases_by_bounded_steps(self):
+        waiter = waits.AdaptiveWaiter(1, update_interval=10, max_step=.1)
+
+        self._observe(waiter, [.1] * 10)
+        self.assertAlmostEqual(waiter.minimum_time, .9)
+
+        self._observe(waiter, [.1] * 10)
+        self.assertAlmostEqual(waiter.minimum_time, .81)
+
+    def test_target_converges_on_percentile_plus_margin(self):
+        waiter = waits.AdaptiveWaiter(1, percentile=.9, margin=.5, window=100, update_interval=10, max_step=.5)
+
+        self._observe(waiter, [.1] * 90 + [.2] * 10 + [.1] * 90 + [.2] * 10)
+
+        self.assertAlmostEqual(waiter.minimum_time, .15)
+
+    def test_target_is_rounded_up_to_granularity(self):
+        waiter = waits.AdaptiveWaiter(.1, margin=0, update_interval=10, max_step=1, granularity=.01)
+
+        self._observe(waiter, [.0712] * 10)
+
+        self.assertAlmostEqual(waiter.minimum_time, .08)
+
+    def test_target_is_clamped(self):
+        waiter = waits.AdaptiveWaiter(.1, update_interval=1, max_step=1, floor=.05, ceiling=.15)
+
+        self._observe(waiter, [.001])
+        self.assertAlmostEqual(waiter.minimum_time, .05)
+
+        self._observe(waiter, [1] * 5)
+        self.assertAlmostEqual(waiter.minimum_time, .15)
+
+    def test_counts_overruns(self):
+        waiter = waits.AdaptiveWaiter(.5, update_interval=1000)
+
+        self._observe(waiter, [.1, .6, .2, .7])
+
+        self.assertEqual(waiter.overruns, 2)
+        self.assertEqual(waiter.overrun_rate, .5)
+
+    def test_pads_wrapped_operation_to_target(self):
+        waiter = waits.AdaptiveWaiter(.05)
+
+        with waiter:
+            pass
+
+        self.assertGreaterEqual(waiter.last_elapsed, .05)
+
+
+class StopWatchHistogramTestCase(unittest.TestCase):
+    def test_records_histograms_when_enabled(self):
+        timer = waits.StopWatch(histograms=True)
+
+        for _ in range(10):
+            with timer:
+                pass
+
+        self.assertEqual(timer.stats.runtime_histogram.count, 10)
+        self.assertEqual(timer.stats.elapsed_histogram.count, 10)
+
+
+class StopWatchLapTestCase(unittest.TestCase):
+    def test_laps_disabled_by_default(self):
+        timer = waits.StopWatch()
+
+        self.assertIsNone(timer.laps)
+        with self.assertRaises(RuntimeError):
+            timer.lap()
+        with self.assertRaises(RuntimeError):
+            timer.split()
+
+    def test_lap_and_split_record_timestamps(self):
+        timer = waits.StopWatch(laps=8)
+
+        with timer:
+            timer.lap()
+            time.sleep(.01)
+            split = timer.split()
+
+        self.assertEqual(len(timer.laps), 2)
+        self.assertGreaterEqual(split, 10 ** 7)
+        self.assertEqual(list(timer.laps.deltas()), [split])
+
+
+class WaiterClockTestCase(unittest.TestCase):
+    def test_uses_given_clock(self):
+        clock = compat.get_clock('perf_counter')
+        waiter = waits.ObservableWaiter(.01, clock='perf_counter')
+
+        with waiter:
+            pass
+
+        self.assertIs(waiter.clock, clock)
+        self.assertGreaterEqual(waiter.last_elapsed, .01)
+
+    def test_cpu_clock_cannot_enforce_minimum_time(self):
+        with self.assertRaises(ValueError):
+            waits.Waiter(1, clock='process_time')
+
+    def test_stopwatch_measures_cpu_time(self):
+        timer = waits.StopWatch(clock='process_time')
+
+        with timer:
+            time.sleep(.05)
+
+        self.assertLess(timer.last_runtime, .05)
+
+    def test_stopwatch_subtracts_clock_overhead(self):
+        clock = compat.Clock('fake', mock.Mock(side_effect=[10.0, 10.5, 10.5, 10.5]))
+        clock._overhead = .25
+        timer = waits.StopWatch(clock=clock, subtract_overhead=True)
+
+        with timer:
+            pass
+
+        self.assertEqual(timer.last_runtime, .25)
+        self.assertEqual(timer.last_elapsed, .5)
+
+
+class WaiterSchedulerTestCase(unittest.TestCase):
+    def test_default_scheduler(self):
+        self.assertIsNone(waits.Waiter(1).scheduler)
+        self.assertIs(waits.Waiter(1, scheduler=True).scheduler, waits.default_sleep_scheduler)
+
+    def test_concurrent_waiters_share_scheduler(self):
+        sleeper = scheduling.SleepScheduler(window=.01)
+        waiter = waits.ObservableWaiter(.1, scheduler=sleeper)
+
+        threads = [threading.Thread(target=waiter(lambda: None)) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(waiter.stats.count, 50)
+        self.assertGreaterEqual(waiter.stats.min_elapsed, .1)
+        self.assertLess(waiter.stats.max_elapsed, .5)
+
+    def test_precise_waiter_with_scheduler(self):
+        waiter = waits.ObservableWaiter(.05, precise=True, scheduler=scheduling.SleepScheduler(window=.01))
+
+        with waiter:
+            pass
+
+        self.assertGreaterEqual(waiter.last_elapsed, .05)
+
+
+class _FakeTime(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep_until(self, target):
+        self.now = max(self.now, target)
+
+
+class TickerTestCase(unittest.TestCase):
+    def _ticker(self, policy='burst', interval=1):
+        fake_time = _FakeTime()
+        ticker = waits.Ticker(interval, policy=policy, clock=compat.Clock('fake', fake_time))
+        ticker._waiter._sleep_until = fake_time.sleep_until
+        return ticker, fake_time
+
+    def test_validates_arguments(self):
+        with self.assertRaises(ValueError):
+            waits.Ticker(0)
+        with self.assertRaises(ValueError):
+            waits.Ticker(1, policy='panic')
+
+    def test_ticks_against_absolute_schedule(self):
+        ticker, fake_time = self._ticker()
+
+        self.assertEqual(ticker.wait(), 0)
+        for expected in range(1, 5):
+            # Work which takes a varying part of each interval does not shift later ticks
+            fake_time.now += .3
+            self.assertEqual(ticker.wait(), expected)
+            self.assertEqual(fake_time.now, 100 + expected)
+
+        self.assertEqual(ticker.ticks, 5)
+        self.assertEqual(ticker.lag.max, 0)
+
+    def test_burst_fires_missed_ticks_immediately(self):
+        ticker, fake_time = self._ticker('burst')
+        ticker.wait()
+
+        fake_time.now += 3.5
+        indices = [ticker.wait() for _ in range(4)]
+
+        self.assertEqual(indices, [1, 2, 3, 4])
+        self.assertEqual(fake_time.now, 104)
+        self.assertEqual(ticker.missed, 0)
+        self.assertAlmostEqual(ticker.lag.max, 2.5, delta=.05)
+
+    def test_skip_drops_missed_ticks(self):
+        ticker, fake_time = self._ticker('skip')
+        ticker.wait()
+
+        fake_time.now += 3.5
+
+        self.assertEqual(ticker.wait(), 4)
+        self.assertEqual(fake_time.now, 104)
+        self.assertEqual(ticker.missed, 3)
+
+    def test_coalesce_fires_one_tick_for_missed_ticks(self):
+        ticker, fake_time = self._ticker('coalesce')
+        ticker.wait()
+
+        fake_time.now += 3.5
+
+        self.assertEqual(ticker.wait(), 3)
+        self.assertEqual(fake_time.now, 103.5)
+        self.assertEqual(ticker.missed, 2)
+        self.assertEqual(ticker.wait(), 4)
+        self.assertEqual(fake_time.now, 104)
+
+    def test_slightly_late_ticks_fire_under_every_policy(self):
+        for policy in waits.Ticker.POLICIES:
+            ticker, fake_time = self._ticker(policy)
+            ticker.wait()
+
+            fake_time.now += 1.5
+
+            self.assertEqual(ticker.wait(), 1)
+            self.assertEqual(ticker.missed, 0)
+
+    def test_reset(self):
+        ticker, fake_time = self._ticker()
+        ticker.wait()
+        ticker.wait()
+
+        ticker.reset()
+
+        self.assertIsNone(ticker.start)
+        self.assertEqual(ticker.ticks, 0)
+        self.assertEqual(ticker.wait(), 0)
+
+    def test_pace_does_not_drift(self):
+        start = time.time()
+
+        items = list(waits.Waiter(0).pace(range(11), interval=.02))
+
+        self.assertEqual(items, list(range(11)))
+        self.assertAlmostEqual(time.time() - start, .2, delta=.05)
+
+
+class StopWatchTracerTestCase(unittest.TestCase):
+    def test_nested_stopwatches_record_spans(self):
+        tracer = tracing.Tracer()
+        inner = waits.StopWatch(name='inner', tracer=tracer)
+
+        @waits.StopWatch(tracer=tracer)
+        def outer():
+            with inner:
+                pass
+
+        outer()
+
+        spans = tracer.spans()
+        self.assertEqual([span.name for span in spans], [outer.__qualname__, 'inner'])
+        self.assertEqual(spans[1].parent, spans[0].index)
+
+    def test_no_spans_without_tracer(self):
+        self.assertIsNone(waits.StopWatch().tracer)
+        self.assertIs(waits.StopWatch(tracer=True).tracer, tracing.get_default_tracer())
@@ -0,0 +1,114 @@
+import threading
+import time
+import unittest
+
+from timerutil import timeouts, waits, watchdog
+
+from tests.compat import mock
+
+
+def _busy_wait(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+def _stuck_here(seconds):
+    _busy_wait(seconds)
+
+
+class WatchdogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.logger = mock.Mock()
+        self.watchdog = watchdog.Watchdog(interval=.005, warning_fraction=.5, stall_threshold=.02, logger=self.logger)
+
+    def test_validates_arguments(self):
+        with self.assertRaises(ValueError):
+            watchdog.Watchdog(interval=0)
+        with self.assertRaises(ValueError):
+            watchdog.Watchdog(warning_fraction=0)
+
+    def test_registry(self):
+        block = self.watchdog.watch('block', 10)
+        self.assertEqual(len(self.watchdog), 1)
+
+        self.watchdog.unwatch(block)
+        self.assertEqual(len(self.watchdog), 0)
+        self.logger.error.assert_not_called()
+
+    def test_logs_stack_at_warning_fraction(self):
+        with timeouts.TimeoutManager(1, watchdog=self.watchdog):
+            _stuck_here(.6)
+
+        self.assertEqual(self.logger.warning.call_count, 1)
+        stack = self.logger.warning.call_args[0][-1]
+        self.assertIn('_stuck_here', stack)
+        self.logger.error.assert_not_called()
+
+    def test_fast_blocks_are_not_logged(self):
+        with timeouts.TimeoutManager(1, watchdog=self.watchdog):
+            pass
+        time.sleep(.02)
+
+        self.logger.warning.assert_not_called()
+
+    def test_attaches_stack_to_timeout_error(self):
+        with self.assertRaises(timeouts.TimeoutError) as ctx:
+            with timeouts.TimeoutManager(.05, watchdog=self.watchdog):
+                _stuck_here(1)
+
+        self.assertIn('_stuck_here', ctx.exception.stack)
+        self.assertEqual(self.logger.error.call_count, 1)
+        self.assertIn('_stuck_here', self.logger.error.call_args[0][-1])
+
+    def test_attaches_stack_in_thread(self):
+        result = {}
+
+        def target():
+            try:
+                with timeouts.TimeoutManager(.05, watchdog=self.watchdog):
+                    _stuck_here(1)
+            except timeouts.TimeoutError as e:
+                result['error'] = e
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join(5)
+
+        self.assertIn('_stuck_here', result['error'].stack)
+
+    def test_attaches_stack_to_cooperative_timeout_error(self):
+        with self.assertRaises(timeouts.TimeoutError) as ctx:
+            with timeouts.CooperativeTimeout(.02, check_interval=1000, watchdog=self.watchdog) as timeout:
+                while True:
+                    timeout.checkpoint()
+
+        self.assertIn('checkpoint', ctx.exception.stack)
+
+    def test_stalled_stopwatch(self):
+        with waits.StopWatch(name='export', watchdog=self.watchdog):
+            _stuck_here(.1)
+
+        self.assertEqual(self.logger.warning.call_count, 1)
+        self.assertEqual(self.logger.warning.call_args[0][1], 'export')
+        self.assertEqual(len(self.watchdog), 0)
+
+    def test_default_watchdog_reports_stalled_stopwatches(self):
+        default = watchdog.default_watchdog
+
+        with mock.patch.object(default, 'logger', self.logger):
+            with waits.StopWatch(name='export', watchdog=True) as timer:
+                block = timer._current_call().watch
+                default.check(now=block.started + watchdog.DEFAULT_STALL_THRESHOLD)
+
+        self.assertEqual(self.logger.warning.call_count, 1)
+        self.assertEqual(self.logger.warning.call_args[0][1], 'export')
+
+    def test_check_logs_expiry_of_blocks_which_have_not_exited(self):
+        block = self.watchdog.watch('stuck', 1)
+
+        self.watchdog.check(now=block.started + 2)
+        self.watchdog.unwatch(block)
+
+        self.assertEqual(self.logger.error.call_count, 1)
+        self.assertIn('test_check_logs_expiry', block.expiry_stack)
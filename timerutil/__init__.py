@@ -1,9 +1,21 @@
 from timerutil.compat import TimeoutError
-from timerutil.timeouts import TimeoutManager
+from timerutil.deadlines import (
+    Deadline,
+    remaining
+)
+from timerutil.registry import timer
+from timerutil.timeouts import (
+    SoftTimeoutError,
+    TimeoutManager
+)
 from timerutil.waits import Waiter
 
 
 __all__ = [
+    'Deadline',
+    'remaining',
+    'SoftTimeoutError',
+    'timer',
     'TimeoutError',
     'TimeoutManager',
     'Waiter'
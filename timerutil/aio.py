@@ -0,0 +1,446 @@
+"""Provides :mod:`asyncio`-native counterparts of the context managers/decorators found in :mod:`timerutil.waits`
+and :mod:`timerutil.timeouts`.
+
+These behave the same as their synchronous counterparts, but are used with ``async with`` (or to decorate
+coroutine functions), and never block the event loop: waits are scheduled with :func:`asyncio.sleep`,
+and timeouts cancel the task which entered them (then raise :exc:`TimeoutError` in place of the cancellation).
+
+For example, to pad the response time of an asynchronous request handler:
+    .. code-block:: python
+
+        @AsyncWaiter(2)
+        async def reset_password(request):
+            ...
+
+.. note:: This module requires Python 3.7 or later.
+"""
+import asyncio
+import contextvars
+import functools
+
+from timerutil.compat import (
+    get_time,
+    TimeoutError
+)
+from timerutil.deadlines import (
+    _pop_scope,
+    _push_scope
+)
+from timerutil.limits import (
+    GCRA,
+    TokenBucket
+)
+from timerutil.retries import (
+    Attempt,
+    Retry
+)
+from timerutil.timeouts import (
+    _TimerEntry,
+    TimeoutManager
+)
+from timerutil.waits import (
+    _sleep_calibrator,
+    ObservableWaiter,
+    StopWatch,
+    Waiter
+)
+
+__all__ = [
+    'AsyncContextDecorator',
+    'AsyncGCRA',
+    'AsyncObservableWaiter',
+    'AsyncRetry',
+    'AsyncStopWatch',
+    'AsyncTimeoutManager',
+    'AsyncTokenBucket',
+    'AsyncWaiter'
+]
+
+# The deadlines of every `AsyncTimeoutManager` which the current task has entered (and not yet exited)
+_active_timeouts = contextvars.ContextVar('timerutil_active_timeouts', default=())
+
+
+class AsyncContextDecorator(object):
+    """A base class or mixin that enables asynchronous context managers to work as decorators of coroutine functions.
+
+    This is the asynchronous equivalent of :class:`~timerutil.compat.ContextDecorator`.
+    """
+
+    def _recreate_cm(self):
+        """Return a recreated instance of self (see :meth:`timerutil.compat.ContextDecorator._recreate_cm`)."""
+        return self
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        async def inner(*args, **kwds):
+            async with self._recreate_cm():
+                return await func(*args, **kwds)
+
+        return inner
+
+
+class AsyncWaiter(AsyncContextDecorator, Waiter):
+    """Asynchronous context manager/decorator which prevents an operation
+    from finishing before a given number of seconds has elapsed, without blocking the event loop.
+
+    Usage as a decorator:
+        .. code-block:: python
+
+            @AsyncWaiter(10)
+            async def take_ten():
+                print('Starting to wait')
+
+            await take_ten()
+            # Ten seconds later...
+            print('Done waiting!')
+
+    Usage as a context manager:
+        .. code-block:: python
+
+            async with AsyncWaiter(10):
+                print('Starting to wait')
+
+            # Ten seconds later...
+            print('Done waiting!')
+    """
+
+    async def __aenter__(self):
+        """Begins a countdown for the configured duration
+
+        :return: This :class:`~AsyncWaiter` instance
+        :rtype: AsyncWaiter
+        """
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Suspends the current task until the configured duration has elapsed
+        """
+        call = self._exit_call()
+        await self._sleep_until_async(call.start_time + self.minimum_time)
+
+    async def _sleep_until_async(self, target):
+        """Suspends the current task until the given time (see :meth:`~timerutil.waits.Waiter._sleep_until`)
+
+        :param target: The time (according to :attr:`clock`) until which to wait
+        :type target: float
+        """
+        get_time = self._get_time
+        if not self.precise:
+            remaining = target - get_time()
+            if remaining > 0:
+                await self._sleep_async(remaining)
+            return
+
+        spin_start = target - _sleep_calibrator.margin
+        remaining = spin_start - get_time()
+        if remaining > 0:
+            await self._sleep_async(remaining)
+            _sleep_calibrator.observe(get_time() - spin_start)
+
+        while get_time() < target:
+            # Yield to other tasks while spinning
+            await asyncio.sleep(0)
+
+    async def _sleep_async(self, seconds):
+        """Suspends the current task for the given number of seconds, through the Waiter's
+        :class:`~timerutil.scheduling.SleepScheduler` if it has one
+        """
+        if self.scheduler is None:
+            await asyncio.sleep(seconds)
+        else:
+            await asyncio.wrap_future(self.scheduler.future(get_time() + seconds))
+
+
+class AsyncObservableWaiter(AsyncWaiter, ObservableWaiter):
+    """An :class:`~AsyncWaiter` subclass which records the same usage statistics
+    as :class:`~timerutil.waits.ObservableWaiter`.
+
+    Usage as a context manager:
+        .. code-block:: python
+
+            async with AsyncObservableWaiter(10) as ten_second_waiter:
+                print('Starting to wait')
+
+            print('Done waiting after', ten_second_waiter.last_elapsed, 'seconds')
+    """
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        call = self._record_runtime()
+        await super(AsyncObservableWaiter, self).__aexit__(exc_type, exc_val, exc_tb)
+        self._record_elapsed(call)
+
+
+class AsyncStopWatch(AsyncObservableWaiter, StopWatch):
+    """Asynchronous context manager/decorator for observing the execution time of wrapped operations,
+    without enforcing a minimum time (see :class:`~timerutil.waits.StopWatch`).
+
+    Usage as a decorator:
+        .. code-block:: python
+
+            timer = AsyncStopWatch()
+
+            @timer
+            async def watch_this():
+                ...
+
+            await watch_this()
+            logging.log(logging.INFO, 'Watched watch_this() for %r seconds', timer.last_runtime)
+
+    Spans are recorded the same as for :class:`~timerutil.waits.StopWatch`; each task nests its spans under the span
+    that was open when the task was created.
+    """
+
+    def __call__(self, func):
+        if self.name is None:
+            self.name = getattr(func, '__qualname__', func.__name__)
+        return super(AsyncStopWatch, self).__call__(func)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        call = self._current_call()
+        if self.tracer is not None:
+            self.tracer.finish(call.span)
+        if call.watch is not None:
+            self.watchdog.unwatch(call.watch)
+        await super(AsyncStopWatch, self).__aexit__(exc_type, exc_val, exc_tb)
+
+
+class AsyncTimeoutManager(AsyncContextDecorator, TimeoutManager):
+    """Asynchronous context manager/decorator for putting time restrictions on coroutines.
+
+    When the timeout expires, the task which entered the block is cancelled, and the resulting
+    :exc:`asyncio.CancelledError` is replaced by a :exc:`TimeoutError` (or suppressed, if so configured)
+    as it leaves the block. Nested blocks behave the same as nested :class:`~timerutil.timeouts.TimeoutManager` blocks.
+
+    Usage as a context manager:
+        .. code-block:: python
+
+            try:
+                async with AsyncTimeoutManager(0.25):
+                    await something_that_should_not_exceed_a_quarter_second()
+            except TimeoutError:
+                print("Got a timeout, couldn't finish")
+
+    Usage as a decorator:
+        .. code-block:: python
+
+            @AsyncTimeoutManager(10, suppress_timeout_errors=True)
+            async def something_that_should_not_exceed_ten_seconds():
+                await asyncio.sleep(5)
+
+    Grace periods are supported, but since a task can only be interrupted by cancellation, only along with
+    a ``soft_timeout_callback`` (which runs on the event loop at the soft deadline). Watchdogs are not supported,
+    since the stack of the event loop's thread does not show where a suspended task is waiting.
+    """
+
+    async def __aenter__(self):
+        """Starts the timeout countdown
+
+        :return: The current instance
+        :rtype: AsyncTimeoutManager
+        """
+        if self.grace_period is not None and self.soft_timeout_callback is None:
+            raise ValueError('{} only supports grace periods with a soft_timeout_callback'.format(
+                self.__class__.__name__
+            ))
+        if self.watchdog is not None:
+            raise ValueError('{} does not support watchdogs'.format(self.__class__.__name__))
+
+        loop = asyncio.get_running_loop()
+        entry = self._new_entry(None)
+        entry.scope = _push_scope(entry.deadline, self)
+        entry.handle = loop.call_at(loop.time() + self.seconds, self._expire, entry, asyncio.current_task())
+        _active_timeouts.set(_active_timeouts.get() + (entry,))
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Ends the timeout countdown, either because the operation has finished
+        or because the operation timed out.
+
+        This method will raise a `TimeoutError` in place of the cancellation caused by this instance's timeout,
+        unless this `AsyncTimeoutManager` instance was configured to suppress `TimeoutError` exceptions.
+        """
+        entries = _active_timeouts.get()
+        index = max(i for i, entry in enumerate(entries) if entry.manager is self)
+        entry = entries[index]
+        _active_timeouts.set(entries[:index] + entries[index + 1:])
+        entry.handle.cancel()
+        _pop_scope(entry.scope)
+
+        timed_out = self.last_timed_out = entry.expired or entry.soft_expired
+        self.last_remaining = 0 if timed_out else max(0, entry.deadline - get_time())
+
+        if not entry.expired:
+            return
+
+        # Undo the cancellation requested by the timeout, even if the block turned it into another exception
+        # (as asyncio.timeout does), so that the task is not left cancelling
+        task = asyncio.current_task()
+        if hasattr(task, 'uncancel'):
+            task.uncancel()
+
+        if exc_type is asyncio.CancelledError:
+            if self.suppress_errors:
+                # Suppress the cancellation so that the timeout is silenced
+                return True
+            raise TimeoutError(self.timeout_message) from exc_val
+
+    def _expire(self, entry, task):
+        """Cancels the task which owns an expired deadline
+        (or, if only its soft deadline has expired, runs the soft timeout callback)
+        """
+        if entry.hard_deadline is not None:
+            self._begin_grace_period(entry)
+            entry.handle = asyncio.get_running_loop().call_later(self.grace_period, self._expire, entry, task)
+            self.soft_timeout_callback()
+            return
+
+        entry.expired = True
+        task.cancel()
+
+
+class _AsyncRateLimiter(AsyncContextDecorator):
+    """A mixin which adds asynchronous acquisition to the rate limiters found in :mod:`timerutil.limits`"""
+
+    async def acquire_async(self, tokens=1, block=None, timeout=None):
+        """Takes the given number of tokens, suspending the current task until they are available if so configured
+        (see :meth:`timerutil.limits.TokenBucket.acquire`)
+
+        :raises timerutil.limits.RateLimitExceeded: If the tokens are not available (and could not be waited for)
+        """
+        self._check_tokens(tokens)
+        limit = self._wait_limit(block, timeout)
+
+        delay = self._attempt(tokens, limit)
+        while delay:
+            await asyncio.sleep(delay)
+            delay = self._attempt(tokens, limit)
+
+    async def __aenter__(self):
+        """Takes a token (see :meth:`acquire_async`)
+
+        :return: This rate limiter
+        """
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class AsyncTokenBucket(_AsyncRateLimiter, TokenBucket):
+    """A :class:`~timerutil.limits.TokenBucket` which may also be used with ``async with`` (or to decorate coroutine
+    functions), and which waits for tokens without blocking the event loop.
+
+    Usage as a decorator:
+        .. code-block:: python
+
+            @AsyncTokenBucket(rate=5, burst=5)
+            async def call_partner_api():
+                ...
+    """
+
+
+class AsyncGCRA(_AsyncRateLimiter, GCRA):
+    """A :class:`~timerutil.limits.GCRA` rate limiter which may also be used with ``async with``
+    (or to decorate coroutine functions), and which waits for capacity without blocking the event loop.
+
+    Usage as a context manager:
+        .. code-block:: python
+
+            limiter = AsyncGCRA(rate=1000, burst=50)
+
+            async with limiter:
+                await send(record)
+    """
+
+
+class AsyncAttempt(Attempt):
+    """An asynchronous context manager for a single attempt of an :class:`AsyncRetry`
+    (see :class:`~timerutil.retries.Attempt`)
+    """
+    __slots__ = ()
+
+    def _timeout_manager(self):
+        if self.seconds is None:
+            return None
+        return AsyncTimeoutManager(self.seconds, timeout_message=self.retry.timeout_message)
+
+    async def __aenter__(self):
+        self._manager = self._timeout_manager()
+        if self._manager is not None:
+            await self._manager.__aenter__()
+        self._start = get_time()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._manager is not None:
+            try:
+                await self._manager.__aexit__(exc_type, exc_val, exc_tb)
+            except TimeoutError as e:
+                # The attempt timed out, and its cancellation was replaced by a `TimeoutError`
+                return self._finish(e, timed_out=True)
+        return self._finish(exc_val)
+
+
+class AsyncRetry(AsyncWaiter, Retry):
+    """Retries a coroutine function (or, through ``async for``, a block) with exponential backoff, within an overall
+    budget, without blocking the event loop (see :class:`~timerutil.retries.Retry`).
+
+    Usage as a decorator:
+        .. code-block:: python
+
+            @AsyncRetry(attempts=5, timeout=2, attempt_timeout=.5)
+            async def fetch_profile(user_id):
+                return await profile_service.get(user_id)
+
+    Usage with ``async for``:
+        .. code-block:: python
+
+            async for attempt in AsyncRetry(attempts=5, timeout=2):
+                async with attempt:
+                    response = await session.get(url)
+
+    .. note:: Let the loop finish (rather than breaking or returning from within it) so that the statistics of
+        the operation are recorded, and its deadline removed, within the current task.
+    """
+    attempt_class = AsyncAttempt
+
+    def __iter__(self):
+        raise TypeError('{} must be iterated with `async for`'.format(self.__class__.__name__))
+
+    async def __aiter__(self):
+        """Yields an :class:`AsyncAttempt` for each attempt, until one succeeds
+
+        :raises: The error of the last attempt, once no attempts remain (or could fit within the budget)
+        """
+        call = self._begin()
+        try:
+            error = None
+            for number in range(1, self.attempts + 2):
+                delay = self._next_wait(call, number, error)
+                if delay:
+                    await self._sleep_async(delay)
+
+                attempt = self._new_attempt(number, delay, error)
+                yield attempt
+                if attempt.error is None:
+                    return
+                error = attempt.error
+        finally:
+            self._end(call)
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        async def inner(*args, **kwds):
+            # Let the attempts run out (rather than returning from within the loop), so that the generator finishes
+            # within this task instead of being finalized later
+            async for attempt in self:
+                async with attempt:
+                    result = await func(*args, **kwds)
+            return result
+
+        return inner
@@ -4,10 +4,15 @@ across different versions of Python.
 .. note:: This module always exports the same interface regardless of the current runtime version.
 """
 import time
+from functools import partial
 
 __all__ = [
+    'Clock',
+    'CLOCKS',
     'ContextDecorator',
+    'get_clock',
     'get_time',
+    'get_time_ns',
     'TimeoutError'
 ]
 
@@ -53,6 +58,9 @@ try:
 except AttributeError:  # pragma: nocover
     get_time = time.time
 
+# The same clock as `get_time`, but in integer nanoseconds
+get_time_ns = time.monotonic_ns
+
 try:
     # Check if ``TimeoutError`` is a builtin
     TimeoutError = TimeoutError
@@ -61,3 +69,134 @@ except NameError:  # pragma: nocover
     class TimeoutError(OSError):
         """Timeout expired."""
         pass
+
+
+class Clock(object):
+    """A source of timestamps, readable in either floating point seconds (:meth:`time`)
+    or integer nanoseconds (:meth:`time_ns`), whose resolution and per-call overhead are measured on first use.
+
+    Nanosecond readings avoid the rounding error that floating point timestamps accumulate in long-running processes.
+
+    :ivar name: The name of the clock (its key within :data:`CLOCKS`)
+    :vartype name: str
+    :ivar cpu_time: Whether the clock measures CPU time (which only advances while running), rather than wall time
+    :vartype cpu_time: bool
+    """
+
+    def __init__(self, name, time, time_ns=None, cpu_time=False):
+        """Initializes a Clock
+
+        :param name: The name of the clock
+        :type name: str
+        :param time: Returns the current time, in seconds
+        :type time: callable
+        :param time_ns: (Optional) Returns the current time, in integer nanoseconds.
+            By default, this is derived from ``time`` (at the cost of its precision).
+        :type time_ns: callable
+        :param cpu_time: (Optional) Whether the clock measures CPU time. Defaults to ``False``.
+        :type cpu_time: bool
+        """
+        self.name = name
+        self.time = time
+        self.time_ns = time_ns if time_ns is not None else (lambda: int(time() * 1e9))
+        self.cpu_time = bool(cpu_time)
+        self._resolution = None
+        self._overhead = None
+
+    def __repr__(self):
+        return '<{name}: {clock}>'.format(name=self.__class__.__name__, clock=self.name)
+
+    def __call__(self):
+        """Returns the current time, in seconds
+
+        :rtype: float
+        """
+        return self.time()
+
+    @property
+    def resolution(self):
+        """The smallest step between consecutive readings of the clock, in seconds"""
+        if self._resolution is None:
+            self.calibrate()
+        return self._resolution
+
+    @property
+    def overhead(self):
+        """The mean duration of a single reading of the clock, in seconds"""
+        if self._overhead is None:
+            self.calibrate()
+        return self._overhead
+
+    def calibrate(self, samples=1000, budget=.05):
+        """Measures the resolution and per-call overhead of the clock
+
+        :param samples: (Optional) The number of readings used to measure the overhead. Defaults to 1000.
+        :type samples: int
+        :param budget: (Optional) The longest time spent (in wall-clock seconds) measuring the resolution.
+            If the clock never advances within that time, the resolution reported by :func:`time.get_clock_info`
+            is used instead. Defaults to 0.05.
+        :type budget: float
+        """
+        time_ns = self.time_ns
+
+        start = time_ns()
+        for _ in range(samples):
+            time_ns()
+        overhead = (time_ns() - start) / (samples + 1.0)
+
+        resolution = None
+        deadline = get_time() + budget
+        previous = time_ns()
+        for _ in range(samples):
+            current = time_ns()
+            while current == previous and get_time() < deadline:
+                current = time_ns()
+            if current == previous:
+                break
+            step = current - previous
+            resolution = step if resolution is None else min(resolution, step)
+            previous = current
+
+        if resolution is None:
+            try:
+                resolution = time.get_clock_info(self.name).resolution * 1e9
+            except (AttributeError, ValueError):  # pragma: nocover
+                resolution = 1e9
+
+        self._overhead = overhead / 1e9
+        self._resolution = resolution / 1e9
+
+
+# Every clock available on the current platform, keyed by name
+CLOCKS = {}
+
+for _name, _cpu_time in (('monotonic', False), ('perf_counter', False), ('process_time', True), ('thread_time', True)):
+    if hasattr(time, _name):
+        CLOCKS[_name] = Clock(_name, getattr(time, _name), getattr(time, _name + '_ns'), cpu_time=_cpu_time)
+
+if hasattr(time, 'CLOCK_MONOTONIC_RAW'):
+    # Like `monotonic`, but not subject to adjustment (slewing) by NTP
+    CLOCKS['monotonic_raw'] = Clock(
+        'monotonic_raw',
+        partial(time.clock_gettime, time.CLOCK_MONOTONIC_RAW),
+        partial(time.clock_gettime_ns, time.CLOCK_MONOTONIC_RAW)
+    )
+
+
+def get_clock(clock=None):
+    """Returns the :class:`Clock` with the given name (or, given a :class:`Clock`, that clock)
+
+    :param clock: (Optional) The name of a clock within :data:`CLOCKS`, or a :class:`Clock`.
+        Defaults to the ``monotonic`` clock, which :func:`get_time` also reads.
+    :type clock: str, Clock
+    :raises ValueError: If no clock with the given name is available on the current platform
+    :rtype: Clock
+    """
+    if clock is None:
+        return CLOCKS['monotonic']
+    if isinstance(clock, Clock):
+        return clock
+    try:
+        return CLOCKS[clock]
+    except KeyError:
+        raise ValueError('Unknown clock {!r} (expected one of: {})'.format(clock, ', '.join(sorted(CLOCKS))))
@@ -0,0 +1,195 @@
+"""Provides deadlines which propagate to the code running underneath them, so that downstream calls can size their
+own timeouts (socket timeouts, database statement timeouts, retry loops, ...) from the time that remains.
+
+A deadline is established by entering a :class:`Deadline` (or a :class:`~timerutil.timeouts.TimeoutManager`),
+and lasts until the block exits. Deadlines nest, and a child deadline never outlives its parent:
+    .. code-block:: python
+
+        import timerutil
+
+        @timerutil.Deadline(2)
+        def handle_request(request):
+            user = fetch_user(request)
+            ...
+
+        def fetch_user(request):
+            # Give up on the query once the caller has given up on the request
+            return db.execute(USER_QUERY, timeout=timerutil.remaining(default=30))
+
+Deadlines are stored in a :class:`contextvars.ContextVar`, so each asyncio task sees the deadlines that were in effect
+when it was created. New threads start without a deadline; wrap the function run by a thread (or an executor)
+with :func:`propagate` to carry the current deadline over.
+"""
+import functools
+from contextvars import ContextVar
+
+from timerutil.compat import (
+    ContextDecorator,
+    get_time
+)
+
+__all__ = [
+    'current_deadline',
+    'Deadline',
+    'propagate',
+    'remaining'
+]
+
+# The innermost deadline in effect for the current thread/task, or ``None``
+_current_scope = ContextVar('timerutil_deadline', default=None)
+
+
+class _DeadlineScope(object):
+    """A single deadline which is in effect for the current thread/task"""
+    __slots__ = ('expires_at', 'owner', 'parent')
+
+    def __init__(self, expires_at, owner, parent):
+        self.expires_at = expires_at
+        self.owner = owner
+        self.parent = parent
+
+
+def _push_scope(expires_at, owner):
+    """Establishes a deadline for the current thread/task, clamped to the deadline already in effect
+
+    :param expires_at: The time (as returned by :func:`~timerutil.compat.get_time`) at which the deadline expires
+    :type expires_at: float
+    :param owner: The object which established the deadline
+    :rtype: _DeadlineScope
+    """
+    parent = _current_scope.get()
+    if parent is not None and parent.expires_at < expires_at:
+        expires_at = parent.expires_at
+
+    scope = _DeadlineScope(expires_at, owner, parent)
+    _current_scope.set(scope)
+    return scope
+
+
+def _pop_scope(scope):
+    """Restores the deadline which was in effect before the given deadline was established
+
+    :param scope: The deadline to remove
+    :type scope: _DeadlineScope
+    """
+    _current_scope.set(scope.parent)
+
+
+def current_deadline():
+    """Returns the time (as returned by :func:`~timerutil.compat.get_time`) at which the innermost deadline
+    in effect for the current thread/task expires, or ``None`` if there is no deadline
+
+    :rtype: float
+    """
+    scope = _current_scope.get()
+    return None if scope is None else scope.expires_at
+
+
+def remaining(default=None):
+    """Returns the number of seconds left before the innermost deadline in effect for the current thread/task expires
+    (or ``0`` once it has expired)
+
+    :param default: (Optional) The value returned if there is no deadline. Defaults to ``None``.
+    :rtype: float
+    """
+    scope = _current_scope.get()
+    if scope is None:
+        return default
+    return max(scope.expires_at - get_time(), 0)
+
+
+def propagate(func):
+    """Wraps a function so that it runs under the deadline in effect for the current thread/task,
+    even when it is called from another thread
+
+    Usage:
+        .. code-block:: python
+
+            with Deadline(5):
+                future = executor.submit(propagate(fetch_user), user_id)
+
+    :param func: The function to wrap
+    :type func: callable
+    :rtype: callable
+    """
+    scope = _current_scope.get()
+
+    @functools.wraps(func)
+    def inner(*args, **kwds):
+        previous = _current_scope.get()
+        _current_scope.set(scope)
+        try:
+            return func(*args, **kwds)
+        finally:
+            _current_scope.set(previous)
+
+    return inner
+
+
+class Deadline(ContextDecorator):
+    """Context manager/decorator which establishes a deadline for the code running underneath it,
+    without interrupting that code (see :class:`~timerutil.timeouts.TimeoutManager` to also enforce the deadline).
+
+    If a deadline is already in effect, the new deadline is clamped so that it never expires after its parent.
+
+    Usage as a context manager:
+        .. code-block:: python
+
+            with Deadline(2) as deadline:
+                response = session.get(url, timeout=deadline.remaining())
+    """
+
+    def __init__(self, seconds):
+        """Initializes a Deadline
+
+        :param seconds: The number of seconds after entering the block at which the deadline expires
+        :type seconds: int, float
+        """
+        self.seconds = seconds
+
+    def __repr__(self):
+        return '<{name}: {seconds} seconds>'.format(name=self.__class__.__name__, seconds=self.seconds)
+
+    def _scope(self):
+        """Returns the innermost scope which this instance established for the current thread/task
+
+        :raises RuntimeError: If this instance has not been entered by the current thread/task
+        :rtype: _DeadlineScope
+        """
+        scope = _current_scope.get()
+        while scope is not None:
+            if scope.owner is self:
+                return scope
+            scope = scope.parent
+        raise RuntimeError('{!r} is not in effect'.format(self))
+
+    @property
+    def expires_at(self):
+        """The time (as returned by :func:`~timerutil.compat.get_time`) at which the deadline expires"""
+        return self._scope().expires_at
+
+    def remaining(self):
+        """Returns the number of seconds left before the deadline expires (or ``0`` once it has expired)
+
+        :rtype: float
+        """
+        return max(self._scope().expires_at - get_time(), 0)
+
+    @property
+    def expired(self):
+        """Whether the deadline has passed"""
+        return self.remaining() == 0
+
+    def __enter__(self):
+        """Establishes the deadline
+
+        :return: This :class:`~Deadline` instance
+        :rtype: Deadline
+        """
+        _push_scope(get_time() + self.seconds, self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Restores the deadline which was in effect before the block was entered
+        """
+        _pop_scope(self._scope())
@@ -0,0 +1,289 @@
+"""Provides a :class:`concurrent.futures.Executor` whose tasks each carry their own deadline.
+
+Time spent waiting in the queue counts against a task's deadline, and tasks whose deadline passes before a worker
+picks them up are dropped without ever running, so that an overloaded executor does not spend its capacity
+on work whose callers have already given up:
+    .. code-block:: python
+
+        executor = TimeoutExecutor(max_workers=8, timeout=2)
+
+        future = executor.submit(render_report, report_id)
+        try:
+            report = future.result()
+        except TimeoutError:
+            ...
+
+        print('Waited', future.stats.queued_time, 'seconds, then ran for', future.stats.run_time, 'seconds')
+
+Running tasks are interrupted with the same semantics as :class:`~timerutil.timeouts.TimeoutManager`
+(which also establishes the task's deadline for :func:`timerutil.remaining`).
+"""
+import queue
+import threading
+from concurrent import futures
+
+from timerutil.compat import (
+    get_time,
+    TimeoutError
+)
+from timerutil.stats import TimingStats
+from timerutil.timeouts import (
+    DEFAULT_TIMEOUT_MESSAGE,
+    TimeoutManager
+)
+
+__all__ = [
+    'TaskStats',
+    'TimedFuture',
+    'TimeoutExecutor'
+]
+
+
+class TaskStats(object):
+    """Timing statistics for a single task submitted to a :class:`TimeoutExecutor`
+
+    :ivar queued_time: The number of seconds that the task waited before a worker picked it up
+    :vartype queued_time: float
+    :ivar run_time: The number of seconds that the task ran for (``0`` if it was dropped without running)
+    :vartype run_time: float
+    :ivar timed_out: Whether the task's deadline expired (whether in the queue or while running)
+    :vartype timed_out: bool
+    :ivar remaining: The number of seconds that were left before the deadline when the task finished,
+        or ``None`` if the task had no deadline
+    :vartype remaining: float
+    """
+    __slots__ = ('queued_time', 'run_time', 'timed_out', 'remaining')
+
+    def __init__(self):
+        self.queued_time = None
+        self.run_time = None
+        self.timed_out = False
+        self.remaining = None
+
+    def __repr__(self):
+        return '<{name}: queued_time={queued_time!r} run_time={run_time!r} timed_out={timed_out!r}>'.format(
+            name=self.__class__.__name__,
+            queued_time=self.queued_time,
+            run_time=self.run_time,
+            timed_out=self.timed_out
+        )
+
+
+class TimedFuture(futures.Future):
+    """A :class:`concurrent.futures.Future` which also records the :class:`TaskStats` of its task
+
+    :ivar stats: The timing statistics of the task, which are complete once the future is done
+    :vartype stats: TaskStats
+    """
+
+    def __init__(self):
+        super(TimedFuture, self).__init__()
+        self.stats = TaskStats()
+
+
+class _WorkItem(object):
+    """A task waiting in the queue of a :class:`TimeoutExecutor`"""
+    __slots__ = ('future', 'fn', 'args', 'kwargs', 'submitted', 'seconds')
+
+    def __init__(self, future, fn, args, kwargs, seconds):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.submitted = get_time()
+        self.seconds = seconds
+
+
+class TimeoutExecutor(futures.Executor):
+    """An executor which runs tasks in a pool of threads, enforcing a deadline on each task.
+
+    A task's deadline starts when it is submitted. A task which is still queued when its deadline passes is dropped
+    (its future receives a :exc:`TimeoutError`, or ``None`` if timeouts are suppressed) without ever running.
+    Otherwise, the task runs under a :class:`~timerutil.timeouts.TimeoutManager` for the time that remains.
+
+    :ivar stats: Aggregate statistics for every completed task, where each runtime is the time a task spent running
+        and each elapsed time also includes the time it spent queued
+    :vartype stats: timerutil.stats.TimingStats
+    :ivar dropped: The number of tasks which were dropped without running, because their deadline had passed
+    :vartype dropped: int
+    :ivar timed_out: The number of tasks which timed out (including those which were dropped)
+    :vartype timed_out: int
+    """
+
+    def __init__(self, max_workers=None, timeout=None, timeout_message=DEFAULT_TIMEOUT_MESSAGE,
+                 suppress_timeout_errors=False, thread_name_prefix='timerutil-executor', histograms=False):
+        """Initializes a TimeoutExecutor
+
+        :param max_workers: (Optional) The largest number of worker threads. Defaults to 5 per CPU.
+        :type max_workers: int
+        :param timeout: (Optional) The number of seconds after submission at which tasks submitted
+            with :meth:`submit` time out. Tasks have no deadline by default.
+        :type timeout: int, float
+        :param timeout_message: (Optional) See :class:`~timerutil.timeouts.TimeoutManager`
+        :type timeout_message: str
+        :param suppress_timeout_errors: (Optional) If ``True``, the futures of tasks which time out
+            receive ``None`` instead of a :exc:`TimeoutError`. Defaults to ``False``.
+        :type suppress_timeout_errors: bool
+        :param thread_name_prefix: (Optional) The prefix of the names given to worker threads
+        :type thread_name_prefix: str
+        :param histograms: (Optional) See :class:`~timerutil.stats.TimingStats`
+        :type histograms: bool
+        """
+        if max_workers is None:
+            import multiprocessing
+            max_workers = (multiprocessing.cpu_count() or 1) * 5
+        if max_workers <= 0:
+            raise ValueError('max_workers must be greater than 0')
+
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.timeout_message = timeout_message
+        self.suppress_errors = bool(suppress_timeout_errors)
+        self.thread_name_prefix = thread_name_prefix
+        self.stats = TimingStats(histograms=histograms)
+        self.dropped = 0
+        self.timed_out = 0
+        self._queue = queue.Queue()
+        self._threads = []
+        self._idle = 0
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedules ``fn(*args, **kwargs)`` to run with the executor's default :attr:`timeout`
+
+        :rtype: TimedFuture
+        """
+        return self.submit_with_timeout(self.timeout, fn, *args, **kwargs)
+
+    def submit_with_timeout(self, seconds, fn, *args, **kwargs):
+        """Schedules ``fn(*args, **kwargs)`` to run, timing out the given number of seconds after submission
+
+        :param seconds: The number of seconds after which the task times out, or ``None`` for no deadline
+        :type seconds: int, float
+        :raises RuntimeError: If the executor has been shut down
+        :rtype: TimedFuture
+        """
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+
+            future = TimedFuture()
+            self._queue.put(_WorkItem(future, fn, args, kwargs, seconds))
+
+            if self._idle:
+                self._idle -= 1
+            elif len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._work,
+                    name='{}-{}'.format(self.thread_name_prefix, len(self._threads))
+                )
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """Stops accepting tasks, and stops the worker threads once the queue has been drained
+
+        :param wait: (Optional) If ``True``, block until every worker thread has exited. Defaults to ``True``.
+        :type wait: bool
+        :param cancel_futures: (Optional) If ``True``, cancel every task which is still queued. Defaults to ``False``.
+        :type cancel_futures: bool
+        """
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    item.future.cancel()
+
+            for _ in self._threads:
+                self._queue.put(None)
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _work(self):
+        """The main loop of a worker thread"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            self._run(item)
+
+            with self._lock:
+                self._idle += 1
+
+    def _run(self, item):
+        """Runs a single task (unless it has been cancelled, or its deadline has already passed)
+
+        :type item: _WorkItem
+        """
+        future = item.future
+        stats = future.stats
+        if not future.set_running_or_notify_cancel():
+            return
+
+        start = get_time()
+        stats.queued_time = start - item.submitted
+
+        if item.seconds is None:
+            manager = None
+        else:
+            remaining = item.submitted + item.seconds - start
+            if remaining <= 0:
+                stats.run_time = 0
+                stats.remaining = 0
+                self._finish(future, stats, timed_out=True, dropped=True)
+                return
+            manager = TimeoutManager(
+                remaining,
+                timeout_message=self.timeout_message,
+                suppress_timeout_errors=self.suppress_errors
+            )
+
+        result = exception = None
+        try:
+            if manager is None:
+                result = item.fn(*item.args, **item.kwargs)
+            else:
+                with manager:
+                    result = item.fn(*item.args, **item.kwargs)
+        except BaseException as e:
+            exception = e
+
+        stats.run_time = get_time() - start
+        timed_out = False
+        if manager is not None:
+            stats.remaining = manager.last_remaining
+            timed_out = manager.last_timed_out
+
+        if exception is not None and not (timed_out and isinstance(exception, TimeoutError)):
+            # The task raised an exception of its own
+            timed_out = False
+        self._finish(future, stats, timed_out=timed_out, result=result, exception=exception)
+
+    def _finish(self, future, stats, timed_out, dropped=False, result=None, exception=None):
+        """Records the statistics of a task, and completes its future"""
+        stats.timed_out = timed_out
+        self.stats.record(stats.run_time, stats.queued_time + stats.run_time)
+        if timed_out or dropped:
+            with self._lock:
+                self.timed_out += 1
+                if dropped:
+                    self.dropped += 1
+
+        if dropped and not self.suppress_errors:
+            exception = TimeoutError(self.timeout_message)
+
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
@@ -0,0 +1,368 @@
+"""Provides thread-safe rate limiters, measured with the same clock (:func:`~timerutil.compat.get_time`)
+as the rest of :mod:`timerutil`, which can be used as context managers or decorators in the same style as
+:class:`~timerutil.waits.Waiter`.
+
+Both limiters allow ``rate`` operations per second on average, with bursts of up to ``burst`` operations:
+
+- :class:`TokenBucket` refills a bucket of ``burst`` tokens at ``rate`` tokens per second.
+- :class:`GCRA` (the generic cell rate algorithm) enforces the same limit, but its whole state is a single timestamp.
+
+When no capacity is available, a limiter either blocks until there is (the default), or raises
+:exc:`RateLimitExceeded`, which reports how long the caller must wait:
+    .. code-block:: python
+
+        limiter = GCRA(rate=100, burst=10, block=False)
+
+        try:
+            with limiter:
+                call_downstream_service()
+        except RateLimitExceeded as e:
+            respond_too_many_requests(retry_after=e.retry_after)
+
+Blocking never outlasts the :class:`~timerutil.deadlines.Deadline` in effect (if any).
+:class:`KeyedRateLimiter` limits many keys (e.g. one per client) independently, and compactly.
+"""
+import heapq
+import threading
+import time
+
+from timerutil.compat import (
+    ContextDecorator,
+    get_time
+)
+from timerutil.deadlines import remaining
+
+__all__ = [
+    'GCRA',
+    'KeyedRateLimiter',
+    'RateLimitExceeded',
+    'TokenBucket'
+]
+
+# Shortfalls smaller than this (in seconds or tokens) are treated as floating point error, rather than as a limit
+_TOLERANCE = 1e-9
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a rate limiter has no capacity for an operation
+
+    :ivar retry_after: The number of seconds after which the operation would be allowed
+    :vartype retry_after: float
+    """
+
+    def __init__(self, retry_after):
+        super(RateLimitExceeded, self).__init__('Rate limit exceeded; retry after {:.6f} seconds'.format(retry_after))
+        self.retry_after = retry_after
+
+
+class _RateLimiter(ContextDecorator):
+    """The interface shared by rate limiters. Subclasses implement:
+
+    - ``_reserve(tokens, now)``, which takes the given number of tokens if they are available, returning ``0`` if they
+      were taken, or else the number of seconds until they would be available
+    - ``_wait_time(tokens, now)``, which returns the number of seconds until the given number of tokens would be
+      available, without taking them
+    """
+
+    def __init__(self, rate, burst=1, block=True, timeout=None):
+        """Initializes a rate limiter
+
+        :param rate: The (positive) number of operations allowed per second, on average
+        :type rate: int, float
+        :param burst: (Optional) The number of operations which may be allowed at once. Defaults to 1.
+        :type burst: int
+        :param block: (Optional) If ``True``, :meth:`acquire` waits for capacity, rather than raising
+            :exc:`RateLimitExceeded`. Defaults to ``True``.
+        :type block: bool
+        :param timeout: (Optional) The longest time (in seconds) to wait for capacity when blocking.
+            By default, waits are only limited by the :class:`~timerutil.deadlines.Deadline` in effect (if any).
+        :type timeout: int, float
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        if burst < 1:
+            raise ValueError('burst must be at least 1')
+
+        self.rate = rate
+        self.burst = burst
+        self.block = bool(block)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<{name}: {rate} per second, burst {burst}>'.format(
+            name=self.__class__.__name__, rate=self.rate, burst=self.burst
+        )
+
+    def _check_tokens(self, tokens):
+        if tokens > self.burst:
+            raise ValueError('Cannot acquire {} tokens at once with a burst of {}'.format(tokens, self.burst))
+
+    def wait_time(self, tokens=1):
+        """Returns the number of seconds which a caller must wait before the given number of tokens is available
+
+        :param tokens: (Optional) The number of tokens. Defaults to 1.
+        :type tokens: int
+        :rtype: float
+        """
+        self._check_tokens(tokens)
+        return self._wait_time(tokens, get_time())
+
+    def try_acquire(self, tokens=1):
+        """Takes the given number of tokens, if they are available right away
+
+        :param tokens: (Optional) The number of tokens. Defaults to 1.
+        :type tokens: int
+        :return: Whether the tokens were taken
+        :rtype: bool
+        """
+        self._check_tokens(tokens)
+        return not self._reserve(tokens, get_time())
+
+    def _wait_limit(self, block, timeout):
+        """Returns the latest time until which :meth:`acquire` may wait (``None`` if unlimited),
+        or ``False`` if it may not wait at all
+        """
+        if not (self.block if block is None else block):
+            return False
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline_remaining = remaining()
+        if deadline_remaining is not None:
+            timeout = deadline_remaining if timeout is None else min(timeout, deadline_remaining)
+        return None if timeout is None else get_time() + timeout
+
+    def acquire(self, tokens=1, block=None, timeout=None):
+        """Takes the given number of tokens, waiting for them to become available if so configured
+
+        :param tokens: (Optional) The number of tokens. Defaults to 1.
+        :type tokens: int
+        :param block: (Optional) Overrides whether to wait for capacity
+        :type block: bool
+        :param timeout: (Optional) Overrides the longest time to wait for capacity, in seconds
+        :type timeout: int, float
+        :raises RateLimitExceeded: If the tokens are not available (and could not be waited for)
+        """
+        self._check_tokens(tokens)
+        limit = self._wait_limit(block, timeout)
+
+        delay = self._attempt(tokens, limit)
+        while delay:
+            time.sleep(delay)
+            delay = self._attempt(tokens, limit)
+
+    def _attempt(self, tokens, limit):
+        """Makes a single attempt to take the given number of tokens
+
+        :param limit: The latest time until which the caller may wait (see :meth:`_wait_limit`)
+        :return: ``0`` if the tokens were taken, or else the number of seconds to wait before trying again
+        :rtype: float
+        :raises RateLimitExceeded: If the tokens are not available, and the caller may not wait for them
+        """
+        now = get_time()
+        retry_after = self._reserve(tokens, now)
+        if retry_after and (limit is False or (limit is not None and now + retry_after > limit)):
+            raise RateLimitExceeded(retry_after)
+        return retry_after
+
+    def __enter__(self):
+        """Takes a token (see :meth:`acquire`)
+
+        :return: This rate limiter
+        """
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class TokenBucket(_RateLimiter):
+    """A rate limiter which refills a bucket of ``burst`` tokens at ``rate`` tokens per second,
+    and takes a token for each operation.
+
+    Usage as a decorator:
+        .. code-block:: python
+
+            @TokenBucket(rate=5, burst=5)
+            def call_partner_api():
+                ...
+
+    :ivar rate: The number of tokens added to the bucket per second
+    :vartype rate: float
+    :ivar burst: The capacity of the bucket
+    :vartype burst: int
+    """
+
+    def __init__(self, rate, burst=1, block=True, timeout=None):
+        super(TokenBucket, self).__init__(rate, burst=burst, block=block, timeout=timeout)
+        # The number of tokens in the bucket, as of the given time
+        self._state = (float(burst), get_time())
+
+    def _refilled(self, now):
+        tokens, updated = self._state
+        return min(self.burst, tokens + max(now - updated, 0) * self.rate)
+
+    def _wait_time(self, tokens, now):
+        return max(tokens - self._refilled(now), 0) / float(self.rate)
+
+    def _reserve(self, tokens, now):
+        with self._lock:
+            available = self._refilled(now)
+            if tokens - available > _TOLERANCE:
+                return (tokens - available) / float(self.rate)
+            self._state = (max(available - tokens, 0), now)
+            return 0
+
+    @property
+    def tokens(self):
+        """The number of tokens currently in the bucket"""
+        return self._refilled(get_time())
+
+
+class GCRA(_RateLimiter):
+    """A rate limiter implementing the generic cell rate algorithm, which allows the same rates and bursts as
+    a :class:`TokenBucket`, but whose state is a single timestamp: the "theoretical arrival time" at which
+    the limiter would be empty again.
+
+    Each acquisition is a single compare-and-update of that timestamp, so the lock is only held
+    for a few arithmetic operations.
+
+    Usage as a context manager:
+        .. code-block:: python
+
+            limiter = GCRA(rate=1000, burst=50)
+
+            for record in records:
+                with limiter:
+                    send(record)
+    """
+
+    def __init__(self, rate, burst=1, block=True, timeout=None):
+        super(GCRA, self).__init__(rate, burst=burst, block=block, timeout=timeout)
+        self.interval = 1.0 / rate
+        self._tat = 0.0
+
+    def _wait_time(self, tokens, now):
+        return max(max(self._tat, now) + tokens * self.interval - self.burst * self.interval - now, 0)
+
+    def _reserve(self, tokens, now):
+        with self._lock:
+            tat = max(self._tat, now) + tokens * self.interval
+            allowed_at = tat - self.burst * self.interval
+            if allowed_at - now > _TOLERANCE:
+                return allowed_at - now
+            self._tat = tat
+            return 0
+
+
+class KeyedRateLimiter(object):
+    """Limits the rate of operations for each of many keys (e.g. clients) independently.
+
+    Each key's limit is enforced by the generic cell rate algorithm (see :class:`GCRA`), so the state of a key
+    is a single float, kept in a plain dictionary. Keys whose limiters are full again are equivalent to new keys,
+    so once more than ``max_keys`` keys are tracked, those keys are forgotten; if that is not enough, the keys
+    closest to full are forgotten too, until at most seven eighths of ``max_keys`` remain (so that evictions,
+    which scan every key, are rare).
+
+    Usage:
+        .. code-block:: python
+
+            limiter = KeyedRateLimiter(rate=10, burst=20, max_keys=1000000)
+
+            def handle(request):
+                if not limiter.try_acquire(request.client_id):
+                    return too_many_requests(retry_after=limiter.wait_time(request.client_id))
+                ...
+    """
+
+    def __init__(self, rate, burst=1, max_keys=100000):
+        """Initializes a KeyedRateLimiter
+
+        :param rate: The (positive) number of operations allowed per second for each key, on average
+        :type rate: int, float
+        :param burst: (Optional) The number of operations which may be allowed at once for each key. Defaults to 1.
+        :type burst: int
+        :param max_keys: (Optional) The largest number of keys tracked at once. Defaults to 100000.
+        :type max_keys: int
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        if burst < 1:
+            raise ValueError('burst must be at least 1')
+
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.interval = 1.0 / rate
+        # The theoretical arrival time of each key
+        self._tats = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<{name}: {rate} per second, burst {burst}, {count} keys>'.format(
+            name=self.__class__.__name__, rate=self.rate, burst=self.burst, count=len(self)
+        )
+
+    def __len__(self):
+        """The number of keys currently tracked"""
+        return len(self._tats)
+
+    def wait_time(self, key, tokens=1):
+        """Returns the number of seconds which a caller must wait before the given key allows the given number
+        of tokens
+
+        :rtype: float
+        """
+        now = get_time()
+        tat = max(self._tats.get(key, now), now)
+        return max(tat + (tokens - self.burst) * self.interval - now, 0)
+
+    def _reserve(self, key, tokens, now):
+        if tokens > self.burst:
+            raise ValueError('Cannot acquire {} tokens at once with a burst of {}'.format(tokens, self.burst))
+
+        with self._lock:
+            tat = max(self._tats.get(key, now), now) + tokens * self.interval
+            allowed_at = tat - self.burst * self.interval
+            if allowed_at - now > _TOLERANCE:
+                return allowed_at - now
+
+            tats = self._tats
+            tats[key] = tat
+            if len(tats) > self.max_keys:
+                self._evict(now)
+            return 0
+
+    def _evict(self, now):
+        """Forgets the keys whose limiters are full, and then, if need be, those closest to full
+        (must be called with the lock held)
+        """
+        keep = self.max_keys - self.max_keys // 8
+        tats = dict((key, tat) for key, tat in self._tats.items() if tat > now)
+        if len(tats) > keep:
+            cutoff = heapq.nsmallest(len(tats) - keep, tats.values())[-1]
+            tats = dict((key, tat) for key, tat in tats.items() if tat > cutoff)
+        self._tats = tats
+
+    def try_acquire(self, key, tokens=1):
+        """Takes the given number of tokens for a key, if they are available right away
+
+        :return: Whether the tokens were taken
+        :rtype: bool
+        """
+        return not self._reserve(key, tokens, get_time())
+
+    def acquire(self, key, tokens=1):
+        """Takes the given number of tokens for a key
+
+        :raises RateLimitExceeded: If the tokens are not available
+        """
+        retry_after = self._reserve(key, tokens, get_time())
+        if retry_after:
+            raise RateLimitExceeded(retry_after)
+
+    def clear(self):
+        """Forgets every key"""
+        with self._lock:
+            self._tats.clear()
@@ -0,0 +1,421 @@
+"""Provides hard timeouts, by running callables in a pool of reusable worker processes which are killed
+(and replaced) when their deadline expires.
+
+Unlike :class:`~timerutil.timeouts.TimeoutManager`, which can only interrupt Python bytecode, this guarantees
+a wall-clock bound even on code which is stuck within a C extension (e.g. catastrophic regular expression
+backtracking, or a native parser fed untrusted input):
+    .. code-block:: python
+
+        @ProcessTimeoutManager(2)
+        def parse(document):
+            return native_parser.parse(document)
+
+        tree = parse(untrusted_bytes)
+
+Workers are started up front and reused across calls, so the cost of starting a process is only paid again
+after a worker has been killed. Large :class:`bytes`-like arguments and results are passed through shared memory
+(where :mod:`multiprocessing.shared_memory` is available) rather than being pickled through a pipe. Within the worker,
+such arguments are received as :class:`memoryview` objects, which are only valid until the call returns.
+
+.. note:: Callables (and their other arguments and results) must be picklable, which usually means that they must
+    be defined at the top level of a module. Functions decorated by :class:`ProcessTimeoutManager` at the top level
+    of a module are supported.
+"""
+import atexit
+import functools
+import multiprocessing
+import os
+import threading
+
+from timerutil.compat import (
+    get_time,
+    TimeoutError
+)
+from timerutil.timeouts import DEFAULT_TIMEOUT_MESSAGE
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # pragma: nocover
+    # Shared memory was added in Python 3.8, so arguments and results are always pickled before then
+    shared_memory = None
+
+__all__ = [
+    'ProcessPool',
+    'ProcessTimeoutManager'
+]
+
+# The default size (in bytes) above which bytes-like arguments and results are passed through shared memory
+DEFAULT_SHARED_MEMORY_THRESHOLD = 1 << 20
+
+# Whether the current process is a worker of a `ProcessPool`
+_in_worker = False
+
+
+class _WorkerTimeoutError(TimeoutError):
+    """Raised by :meth:`ProcessPool.call` when a call did not finish in time
+    (so that it can be told apart from a :exc:`TimeoutError` raised by the callable itself)
+    """
+
+
+class _SharedBuffer(object):
+    """Stands in for a bytes-like object which has been copied into a shared memory block"""
+    __slots__ = ('name', 'size')
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+    def __getstate__(self):
+        return self.name, self.size
+
+    def __setstate__(self, state):
+        self.name, self.size = state
+
+
+def _share(value, threshold, blocks):
+    """Copies a large bytes-like value into a new shared memory block, returning the :class:`_SharedBuffer`
+    which stands in for it (or, if the value is not shared, the value itself)
+
+    :param blocks: A list to which the new shared memory block is appended
+    :type blocks: list
+    """
+    if shared_memory is None or threshold is None or not isinstance(value, (bytes, bytearray, memoryview)):
+        return value
+
+    size = value.nbytes if isinstance(value, memoryview) else len(value)
+    if size < threshold:
+        return value
+
+    block = shared_memory.SharedMemory(create=True, size=size)
+    block.buf[:size] = value
+    blocks.append(block)
+    return _SharedBuffer(block.name, size)
+
+
+def _close_block(block, unlink=False):
+    """Closes (and optionally destroys) a shared memory block, ignoring views which are still exported"""
+    try:
+        block.close()
+    except BufferError:
+        # A view of the block is still referenced, so leave the mapping to be released along with it
+        pass
+    if unlink:
+        block.unlink()
+
+
+def _worker_main(connection, threshold):
+    """The main loop of a worker process: runs each call received through the connection,
+    and sends back its result (or the exception that it raised)
+    """
+    global _in_worker
+    _in_worker = True
+
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+
+        func, args, kwargs = message
+        attached = []
+
+        def attach(value):
+            if not isinstance(value, _SharedBuffer):
+                return value
+            block = shared_memory.SharedMemory(name=value.name)
+            attached.append(block)
+            return block.buf[:value.size]
+
+        outgoing = []
+        try:
+            result = func(*[attach(arg) for arg in args], **dict((k, attach(v)) for k, v in kwargs.items()))
+            response = ('result', _share(result, threshold, outgoing))
+        except BaseException as e:
+            response = ('error', e)
+        finally:
+            for block in attached:
+                _close_block(block)
+
+        try:
+            connection.send(response)
+        except Exception as e:
+            # The result (or exception) could not be pickled
+            connection.send(('error', RuntimeError('Unable to return {!r} from worker: {!r}'.format(response[1], e))))
+        finally:
+            # The parent process takes ownership of (and destroys) shared results
+            for block in outgoing:
+                _close_block(block)
+
+
+class _Worker(object):
+    """A single worker process, and the parent's end of the connection to it"""
+    __slots__ = ('process', 'connection')
+
+    def __init__(self, context, threshold):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_connection, threshold),
+            name='timerutil-process-worker'
+        )
+        self.process.daemon = True
+        self.process.start()
+        child_connection.close()
+
+    def stop(self):
+        """Asks the worker to exit once it is idle"""
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.connection.close()
+
+    def kill(self):
+        """Kills the worker immediately"""
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class ProcessPool(object):
+    """A pool of reusable worker processes, which runs each call in an idle worker and kills (then replaces)
+    any worker whose call does not finish before its deadline.
+
+    Usage:
+        .. code-block:: python
+
+            with ProcessPool(processes=4) as pool:
+                result = pool.call(2, parse, (untrusted_bytes,))
+
+    :ivar processes: The number of worker processes
+    :vartype processes: int
+    :ivar shared_memory_threshold: The size (in bytes) above which bytes-like arguments and results
+        are passed through shared memory, or ``None`` if they are always pickled
+    :vartype shared_memory_threshold: int
+    """
+
+    def __init__(self, processes=None, mp_context=None, shared_memory_threshold=DEFAULT_SHARED_MEMORY_THRESHOLD):
+        """Initializes a ProcessPool, and starts its workers
+
+        :param processes: (Optional) The number of worker processes. Defaults to the number of CPUs.
+        :type processes: int
+        :param mp_context: (Optional) The :mod:`multiprocessing` context used to start workers.
+            Defaults to the default context.
+        :param shared_memory_threshold: (Optional) The size (in bytes) above which bytes-like arguments and results
+            are passed through shared memory. Pass ``None`` to always pickle them. Defaults to 1 MiB.
+        :type shared_memory_threshold: int
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.shared_memory_threshold = shared_memory_threshold
+        self._context = mp_context if mp_context is not None else multiprocessing.get_context()
+        self._condition = threading.Condition()
+        self._closed = False
+
+        if shared_memory is not None and shared_memory_threshold is not None:
+            # Start the resource tracker before the workers, so that they share it (rather than each starting their
+            # own) and shared memory blocks created by one process may be destroyed by another
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+
+        self._idle = [self._start_worker() for _ in range(self.processes)]
+
+    def __repr__(self):
+        return '<{name}: {processes} processes>'.format(name=self.__class__.__name__, processes=self.processes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _start_worker(self):
+        return _Worker(self._context, self.shared_memory_threshold)
+
+    def _acquire(self, deadline):
+        """Takes an idle worker from the pool, waiting no later than the given deadline
+
+        :rtype: _Worker
+        :raises TimeoutError: If no worker became idle before the deadline
+        """
+        with self._condition:
+            while not self._idle:
+                if self._closed:
+                    raise RuntimeError('{!r} is closed'.format(self))
+                remaining = deadline - get_time()
+                if remaining <= 0:
+                    raise _WorkerTimeoutError(DEFAULT_TIMEOUT_MESSAGE)
+                self._condition.wait(remaining)
+
+            if self._closed:
+                raise RuntimeError('{!r} is closed'.format(self))
+            return self._idle.pop()
+
+    def _release(self, worker):
+        """Returns a worker to the pool (or stops it, if the pool has been closed)"""
+        with self._condition:
+            if self._closed:
+                worker.stop()
+                return
+            self._idle.append(worker)
+            self._condition.notify()
+
+    def call(self, seconds, func, args=(), kwargs=None):
+        """Runs ``func(*args, **kwargs)`` in a worker process, and returns its result (or raises its exception).
+
+        Time spent waiting for an idle worker counts against the deadline.
+
+        :param seconds: The number of seconds after which the call is abandoned, and its worker killed
+        :type seconds: int, float
+        :param func: The (picklable) callable to run
+        :type func: callable
+        :param args: (Optional) Positional arguments for the callable
+        :type args: tuple
+        :param kwargs: (Optional) Keyword arguments for the callable
+        :type kwargs: dict
+        :raises TimeoutError: If the call did not finish within the given number of seconds
+        :raises RuntimeError: If the worker exited unexpectedly, or the pool has been closed
+        """
+        deadline = get_time() + seconds
+        worker = self._acquire(deadline)
+
+        blocks = []
+        try:
+            threshold = self.shared_memory_threshold
+            message = (
+                func,
+                tuple(_share(arg, threshold, blocks) for arg in args),
+                dict((key, _share(value, threshold, blocks)) for key, value in (kwargs or {}).items())
+            )
+
+            try:
+                worker.connection.send(message)
+                finished = worker.connection.poll(max(deadline - get_time(), 0))
+                response = worker.connection.recv() if finished else None
+            except (EOFError, OSError):
+                worker.kill()
+                self._release(self._start_worker())
+                raise RuntimeError('Worker process exited unexpectedly (exit code {})'.format(worker.process.exitcode))
+            except BaseException:
+                # e.g. the message could not be pickled, or the caller was interrupted while waiting
+                worker.kill()
+                self._release(self._start_worker())
+                raise
+
+            if not finished:
+                worker.kill()
+                self._release(self._start_worker())
+                raise _WorkerTimeoutError(DEFAULT_TIMEOUT_MESSAGE)
+        finally:
+            for block in blocks:
+                _close_block(block, unlink=True)
+
+        self._release(worker)
+
+        kind, value = response
+        if kind == 'error':
+            raise value
+        if isinstance(value, _SharedBuffer):
+            block = shared_memory.SharedMemory(name=value.name)
+            try:
+                value = bytes(block.buf[:value.size])
+            finally:
+                _close_block(block, unlink=True)
+        return value
+
+    def close(self):
+        """Stops every worker. Workers which are busy are stopped once their calls finish."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+
+        for worker in idle:
+            worker.stop()
+        for worker in idle:
+            worker.process.join()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def _get_default_pool():
+    """Returns the process-wide :class:`ProcessPool`, starting it on first use"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ProcessPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+class ProcessTimeoutManager(object):
+    """Decorator (or :meth:`run` API) for putting hard time restrictions on callables, by running them
+    in a :class:`ProcessPool` whose workers are killed when their deadline expires.
+
+    Usage as a decorator:
+        .. code-block:: python
+
+            @ProcessTimeoutManager(2)
+            def match(pattern, text):
+                return re.match(pattern, text) is not None
+
+            match(r'(a+)+$', 'a' * 64 + 'b')  # raises TimeoutError after two seconds
+
+    Usage with :meth:`run`:
+        .. code-block:: python
+
+            manager = ProcessTimeoutManager(2, suppress_timeout_errors=True)
+            tree = manager.run(native_parser.parse, untrusted_bytes)  # None if parsing timed out
+
+    Messages and suppression behave the same as for :class:`~timerutil.timeouts.TimeoutManager`; when a timeout
+    is suppressed, ``None`` is returned in place of the result.
+    """
+
+    def __init__(self, seconds, timeout_message=DEFAULT_TIMEOUT_MESSAGE, suppress_timeout_errors=False, pool=None):
+        """Initializes and configures a new ProcessTimeoutManager
+
+        :param seconds: The number of seconds after which a call should time out
+        :type seconds: int, float
+        :param timeout_message: (Optional) See :class:`~timerutil.timeouts.TimeoutManager`
+        :type timeout_message: str
+        :param suppress_timeout_errors: (Optional) See :class:`~timerutil.timeouts.TimeoutManager`
+        :type suppress_timeout_errors: bool
+        :param pool: (Optional) The pool in which calls are run.
+            Defaults to a process-wide pool (with a worker per CPU), which is started on first use.
+        :type pool: ProcessPool
+        """
+        self.seconds = seconds
+        self.timeout_message = timeout_message
+        self.suppress_errors = bool(suppress_timeout_errors)
+        self.pool = pool
+
+    def __repr__(self):
+        return '<{name}: {seconds} seconds>'.format(name=self.__class__.__name__, seconds=self.seconds)
+
+    def run(self, func, *args, **kwargs):
+        """Runs ``func(*args, **kwargs)`` in a worker process, and returns its result
+
+        :raises TimeoutError: If the call did not finish in time (unless timeouts are suppressed)
+        """
+        pool = self.pool if self.pool is not None else _get_default_pool()
+        try:
+            return pool.call(self.seconds, func, args, kwargs)
+        except _WorkerTimeoutError:
+            if self.suppress_errors:
+                return None
+            raise TimeoutError(self.timeout_message)
+
+    def __call__(self, func):
+        manager = self
+
+        @functools.wraps(func)
+        def inner(*args, **kwds):
+            if _in_worker:
+                # This is the copy of the decorated function which was sent to the worker process
+                return func(*args, **kwds)
+            return manager.run(inner, *args, **kwds)
+
+        return inner
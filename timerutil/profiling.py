@@ -0,0 +1,397 @@
+"""Provides threshold-triggered profiling: a :class:`~timerutil.waits.StopWatch` which samples the stack of the thread
+running each call, and keeps the samples only for calls which turn out to be slow.
+
+Stacks are sampled from a background thread (through :func:`sys._current_frames`), so the profiled code is not
+instrumented at all. Calls which finish within the threshold cost little more than a plain StopWatch, and calls
+shorter than the sampling interval are never sampled. The samples of slow calls are aggregated per call site in
+bounded memory, so the profiler can stay enabled in production, where it catches exactly the rare outliers
+that are missing from a one-off profile:
+    .. code-block:: python
+
+        timer = SamplingStopWatch(threshold=.5)
+
+        @timer
+        def handle_request(request):
+            ...
+
+        # Later...
+        with open('slow-requests.folded', 'w') as f:
+            f.write(timer.collapsed())  # then: flamegraph.pl slow-requests.folded > slow-requests.svg
+"""
+import functools
+import logging
+import sys
+import threading
+from contextvars import ContextVar
+
+from timerutil.compat import get_time
+from timerutil.waits import StopWatch
+
+__all__ = [
+    'CallSiteProfile',
+    'SamplingStopWatch'
+]
+
+logger = logging.getLogger(__name__)
+
+
+class CallSiteProfile(object):
+    """The aggregated stack samples of the slow calls made from a single call site
+
+    Each stack is a tuple of ``(filename, function name, line number)`` frames, outermost first, starting from the
+    frame which entered the :class:`SamplingStopWatch` (or from the decorated function).
+
+    :ivar site: The call site: the name of the :class:`SamplingStopWatch` (or of the function it decorates),
+        or else the ``filename:line`` at which it was entered
+    :vartype site: str
+    :ivar calls: The number of slow calls profiled
+    :vartype calls: int
+    :ivar samples: The number of samples taken, including those which were dropped
+    :vartype samples: int
+    :ivar stacks: The number of samples of each distinct stack
+    :vartype stacks: dict
+    :ivar dropped: The number of samples which were dropped because :attr:`stacks` was full
+    :vartype dropped: int
+    """
+
+    def __init__(self, site, max_stacks):
+        self.site = site
+        self.max_stacks = max_stacks
+        self.calls = 0
+        self.samples = 0
+        self.stacks = {}
+        self.dropped = 0
+
+    def __repr__(self):
+        return '<{name}: {site!r} calls={calls} samples={samples}>'.format(
+            name=self.__class__.__name__, site=self.site, calls=self.calls, samples=self.samples
+        )
+
+    def _add(self, samples):
+        """Adds the samples of a single slow call"""
+        self.calls += 1
+        self.samples += len(samples)
+        stacks = self.stacks
+        for stack in samples:
+            if stack in stacks:
+                stacks[stack] += 1
+            elif len(stacks) < self.max_stacks:
+                stacks[stack] = 1
+            else:
+                self.dropped += 1
+
+    def most_common(self, n=None):
+        """Returns the ``n`` most frequently sampled stacks (or all of them), with their sample counts
+
+        :rtype: list[tuple]
+        """
+        stacks = sorted(self.stacks.items(), key=lambda item: item[1], reverse=True)
+        return stacks if n is None else stacks[:n]
+
+    def collapsed(self):
+        """Exports the samples in the collapsed-stack format read by ``flamegraph.pl`` and speedscope,
+        with the call site as the root frame
+
+        :rtype: str
+        """
+        root = self.site.replace(';', ':')
+        lines = []
+        for stack, count in sorted(self.stacks.items()):
+            frames = ';'.join(
+                '{}:{}:{}'.format(filename, name, lineno).replace(';', ':') for filename, name, lineno in stack
+            )
+            lines.append('{};{} {}\n'.format(root, frames, count) if frames else '{} {}\n'.format(root, count))
+        return ''.join(lines)
+
+
+class _Sampler(object):
+    """Samples the stack of a single thread, below a given frame, until it is stopped"""
+    __slots__ = ('thread_id', 'stop_frame', 'include_stop_frame', 'site', 'interval', 'max_samples', 'samples',
+                 'next_sample')
+
+    def __init__(self, stop_frame, include_stop_frame, interval, max_samples):
+        self.thread_id = threading.get_ident()
+        self.stop_frame = stop_frame
+        self.include_stop_frame = include_stop_frame
+        # Where the sampled block was entered, which is only formatted if the call turns out to be slow
+        self.site = (stop_frame.f_code.co_filename, stop_frame.f_lineno)
+        self.interval = interval
+        self.max_samples = max_samples
+        self.samples = []
+        self.next_sample = get_time() + interval
+
+    def sample(self, frame, now):
+        """Records the stack of the thread (run by the sampling thread)
+
+        :param frame: The thread's current frame, or ``None`` if it has none
+        :param now: The current time (as returned by :func:`~timerutil.compat.get_time`)
+        :type now: float
+        """
+        self.next_sample = now + self.interval
+        stop_frame = self.stop_frame
+        if stop_frame is None or len(self.samples) >= self.max_samples:
+            return
+
+        stack = []
+        while frame is not None and frame is not stop_frame:
+            stack.append((frame.f_code.co_filename, frame.f_code.co_name, frame.f_lineno))
+            frame = frame.f_back
+
+        if frame is None:
+            # The sampled block is not on the thread's stack right now (e.g. it is a suspended coroutine)
+            return
+        if self.include_stop_frame:
+            stack.append((frame.f_code.co_filename, frame.f_code.co_name, frame.f_lineno))
+
+        stack.reverse()
+        self.samples.append(tuple(stack))
+
+    def stop(self):
+        """Stops sampling
+
+        :return: The samples taken. Any sample taken after this returns is discarded.
+        :rtype: tuple
+        """
+        self.stop_frame = None
+        return tuple(self.samples)
+
+
+class _SamplingThread(object):
+    """Samples the stack of every active :class:`_Sampler` from a single daemon thread, which wakes whenever the
+    earliest sample of the registered samplers is due, and blocks while no sampler is registered. Registering a
+    sampler is a single dictionary store (and a check of an event), so calls which finish before they are sampled
+    cost little more than that. A sampler which is registered while the thread waits for a later sample is first
+    sampled once that wait ends.
+    """
+
+    def __init__(self):
+        self._samplers = {}
+        self._thread = None
+        self._lock = threading.Lock()
+        # Set once a sampler is registered, so that the idle thread wakes up
+        self._registered = threading.Event()
+
+    def __len__(self):
+        """The number of samplers currently registered"""
+        return len(self._samplers)
+
+    def register(self, sampler):
+        if self._thread is None:
+            self._start()
+        self._samplers[id(sampler)] = sampler
+        if not self._registered.is_set():
+            self._registered.set()
+
+    def unregister(self, sampler):
+        self._samplers.pop(id(sampler), None)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='timerutil-stack-sampler')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _run(self):
+        """The main loop of the sampling thread"""
+        # Waits on an event which is never set (rather than calling `time.sleep`), so that the waits do not show up
+        # in the sleeps of the profiled code when `time.sleep` is patched
+        sleep = threading.Event().wait
+        while True:
+            try:
+                delay = self.sample()
+            except Exception:
+                logger.exception('Unhandled exception in the stack sampling thread')
+                delay = None
+
+            if delay is not None:
+                sleep(delay)
+                continue
+            # A sampler registered after this clears the event sets it again (having already been stored),
+            # so it is either seen by the check below, or it ends the wait
+            self._registered.clear()
+            if not self._samplers:
+                self._registered.wait()
+
+    def sample(self, now=None):
+        """Samples every registered sampler which is due
+
+        :param now: (Optional) The current time (as returned by :func:`~timerutil.compat.get_time`)
+        :type now: float
+        :return: The number of seconds until the next sample is due, or ``None`` if no sampler is registered
+        :rtype: float
+        """
+        samplers = list(self._samplers.values())
+        if not samplers:
+            return None
+
+        now = get_time() if now is None else now
+        frames = None
+        next_sample = None
+        for sampler in samplers:
+            if now >= sampler.next_sample:
+                if frames is None:
+                    frames = sys._current_frames()
+                sampler.sample(frames.get(sampler.thread_id), now)
+            if next_sample is None or sampler.next_sample < next_sample:
+                next_sample = sampler.next_sample
+        return max(next_sample - now, 0)
+
+
+# Samples are taken on a thread of their own, so that sampling never delays timeouts (and vice versa)
+_sampling_thread = _SamplingThread()
+
+# The samplers of the invocations which the current thread/task has entered, as (stopwatch, sampler) pairs,
+# innermost last
+_active_samplers = ContextVar('timerutil_active_samplers', default=())
+
+
+class SamplingStopWatch(StopWatch):
+    """A :class:`~timerutil.waits.StopWatch` which samples the stack of the thread running each call, every
+    ``interval`` seconds, and keeps the samples of calls whose runtime reaches ``threshold`` seconds.
+
+    Usage as a context manager:
+        .. code-block:: python
+
+            timer = SamplingStopWatch(threshold=.1, interval=.001)
+
+            with timer:
+                rebuild_index()
+
+            for site, profile in timer.profiles.items():
+                for stack, count in profile.most_common(5):
+                    print(site, count, stack[-1])
+
+    Memory is bounded by ``max_samples`` per call, ``max_stacks`` distinct stacks per call site, and ``max_sites``
+    call sites; samples (or slow calls) beyond those limits are counted as dropped.
+
+    .. note:: Samples show the whole stack of the thread, so within :mod:`asyncio` they may include other tasks
+        which ran on the same thread while the block was suspended.
+
+    :ivar threshold: The runtime (in seconds) at or above which the samples of a call are kept
+    :vartype threshold: float
+    :ivar interval: The number of seconds between samples
+    :vartype interval: float
+    :ivar dropped: The number of slow calls whose samples were dropped, because ``max_sites`` call sites
+        had already been profiled
+    :vartype dropped: int
+    """
+
+    def __init__(self, threshold, interval=.005, max_samples=1000, max_stacks=1000, max_sites=100, histograms=False,
+                 clock=None, tracer=None, name=None):
+        """Initializes a SamplingStopWatch
+
+        :param threshold: The runtime (in seconds) at or above which the samples of a call are kept
+        :type threshold: int, float
+        :param interval: (Optional) The number of seconds between samples. Defaults to 0.005.
+        :type interval: float
+        :param max_samples: (Optional) The largest number of samples taken during a single call. Defaults to 1000.
+        :type max_samples: int
+        :param max_stacks: (Optional) The largest number of distinct stacks kept for each call site.
+            Defaults to 1000.
+        :type max_stacks: int
+        :param max_sites: (Optional) The largest number of call sites profiled. Defaults to 100.
+        :type max_sites: int
+        :param histograms: (Optional) See :class:`~timerutil.waits.StopWatch`
+        :type histograms: bool
+        :param clock: (Optional) See :class:`~timerutil.waits.StopWatch`
+        :type clock: str, timerutil.compat.Clock
+        :param tracer: (Optional) See :class:`~timerutil.waits.StopWatch`
+        :type tracer: timerutil.tracing.Tracer, bool
+        :param name: (Optional) The name of the call site (and of any recorded spans). Defaults to the qualified name
+            of the decorated function, or else the location at which the SamplingStopWatch was entered.
+        :type name: str
+        """
+        if interval <= 0:
+            raise ValueError('interval must be greater than 0')
+
+        super(SamplingStopWatch, self).__init__(histograms=histograms, clock=clock, tracer=tracer, name=name)
+        self.threshold = threshold
+        self.interval = interval
+        self.max_samples = max_samples
+        self.max_stacks = max_stacks
+        self.max_sites = max_sites
+        self.dropped = 0
+        self._profiles = {}
+        self._profiles_lock = threading.Lock()
+        self._wrapper_code = None
+
+    def __call__(self, func):
+        if self.name is None:
+            self.name = getattr(func, '__qualname__', func.__name__)
+
+        @functools.wraps(func)
+        def inner(*args, **kwds):
+            with self._recreate_cm():
+                return func(*args, **kwds)
+
+        # Samples of decorated calls start from the decorated function, rather than from this wrapper
+        self._wrapper_code = inner.__code__
+        return inner
+
+    def __enter__(self):
+        frame = sys._getframe(1)
+        sampler = _Sampler(frame, frame.f_code is not self._wrapper_code, self.interval, self.max_samples)
+        _active_samplers.set(_active_samplers.get() + ((self, sampler),))
+        _sampling_thread.register(sampler)
+        return super(SamplingStopWatch, self).__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        sampler = self._pop_sampler()
+        _sampling_thread.unregister(sampler)
+        samples = sampler.stop()
+
+        call = self._current_call()
+        super(SamplingStopWatch, self).__exit__(exc_type, exc_val, exc_tb)
+        if call.runtime >= self.threshold:
+            self._keep(sampler, samples)
+
+    def _pop_sampler(self):
+        """Removes (and returns) the sampler of this SamplingStopWatch's innermost invocation in the current
+        thread/task
+        """
+        active_samplers = _active_samplers.get()
+        for position in range(len(active_samplers) - 1, -1, -1):
+            stopwatch, sampler = active_samplers[position]
+            if stopwatch is self:
+                _active_samplers.set(active_samplers[:position] + active_samplers[position + 1:])
+                return sampler
+        raise RuntimeError('{!r} was exited without being entered'.format(self))
+
+    def _keep(self, sampler, samples):
+        """Adds the samples of a slow call to the profile of its call site"""
+        site = self.name
+        if site is None:
+            site = '{}:{}'.format(*sampler.site)
+
+        with self._profiles_lock:
+            profile = self._profiles.get(site)
+            if profile is None:
+                if len(self._profiles) >= self.max_sites:
+                    self.dropped += 1
+                    return
+                profile = self._profiles[site] = CallSiteProfile(site, self.max_stacks)
+            profile._add(samples)
+
+    @property
+    def profiles(self):
+        """The profile of each call site which has made a slow call
+
+        :rtype: dict[str, CallSiteProfile]
+        """
+        with self._profiles_lock:
+            return dict(self._profiles)
+
+    def collapsed(self):
+        """Exports the samples of every call site in the collapsed-stack format
+        (see :meth:`CallSiteProfile.collapsed`)
+
+        :rtype: str
+        """
+        return ''.join(profile.collapsed() for _, profile in sorted(self.profiles.items()))
+
+    def clear_profiles(self):
+        """Discards every profile"""
+        with self._profiles_lock:
+            self._profiles = {}
+            self.dropped = 0
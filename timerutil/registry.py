@@ -0,0 +1,193 @@
+"""Provides a process-wide registry of named timers, whose statistics can be exported in the Prometheus text
+exposition format or as JSON.
+
+Timers are created on first use, and the same timer is returned for the same name thereafter:
+    .. code-block:: python
+
+        import timerutil
+
+        @timerutil.timer('db.query')
+        def query(sql):
+            ...
+
+        with timerutil.timer('cache.fill'):
+            ...
+
+        # e.g. from the handler serving the metrics endpoint
+        body = timerutil.registry.default_registry.prometheus_text()
+
+Each timer records into per-thread shards (see :class:`~timerutil.stats.ShardedTimingStats`), which are only
+merged when a snapshot is exported, so timed code never contends on a shared lock.
+"""
+import json
+import math
+import threading
+
+from timerutil.stats import ShardedTimingStats
+from timerutil.waits import (
+    ObservableWaiter,
+    StopWatch
+)
+
+__all__ = [
+    'default_registry',
+    'timer',
+    'TimerRegistry'
+]
+
+# The quantiles exported for each timer, when histograms are enabled
+PROMETHEUS_QUANTILES = (.5, .9, .99, .999)
+
+
+def _escape_label_value(value):
+    """Escapes a string for use as a Prometheus label value"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_sample(value):
+    """Formats a number as a Prometheus sample value"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class TimerRegistry(object):
+    """A collection of named :class:`~timerutil.waits.StopWatch` (or :class:`~timerutil.waits.ObservableWaiter`)
+    instances, whose statistics are recorded into per-thread shards.
+    """
+
+    def __init__(self, histograms=True):
+        """Initializes an empty TimerRegistry
+
+        :param histograms: (Optional) If ``True``, record the distribution of each timer's measurements, so that
+            quantiles can be exported. Defaults to ``True``.
+        :type histograms: bool
+        """
+        self.histograms = histograms
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<{name}: {count} timers>'.format(name=self.__class__.__name__, count=len(self._timers))
+
+    def __contains__(self, name):
+        return name in self._timers
+
+    def __iter__(self):
+        """Iterates over the names of the registered timers, in sorted order"""
+        with self._lock:
+            return iter(sorted(self._timers))
+
+    def timer(self, name, minimum_time=0):
+        """Returns the timer registered with the given name, registering a new one if necessary
+
+        :param name: The name of the timer (e.g. ``'db.query'``)
+        :type name: str
+        :param minimum_time: (Optional) If nonzero, the timer is an :class:`~timerutil.waits.ObservableWaiter`
+            which enforces this minimum time; otherwise it is a :class:`~timerutil.waits.StopWatch`. Defaults to 0.
+        :type minimum_time: int, float
+        :raises ValueError: If a timer with the same name, but a different minimum time, is already registered
+        :rtype: timerutil.waits.ObservableWaiter
+        """
+        try:
+            existing = self._timers[name]
+        except KeyError:
+            with self._lock:
+                existing = self._timers.get(name)
+                if existing is None:
+                    existing = StopWatch() if minimum_time == 0 else ObservableWaiter(minimum_time)
+                    existing.stats = ShardedTimingStats(histograms=self.histograms)
+                    self._timers[name] = existing
+
+        if existing.minimum_time != minimum_time:
+            raise ValueError('Timer {!r} is already registered with a minimum time of {!r}'.format(
+                name, existing.minimum_time
+            ))
+        return existing
+
+    def unregister(self, name):
+        """Removes a timer from the registry
+
+        :param name: The name of the timer
+        :type name: str
+        :raises KeyError: If no timer is registered with the given name
+        """
+        with self._lock:
+            del self._timers[name]
+
+    def snapshot(self, reset=False):
+        """Returns the merged statistics of every registered timer
+
+        :param reset: (Optional) If ``True``, reset each timer's statistics after taking the snapshot.
+            Defaults to ``False``.
+        :type reset: bool
+        :return: A mapping of timer names to their :class:`~timerutil.stats.TimingStats`
+        :rtype: dict
+        """
+        with self._lock:
+            timers = sorted(self._timers.items())
+
+        return dict((name, timer.stats.snapshot(reset=reset)) for name, timer in timers)
+
+    def to_json(self, reset=False, **kwargs):
+        """Returns a JSON document summarizing the statistics of every registered timer
+
+        :param reset: (Optional) See :meth:`snapshot`
+        :type reset: bool
+        :param kwargs: (Optional) Extra keyword arguments for :func:`json.dumps`
+        :rtype: str
+        """
+        kwargs.setdefault('sort_keys', True)
+        return json.dumps(
+            dict((name, stats.as_dict()) for name, stats in self.snapshot(reset=reset).items()),
+            **kwargs
+        )
+
+    def prometheus_text(self, prefix='timerutil', reset=False):
+        """Returns the statistics of every registered timer in the Prometheus text exposition format.
+
+        Runtimes and elapsed times are each exported as a ``summary`` (in seconds), labelled with the timer's name.
+
+        :param prefix: (Optional) The prefix of every metric name. Defaults to ``'timerutil'``.
+        :type prefix: str
+        :param reset: (Optional) See :meth:`snapshot`
+        :type reset: bool
+        :rtype: str
+        """
+        snapshot = sorted(self.snapshot(reset=reset).items())
+        lines = []
+
+        for measurement, description in (('runtime', 'Duration of wrapped operations'),
+                                         ('elapsed', 'Duration for which timers were active')):
+            metric = '{}_{}_seconds'.format(prefix, measurement)
+            lines.append('# HELP {} {}.'.format(metric, description))
+            lines.append('# TYPE {} summary'.format(metric))
+
+            for name, stats in snapshot:
+                label = 'timer="{}"'.format(_escape_label_value(name))
+                histogram = getattr(stats, measurement + '_histogram')
+
+                if histogram is not None:
+                    for quantile in PROMETHEUS_QUANTILES:
+                        lines.append('{}{{{},quantile="{}"}} {}'.format(
+                            metric, label, quantile, _format_sample(histogram.percentile(quantile * 100))
+                        ))
+
+                lines.append('{}_sum{{{}}} {}'.format(metric, label, _format_sample(
+                    getattr(stats, 'total_' + measurement)
+                )))
+                lines.append('{}_count{{{}}} {}'.format(metric, label, stats.count))
+
+        return '\n'.join(lines) + '\n'
+
+
+default_registry = TimerRegistry()
+
+
+def timer(name, minimum_time=0):
+    """Returns the timer registered with the given name in the :attr:`default_registry`
+    (see :meth:`TimerRegistry.timer`)
+    """
+    return default_registry.timer(name, minimum_time)
@@ -0,0 +1,305 @@
+"""Provides retries with exponential backoff (and jitter) which respect deadlines: each attempt is limited to the time
+that remains, and retrying stops as soon as the remaining budget could not fit another attempt.
+
+The budget is the sooner of the retry's own ``timeout`` and any deadline already in effect (such as that of an
+enclosing :class:`~timerutil.timeouts.TimeoutManager` or :class:`~timerutil.deadlines.Deadline`), so a retry loop
+never outlives the caller which is waiting on it:
+    .. code-block:: python
+
+        @Retry(attempts=5, timeout=2, attempt_timeout=.5, retry_on=(ConnectionError,))
+        def fetch_profile(user_id):
+            return profile_service.get(user_id)
+
+A block of code can be retried by iterating over the attempts:
+    .. code-block:: python
+
+        for attempt in Retry(attempts=5, timeout=2):
+            with attempt:
+                response = session.get(url, timeout=remaining())
+
+Backoff delays are drawn with "full jitter" (uniformly between zero and the exponentially growing delay),
+so that clients which failed together do not retry together.
+"""
+import functools
+import random
+
+from timerutil.compat import (
+    get_time,
+    TimeoutError
+)
+from timerutil.deadlines import (
+    _pop_scope,
+    _push_scope,
+    remaining
+)
+from timerutil.stats import TimingStats
+from timerutil.timeouts import (
+    DEFAULT_TIMEOUT_MESSAGE,
+    TimeoutManager
+)
+from timerutil.waits import (
+    _WaiterCall,
+    ObservableWaiter
+)
+
+__all__ = [
+    'Attempt',
+    'Retry'
+]
+
+
+class _RetryCall(_WaiterCall):
+    """The timing state of a single retried operation"""
+    __slots__ = ('attempts', 'scope')
+
+    def __init__(self, start_time=None):
+        super(_RetryCall, self).__init__(start_time)
+        self.runtime = 0
+        self.attempts = 0
+        # The overall deadline of the operation, if the Retry has a timeout
+        self.scope = None
+
+
+class Attempt(object):
+    """A context manager for a single attempt of a :class:`Retry`, which limits the attempt to its share of the budget,
+    and swallows the errors which are to be retried
+
+    :ivar number: The number of this attempt, starting from 1
+    :vartype number: int
+    :ivar error: The error which failed this attempt, if any
+    :vartype error: BaseException
+    """
+    __slots__ = ('retry', 'number', 'seconds', 'wait_time', 'error', 'succeeded', '_manager', '_start')
+
+    def __init__(self, retry, number, seconds, wait_time):
+        self.retry = retry
+        self.number = number
+        # The longest the attempt may run for, or None if it is unlimited
+        self.seconds = seconds
+        # The number of seconds spent backing off before the attempt
+        self.wait_time = wait_time
+        self.error = None
+        self.succeeded = False
+        self._manager = None
+        self._start = None
+
+    def __repr__(self):
+        return '<{name}: {number}>'.format(name=self.__class__.__name__, number=self.number)
+
+    def _timeout_manager(self):
+        """Creates the manager which limits this attempt (``None`` if the attempt is unlimited)"""
+        if self.seconds is None:
+            return None
+        return TimeoutManager(self.seconds, timeout_message=self.retry.timeout_message)
+
+    def __enter__(self):
+        self._manager = self._timeout_manager()
+        if self._manager is not None:
+            self._manager.__enter__()
+        self._start = get_time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._manager is not None:
+            self._manager.__exit__(exc_type, exc_val, exc_tb)
+        return self._finish(exc_val)
+
+    def _finish(self, error, timed_out=None):
+        """Records the outcome of the attempt
+
+        :return: Whether the error (if any) is to be retried, and should therefore be swallowed
+        :rtype: bool
+        """
+        self.retry._record_attempt(self, get_time() - self._start)
+        if error is None:
+            self.succeeded = True
+            return False
+
+        if timed_out is None:
+            timed_out = self._manager is not None and self._manager.last_timed_out
+        if timed_out or isinstance(error, self.retry.retry_on):
+            self.error = error
+            return True
+        return False
+
+
+class Retry(ObservableWaiter):
+    """Decorator (or iterable of :class:`Attempt` context managers) which retries an operation with exponential
+    backoff, within an overall budget.
+
+    Before each retry, the operation backs off for a randomized delay. If the delay, plus the time that attempts have
+    taken so far (on average), would not fit within the remaining budget, the error of the last attempt is raised
+    at once instead. Each attempt is also limited to the remaining budget (and to ``attempt_timeout``), and attempts
+    which time out are retried.
+
+    Statistics are recorded through the :class:`~timerutil.waits.ObservableWaiter` interface: for each retried
+    operation, :attr:`last_runtime` is the time spent working (within attempts), and :attr:`last_elapsed` also
+    includes the time spent backing off. The same is recorded for each attempt into :attr:`attempt_stats`.
+
+    :ivar attempt_stats: Statistics for every attempt, where each elapsed time includes the backoff before the attempt
+    :vartype attempt_stats: timerutil.stats.TimingStats
+    """
+    attempt_class = Attempt
+
+    def __init__(self, attempts=3, timeout=None, attempt_timeout=None, backoff=.1, multiplier=2, max_backoff=10,
+                 jitter=True, retry_on=(Exception,), timeout_message=DEFAULT_TIMEOUT_MESSAGE, histograms=False,
+                 scheduler=None):
+        """Initializes a Retry
+
+        :param attempts: (Optional) The largest number of attempts (including the first). Defaults to 3.
+        :type attempts: int
+        :param timeout: (Optional) The number of seconds after which to give up, across every attempt and backoff.
+            By default, only the deadline already in effect (if any) limits the retries.
+        :type timeout: int, float
+        :param attempt_timeout: (Optional) The longest time (in seconds) for which each attempt may run.
+        :type attempt_timeout: int, float
+        :param backoff: (Optional) The delay (in seconds) before the first retry. Defaults to 0.1.
+        :type backoff: int, float
+        :param multiplier: (Optional) The factor by which the delay grows for each further retry. Defaults to 2.
+        :type multiplier: int, float
+        :param max_backoff: (Optional) The longest delay before a retry, in seconds. Defaults to 10.
+        :type max_backoff: int, float
+        :param jitter: (Optional) If ``True``, each delay is drawn uniformly between zero and the exponentially
+            growing delay. Defaults to ``True``.
+        :type jitter: bool
+        :param retry_on: (Optional) The exception type (or tuple of types) which are retried. Attempts which time out
+            are always retried. Defaults to :exc:`Exception`.
+        :type retry_on: type, tuple
+        :param timeout_message: (Optional) See :class:`~timerutil.timeouts.TimeoutManager`
+        :type timeout_message: str
+        :param histograms: (Optional) See :class:`~timerutil.waits.ObservableWaiter`
+        :type histograms: bool
+        :param scheduler: (Optional) See :class:`~timerutil.waits.Waiter`
+        :type scheduler: timerutil.scheduling.SleepScheduler, bool
+        """
+        if attempts < 1:
+            raise ValueError('attempts must be at least 1')
+
+        super(Retry, self).__init__(0, histograms=histograms, scheduler=scheduler)
+        self.attempts = attempts
+        self.timeout = timeout
+        self.attempt_timeout = attempt_timeout
+        self.backoff = backoff
+        self.multiplier = multiplier
+        self.max_backoff = max_backoff
+        self.jitter = bool(jitter)
+        self.retry_on = retry_on
+        self.timeout_message = timeout_message
+        self.attempt_stats = TimingStats(histograms=histograms)
+        self._random = random.Random()
+
+    def __repr__(self):
+        return '<{name}: {attempts} attempts>'.format(name=self.__class__.__name__, attempts=self.attempts)
+
+    @property
+    def last_attempts(self):
+        """The number of attempts made by the last retried operation"""
+        call = self._get_last_call()
+        return None if call is None else call.attempts
+
+    def _delay(self, retry_number):
+        """Returns the delay before the given retry (counting from 1), in seconds"""
+        delay = min(self.backoff * self.multiplier ** (retry_number - 1), self.max_backoff)
+        return self._random.uniform(0, delay) if self.jitter else delay
+
+    def _attempt_seconds(self):
+        """Returns the longest time for which the next attempt may run (``None`` if unlimited)"""
+        budget = remaining()
+        if self.attempt_timeout is None:
+            return budget
+        return self.attempt_timeout if budget is None else min(self.attempt_timeout, budget)
+
+    def _can_retry(self, call, delay):
+        """Returns whether another attempt, after the given delay, could fit within the remaining budget"""
+        budget = remaining()
+        return budget is None or delay + call.runtime / call.attempts < budget
+
+    def _enter_call(self):
+        call = _RetryCall(self._get_time())
+        self._push_call(call)
+        return call
+
+    def _begin(self):
+        """Starts timing a retried operation, and establishes its overall deadline
+
+        :rtype: _RetryCall
+        """
+        call = self._enter_call()
+        if self.timeout is not None:
+            call.scope = _push_scope(call.start_time + self.timeout, self)
+        return call
+
+    def _end(self, call):
+        """Stops timing a retried operation, and removes its overall deadline"""
+        if call.scope is not None:
+            _pop_scope(call.scope)
+        self._exit_call()
+        self._record_elapsed(call)
+
+    def _record_attempt(self, attempt, work_time):
+        call = self._current_call()
+        call.runtime += work_time
+        call.attempts += 1
+        self.attempt_stats.record(work_time, attempt.wait_time + work_time)
+
+    def _next_wait(self, call, number, last_error):
+        """Returns the delay before the given attempt (counting from 1)
+
+        :raises: The error of the last attempt, if no further attempt could fit within the budget
+        """
+        if number == 1:
+            return 0
+        if number > self.attempts:
+            raise last_error
+
+        delay = self._delay(number - 1)
+        if not self._can_retry(call, delay):
+            raise last_error
+        return delay
+
+    def _new_attempt(self, number, wait_time, last_error):
+        """Creates the given attempt (counting from 1), limited to the remaining budget
+
+        :rtype: Attempt
+        :raises: The error of the last attempt (or a :exc:`TimeoutError`), if no budget remains
+        """
+        seconds = self._attempt_seconds()
+        if seconds is not None and seconds <= 0:
+            raise last_error if last_error is not None else TimeoutError(self.timeout_message)
+        return self.attempt_class(self, number, seconds, wait_time)
+
+    def __iter__(self):
+        """Yields an :class:`Attempt` for each attempt, until one succeeds
+
+        :raises: The error of the last attempt, once no attempts remain (or could fit within the budget)
+        """
+        call = self._begin()
+        try:
+            error = None
+            for number in range(1, self.attempts + 2):
+                delay = self._next_wait(call, number, error)
+                if delay:
+                    self._sleep_until(self._get_time() + delay)
+
+                attempt = self._new_attempt(number, delay, error)
+                yield attempt
+                if attempt.error is None:
+                    return
+                error = attempt.error
+        finally:
+            self._end(call)
+
+    def __enter__(self):
+        raise TypeError('{} is not a context manager; use `for attempt in retry: with attempt: ...`'.format(
+            self.__class__.__name__
+        ))
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def inner(*args, **kwds):
+            for attempt in self:
+                with attempt:
+                    result = func(*args, **kwds)
+            return result
+
+        return inner
@@ -0,0 +1,499 @@
+"""Provides a central scheduler which runs callbacks at absolute deadlines from a single background thread,
+along with the timer queues that it may use to track those deadlines.
+
+Rather than starting a thread (or a :class:`threading.Timer`) for every deadline, any number of deadlines
+can share one :class:`DeadlineScheduler`. By default, deadlines are kept in a :class:`HeapTimerQueue`,
+so scheduling and cancelling a callback each cost ``O(log n)`` (amortized) in the number of outstanding deadlines.
+When very many deadlines are outstanding (and most are cancelled before they expire), a :class:`TimingWheel`
+makes both operations ``O(1)`` in exchange for firing deadlines up to one tick late.
+
+For example, to call a function roughly half a second from now (unless it is cancelled first):
+    .. code-block:: python
+
+        scheduler = DeadlineScheduler()
+        handle = scheduler.schedule(get_time() + .5, lambda: print('Half a second has passed'))
+
+        if finished_early:
+            scheduler.cancel(handle)
+"""
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import weakref
+from concurrent import futures
+from functools import partial
+
+from timerutil.compat import get_time
+
+__all__ = [
+    'DeadlineScheduler',
+    'HeapTimerQueue',
+    'SleepScheduler',
+    'TimingWheel'
+]
+
+logger = logging.getLogger(__name__)
+
+# Cancelled entries are discarded lazily, so the heap is only compacted once it holds at least this many of them
+_COMPACTION_THRESHOLD = 64
+
+
+class HeapTimerQueue(object):
+    """A timer queue backed by a binary heap, which expires items in exactly the order of their deadlines.
+
+    Pushing an item costs ``O(log n)``. Cancelled items are discarded lazily (the heap is compacted
+    once most of its entries have been cancelled), so cancellation costs ``O(log n)`` amortized.
+
+    .. note:: Timer queues are not thread-safe; :class:`DeadlineScheduler` serializes access to its queue.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._cancelled = 0
+
+    def __len__(self):
+        """The number of items which have been neither expired nor cancelled"""
+        return len(self._heap) - self._cancelled
+
+    def push(self, deadline, item):
+        """Adds an item to the queue
+
+        :param deadline: The time after which the item expires
+        :type deadline: float
+        :param item: The item to be returned by :meth:`pop_expired` once its deadline has passed. Must not be ``None``.
+        :return: A handle which may be passed to :meth:`cancel`
+        """
+        handle = [deadline, next(self._counter), item]
+        heapq.heappush(self._heap, handle)
+        return handle
+
+    def cancel(self, handle):
+        """Removes an item from the queue
+
+        :param handle: A handle previously returned by :meth:`push`
+        :return: ``True`` if the item was removed, or ``False`` if it has already expired (or been cancelled)
+        :rtype: bool
+        """
+        if handle[2] is None:
+            return False
+
+        handle[2] = None
+        self._cancelled += 1
+
+        if self._cancelled > _COMPACTION_THRESHOLD and self._cancelled > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if entry[2] is not None]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+        return True
+
+    def clear(self):
+        """Discards every item in the queue"""
+        for handle in self._heap:
+            handle[2] = None
+        self._heap = []
+        self._cancelled = 0
+
+    def next_deadline(self):
+        """Returns the earliest deadline in the queue, or ``None`` if the queue is empty
+
+        :rtype: float
+        """
+        return self._heap[0][0] if self._heap else None
+
+    def pop_expired(self, now):
+        """Removes and returns every item whose deadline is no later than the given time, in order of their deadlines
+
+        :param now: The current time
+        :type now: float
+        :rtype: list
+        """
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            handle = heapq.heappop(self._heap)
+            item, handle[2] = handle[2], None
+
+            if item is None:
+                self._cancelled -= 1
+            else:
+                expired.append(item)
+
+        return expired
+
+
+class _WheelTimer(object):
+    """An item scheduled within a :class:`TimingWheel`"""
+    __slots__ = ('tick', 'item', 'slot')
+
+    def __init__(self, tick, item):
+        self.tick = tick
+        self.item = item
+        self.slot = None
+
+
+class TimingWheel(object):
+    """A hierarchical timing wheel, which arms and cancels timers in ``O(1)``.
+
+    Time is divided into ticks of a fixed resolution. The first wheel has one slot per tick, and each slot
+    of every subsequent wheel spans a full revolution of the wheel below it. Timers are placed in the lowest wheel
+    whose range covers their deadline, and are cascaded down into the lower wheels as their deadline approaches,
+    so most timers which are cancelled well before their deadline never move at all.
+
+    With the default configuration (a 1 millisecond resolution, and 4 wheels of 256 slots each),
+    deadlines up to about 49 days away are placed directly; later deadlines are simply re-placed each time
+    the last wheel comes around.
+
+    Timers expire within the tick that follows their deadline: never early, but up to one tick late.
+
+    .. note:: Timer queues are not thread-safe; :class:`DeadlineScheduler` serializes access to its queue.
+    """
+
+    def __init__(self, resolution=.001, wheel_size=256, levels=4, start=None):
+        """Initializes a new TimingWheel
+
+        :param resolution: (Optional) The duration of each tick, in seconds. Defaults to 1 millisecond.
+        :type resolution: float
+        :param wheel_size: (Optional) The number of slots in each wheel. Defaults to 256.
+        :type wheel_size: int
+        :param levels: (Optional) The number of wheels in the hierarchy. Defaults to 4.
+        :type levels: int
+        :param start: (Optional) The time from which the wheel begins turning.
+            Defaults to the current time, according to :func:`~timerutil.compat.get_time`.
+        :type start: float
+        """
+        if resolution <= 0 or wheel_size < 2 or levels < 1:
+            raise ValueError('resolution must be positive, wheel_size must be at least 2, and levels at least 1')
+
+        self.resolution = resolution
+        self.wheel_size = wheel_size
+        self.levels = levels
+        self._wheels = [[set() for _ in range(wheel_size)] for _ in range(levels)]
+        # The number of ticks spanned by each slot of every wheel, plus the total span of the last wheel
+        self._spans = [wheel_size ** level for level in range(levels + 1)]
+        # The next tick to be processed (every earlier tick has been processed already)
+        self._tick = int(math.floor((get_time() if start is None else start) / resolution))
+        self._count = 0
+
+    def __len__(self):
+        """The number of timers which have been neither expired nor cancelled"""
+        return self._count
+
+    def _place(self, timer):
+        """Puts a timer into the slot which covers its deadline, relative to the current tick"""
+        delta = timer.tick - self._tick
+
+        if delta < self.wheel_size:
+            slot = self._wheels[0][max(timer.tick, self._tick) % self.wheel_size]
+        else:
+            level = 1
+            while level < self.levels - 1 and delta >= self._spans[level + 1]:
+                level += 1
+            slot = self._wheels[level][(timer.tick // self._spans[level]) % self.wheel_size]
+
+        slot.add(timer)
+        timer.slot = slot
+
+    def _cascade(self, level, index):
+        """Re-places every timer from a slot of a higher wheel into the lower wheels"""
+        slot = self._wheels[level][index]
+        self._wheels[level][index] = set()
+
+        for timer in slot:
+            self._place(timer)
+
+    def push(self, deadline, item):
+        """Adds an item to the wheel
+
+        :param deadline: The time after which the item expires
+        :type deadline: float
+        :param item: The item to be returned by :meth:`pop_expired` once its deadline has passed
+        :return: A handle which may be passed to :meth:`cancel`
+        """
+        timer = _WheelTimer(int(math.ceil(deadline / self.resolution)), item)
+        self._place(timer)
+        self._count += 1
+        return timer
+
+    def cancel(self, handle):
+        """Removes an item from the wheel
+
+        :param handle: A handle previously returned by :meth:`push`
+        :return: ``True`` if the item was removed, or ``False`` if it has already expired (or been cancelled)
+        :rtype: bool
+        """
+        if handle.slot is None:
+            return False
+
+        handle.slot.discard(handle)
+        handle.slot = None
+        handle.item = None
+        self._count -= 1
+        return True
+
+    def clear(self):
+        """Discards every timer in the wheel"""
+        for wheel in self._wheels:
+            for slot in wheel:
+                for timer in slot:
+                    timer.slot = None
+                    timer.item = None
+                slot.clear()
+        self._count = 0
+
+    def next_deadline(self):
+        """Returns the earliest time at which :meth:`pop_expired` might expire an item
+        (or by which timers will need to be cascaded), or ``None`` if the wheel is empty
+
+        :rtype: float
+        """
+        if not self._count:
+            return None
+
+        # Timers in the higher wheels are next cascaded at the start of the first wheel's next revolution
+        next_tick = -(-self._tick // self.wheel_size) * self.wheel_size
+        for tick in range(self._tick, next_tick):
+            if self._wheels[0][tick % self.wheel_size]:
+                next_tick = tick
+                break
+
+        return next_tick * self.resolution
+
+    def pop_expired(self, now):
+        """Advances the wheel to the given time, removing and returning every item whose deadline has passed
+
+        :param now: The current time
+        :type now: float
+        :rtype: list
+        """
+        target = int(math.floor(now / self.resolution))
+        expired = []
+
+        while self._tick <= target:
+            if not self._count:
+                # Nothing is scheduled, so there is no need to turn through the intervening ticks
+                self._tick = target + 1
+                break
+
+            tick = self._tick
+            for level in range(self.levels - 1, 0, -1):
+                if tick % self._spans[level] == 0:
+                    self._cascade(level, (tick // self._spans[level]) % self.wheel_size)
+
+            index = tick % self.wheel_size
+            slot = self._wheels[0][index]
+            if slot:
+                self._wheels[0][index] = set()
+                for timer in sorted(slot, key=lambda timer: timer.tick):
+                    expired.append(timer.item)
+                    timer.slot = None
+                    timer.item = None
+                self._count -= len(slot)
+
+            self._tick += 1
+
+        return expired
+
+
+class DeadlineScheduler(object):
+    """Runs callbacks from a single daemon thread once their deadlines (as measured by
+    :func:`~timerutil.compat.get_time`) have passed.
+
+    The background thread is started lazily, the first time a callback is scheduled.
+
+    .. note:: Callbacks are run on the scheduler thread while holding the scheduler's lock,
+        which guarantees that :meth:`cancel` never returns while the callback it failed to cancel is still running.
+        Callbacks should therefore be brief. They may schedule (or cancel) other callbacks.
+    """
+
+    def __init__(self, name='timerutil-deadline-scheduler', queue=None):
+        """Initializes a new DeadlineScheduler
+
+        :param name: (Optional) The name given to the scheduler's background thread
+        :type name: str
+        :param queue: (Optional) The timer queue used to track deadlines. Defaults to a new :class:`HeapTimerQueue`.
+        :type queue: HeapTimerQueue, TimingWheel
+        """
+        self.name = name
+        self._condition = threading.Condition(threading.RLock())
+        self._queue = queue if queue is not None else HeapTimerQueue()
+        self._thread = None
+
+        if hasattr(os, 'register_at_fork'):
+            # Neither the scheduler thread nor the deadlines it was waiting on survive in a forked child
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._reset())
+
+    def __len__(self):
+        """The number of callbacks which are still waiting to be run"""
+        with self._condition:
+            return len(self._queue)
+
+    def _reset(self):
+        """Discards all scheduled callbacks (and the reference to the scheduler thread), e.g. after forking
+        """
+        self._condition = threading.Condition(threading.RLock())
+        self._queue.clear()
+        self._thread = None
+
+    def schedule(self, deadline, callback):
+        """Schedules a callback to be run once the given deadline has passed
+
+        :param deadline: The time (as returned by :func:`~timerutil.compat.get_time`) after which to run the callback
+        :type deadline: float
+        :param callback: A callable which will be invoked with no arguments
+        :type callback: callable
+        :return: A handle which may be passed to :meth:`cancel`
+        """
+        with self._condition:
+            previous_deadline = self._queue.next_deadline()
+            handle = self._queue.push(deadline, callback)
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name)
+                self._thread.daemon = True
+                self._thread.start()
+            elif previous_deadline is None or deadline < previous_deadline:
+                # The new deadline is now the earliest, so wake up the scheduler thread to wait on it instead
+                self._condition.notify()
+
+        return handle
+
+    def cancel(self, handle):
+        """Prevents a scheduled callback from being run
+
+        :param handle: A handle previously returned by :meth:`schedule`
+        :return: ``True`` if the callback was cancelled, or ``False`` if it has already been run (or cancelled)
+        :rtype: bool
+        """
+        with self._condition:
+            return self._queue.cancel(handle)
+
+    def _run(self):
+        """The main loop of the scheduler thread"""
+        with self._condition:
+            while True:
+                now = get_time()
+
+                for callback in self._queue.pop_expired(now):
+                    try:
+                        callback()
+                    except Exception:
+                        logger.exception('Unhandled exception in scheduled callback %r', callback)
+
+                deadline = self._queue.next_deadline()
+                self._condition.wait(None if deadline is None else max(deadline - get_time(), 0))
+
+
+class SleepScheduler(object):
+    """Releases sleeping threads (and tasks) from a single background thread, coalescing every wake-up which
+    falls within the same window into a single deadline.
+
+    Rather than each sleeper arming its own timer, sleepers wait on an event (or future) which the scheduler
+    sets once their window ends, so thousands of concurrent sleeps cost a single scheduler thread which wakes
+    at most once per window. Sleepers are never released early, but may be released up to one window late.
+
+    Usage:
+        .. code-block:: python
+
+            sleeper = SleepScheduler(window=.005)
+            sleeper.sleep(.25)
+
+            future = sleeper.future(get_time() + .25)
+            future.add_done_callback(respond)
+
+    :ivar window: The width (in seconds) of the windows within which wake-ups are coalesced
+    :vartype window: float
+    """
+
+    def __init__(self, window=.001, scheduler=None):
+        """Initializes a SleepScheduler
+
+        :param window: (Optional) The width of each coalescing window, in seconds. Defaults to 0.001.
+        :type window: float
+        :param scheduler: (Optional) The scheduler which runs the wake-ups. By default, a new scheduler is created.
+        :type scheduler: DeadlineScheduler
+        """
+        if window <= 0:
+            raise ValueError('window must be positive')
+
+        self.window = window
+        self.scheduler = scheduler if scheduler is not None else DeadlineScheduler('timerutil-sleep-scheduler')
+        # The callbacks waiting for the end of each window, keyed by the window's index
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """The number of callbacks which are waiting to be run"""
+        with self._lock:
+            return sum(len(callbacks) for callbacks in self._windows.values())
+
+    def call_at(self, deadline, callback):
+        """Runs a callback (from the scheduler thread) at the end of the window containing the given deadline
+
+        :param deadline: The time (as returned by :func:`~timerutil.compat.get_time`) after which to run the callback
+        :type deadline: float
+        :param callback: A brief callable which will be invoked with no arguments
+        :type callback: callable
+        """
+        index = int(math.ceil(deadline / self.window))
+        with self._lock:
+            callbacks = self._windows.get(index)
+            if callbacks is not None:
+                callbacks.append(callback)
+                return
+            self._windows[index] = [callback]
+
+        # The scheduler runs callbacks while holding its own lock, so only schedule once this lock has been released
+        self.scheduler.schedule(index * self.window, partial(self._release, index))
+
+    def _release(self, index):
+        """Runs every callback waiting for the end of the given window"""
+        with self._lock:
+            callbacks = self._windows.pop(index, ())
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception('Unhandled exception in sleep callback %r', callback)
+
+    def future(self, deadline):
+        """Returns a :class:`concurrent.futures.Future` which completes (with ``None``) once the given deadline
+        (and the window containing it) has passed
+
+        :param deadline: The time (as returned by :func:`~timerutil.compat.get_time`) to wait for
+        :type deadline: float
+        :rtype: concurrent.futures.Future
+        """
+        future = futures.Future()
+        future.set_running_or_notify_cancel()
+        self.call_at(deadline, partial(future.set_result, None))
+        return future
+
+    def sleep_until(self, deadline):
+        """Blocks the current thread until the given deadline (and the window containing it) has passed
+
+        :param deadline: The time (as returned by :func:`~timerutil.compat.get_time`) to wait for
+        :type deadline: float
+        """
+        if deadline <= get_time():
+            return
+        event = threading.Event()
+        self.call_at(deadline, event.set)
+        event.wait()
+
+    def sleep(self, seconds):
+        """Blocks the current thread for (at least) the given number of seconds
+
+        :param seconds: The number of seconds to sleep
+        :type seconds: int, float
+        """
+        self.sleep_until(get_time() + seconds)
+
+
+# The process-wide sleep scheduler, which Waiters may opt into
+default_sleep_scheduler = SleepScheduler()
@@ -0,0 +1,548 @@
+"""Provides timing statistics which are aggregated across processes, through a block of shared memory.
+
+Under a pre-forking server (or a :mod:`multiprocessing` pool), the statistics of each
+:class:`~timerutil.waits.ObservableWaiter` are otherwise trapped within the process which recorded them.
+A :class:`SharedTimingStats` is a drop-in replacement for :class:`~timerutil.stats.TimingStats` which records into
+a fixed-layout slot of a shared memory block instead, so that any process can read every worker's statistics,
+merged into a single view:
+    .. code-block:: python
+
+        # In the parent process, before forking workers
+        request_stats = SharedTimingStats(slots=32, histograms=True, name='myapp-requests')
+
+        timer = StopWatch()
+        timer.stats = request_stats
+
+        # In any process (including the parent), later
+        print('p99 across every worker:', request_stats.snapshot().runtime_histogram.p99)
+
+Processes which were not forked (or spawned) with the statistics, such as the workers of a server which does not
+preload the application, can attach to the block by name with :meth:`SharedTimingStats.attach`.
+
+Each process claims a slot of its own the first time it records (under a lock which is shared between processes), so
+processes never write to the same memory, and recording itself takes no lock which is shared between processes.
+Each slot is guarded by a sequence number (in the style of a seqlock), which readers use to copy a consistent view of
+a slot without blocking its writer.
+
+.. note:: Requires :mod:`multiprocessing.shared_memory` (Python 3.8 or later).
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from array import array
+from multiprocessing import context as multiprocessing_context
+
+from timerutil.compat import get_time
+from timerutil.stats import (
+    LogHistogram,
+    TimingStats
+)
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # pragma: nocover
+    # Shared memory was added in Python 3.8
+    shared_memory = None
+
+__all__ = [
+    'SharedTimingStats'
+]
+
+logger = logging.getLogger(__name__)
+
+# The default number of processes which may record into a SharedTimingStats at once
+DEFAULT_SLOTS = 64
+
+# Identifies a block laid out by this module (and the version of its layout)
+_MAGIC = 0x74696d6572730001
+
+# The layout of the header, in 8-byte words
+_HEADER_MAGIC = 0
+_HEADER_SLOTS = 1
+_HEADER_BUCKETS = 2
+_HEADER_EPOCH = 3
+_HEADER_WORDS = 4
+
+# The layout of each slot, in 8-byte words, followed by the runtime and then the elapsed histogram buckets (if any).
+# Integers are read through a view of signed 64-bit words, and floats through a view of doubles.
+_SLOT_OWNER = 0
+_SLOT_SEQUENCE = 1
+_SLOT_EPOCH = 2
+_SLOT_COUNT = 3
+_SLOT_TOTAL_RUNTIME = 4
+_SLOT_MIN_RUNTIME = 5
+_SLOT_MAX_RUNTIME = 6
+_SLOT_TOTAL_ELAPSED = 7
+_SLOT_MIN_ELAPSED = 8
+_SLOT_MAX_ELAPSED = 9
+_SLOT_WORDS = 10
+
+# The number of times a reader retries copying a slot which is being written, before yielding to the writer
+_READ_SPINS = 100
+
+# The longest time (in seconds) that a reader waits for a slot to stop being written, before skipping the slot
+# (whose writer may have been killed mid-write)
+_READ_TIMEOUT = .1
+
+
+def _process_exists(pid):
+    """Returns whether a process with the given ID is running (or cannot be signalled by this one)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _tracked_name(block):
+    """Returns the name under which the resource tracker knows a shared memory block (or ``None`` if it does not
+    track blocks on this platform)
+    """
+    return '/' + block.name if os.name == 'posix' else None
+
+
+def _attach_block(name):
+    """Attaches to an existing shared memory block, without registering it with the resource tracker where possible
+
+    :return: The block, and whether it was registered with the resource tracker
+    :rtype: tuple
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False), False
+    except TypeError:
+        # Before Python 3.13, every attached block is tracked
+        return shared_memory.SharedMemory(name=name), True
+
+
+def _untrack_block(block):
+    """Unregisters a shared memory block from the resource tracker, which would otherwise destroy the block once this
+    process exits (if this process started the tracker)
+    """
+    tracked_name = _tracked_name(block)
+    if tracked_name is not None:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(tracked_name, 'shared_memory')
+
+
+class SharedTimingStats(object):
+    """A drop-in replacement for :class:`~timerutil.stats.TimingStats` which records into a shared memory block,
+    in which each process records into a slot of its own, so that the statistics of every process can be merged.
+
+    Usage with an :class:`~timerutil.waits.ObservableWaiter` (or any of its subclasses):
+        .. code-block:: python
+
+            timer = StopWatch()
+            timer.stats = SharedTimingStats(histograms=True)
+
+    The first time that a process records, it claims a free slot (or one which belonged to a process which no longer
+    exists), and it keeps that slot until it calls :meth:`release`. A released slot keeps its statistics, and a process
+    which claims it later adds to them. Slots are claimed under :attr:`claim_lock`, which is created with the block,
+    and which processes share by being forked from its creator, or by being given the instance when they are spawned
+    (e.g. as an argument of :class:`multiprocessing.Process`). Processes which attach to the block by name cannot
+    share the lock, so their claims may race with each other; each process checks that its slot is still its own each
+    time it records, but the statistics of a slot which two processes raced for may be corrupted.
+
+    Instances may be pickled, in which case the copy attaches to the same block. Only the instance which created the
+    block destroys it, in :meth:`unlink`.
+
+    :ivar name: The name of the shared memory block
+    :vartype name: str
+    :ivar slots: The largest number of processes which may record at once
+    :vartype slots: int
+    :ivar histograms: Whether the distributions of runtimes and elapsed times are also recorded
+    :vartype histograms: bool
+    :ivar claim_lock: The lock under which processes claim slots, or ``None`` if this instance attached to the block
+        without it
+    :vartype claim_lock: multiprocessing.Lock
+    """
+
+    def __init__(self, slots=DEFAULT_SLOTS, histograms=False, name=None):
+        """Creates a SharedTimingStats, and the shared memory block which holds it
+
+        :param slots: (Optional) The largest number of processes which may record at once. Defaults to 64.
+        :type slots: int
+        :param histograms: (Optional) See :class:`~timerutil.stats.TimingStats`
+        :type histograms: bool
+        :param name: (Optional) The name of the shared memory block, by which other processes can attach to it.
+            By default, a unique name is chosen.
+        :type name: str
+        :raises RuntimeError: If shared memory is not available
+        :raises FileExistsError: If a shared memory block with the given name already exists
+        """
+        if shared_memory is None:  # pragma: nocover
+            raise RuntimeError('SharedTimingStats requires multiprocessing.shared_memory (Python 3.8 or later)')
+        if slots < 1:
+            raise ValueError('slots must be at least 1')
+
+        buckets = LogHistogram()._bucket_count if histograms else 0
+        size = (_HEADER_WORDS + slots * (_SLOT_WORDS + 2 * buckets)) * 8
+        # Created in the spawn context, whose locks can be shared both by forking and by spawning processes
+        self._setup(shared_memory.SharedMemory(name=name, create=True, size=size), owner=True,
+                    claim_lock=multiprocessing.get_context('spawn').Lock())
+        self._ints[_HEADER_SLOTS] = slots
+        self._ints[_HEADER_BUCKETS] = buckets
+        self._ints[_HEADER_EPOCH] = 1
+        self._ints[_HEADER_MAGIC] = _MAGIC
+        self._configure()
+
+    @classmethod
+    def attach(cls, name, claim_lock=None):
+        """Attaches to the shared memory block of a SharedTimingStats which was created by another process
+
+        :param name: The name of the shared memory block (see :attr:`name`)
+        :type name: str
+        :param claim_lock: (Optional) The :attr:`claim_lock` of the instance which created the block, if this process
+            inherited it. By default, slots are claimed without a lock.
+        :type claim_lock: multiprocessing.Lock
+        :rtype: SharedTimingStats
+        :raises FileNotFoundError: If no shared memory block with the given name exists
+        :raises ValueError: If the block was not created by a SharedTimingStats
+        """
+        if shared_memory is None:  # pragma: nocover
+            raise RuntimeError('SharedTimingStats requires multiprocessing.shared_memory (Python 3.8 or later)')
+
+        stats = cls.__new__(cls)
+        stats._attach(name, claim_lock, untrack=True)
+        return stats
+
+    def _attach(self, name, claim_lock, untrack):
+        block, tracked = _attach_block(name)
+        self._setup(block, owner=False, claim_lock=claim_lock)
+        if self._ints[_HEADER_MAGIC] != _MAGIC:
+            self.close()
+            raise ValueError('{!r} is not the shared memory block of a {}'.format(name, self.__class__.__name__))
+        if tracked and untrack:
+            _untrack_block(block)
+        self._configure()
+
+    def _setup(self, block, owner, claim_lock):
+        self._block = block
+        self._owner = owner
+        self.claim_lock = claim_lock
+        self._ints = block.buf.cast('q')
+        self._floats = block.buf.cast('d')
+        self._lock = threading.Lock()
+        self._pid = None
+        self._slot = None
+
+    def _configure(self):
+        """Reads the layout of the block from its header"""
+        self.name = self._block.name
+        self.slots = self._ints[_HEADER_SLOTS]
+        self._buckets = self._ints[_HEADER_BUCKETS]
+        self.histograms = bool(self._buckets)
+        self._slot_words = _SLOT_WORDS + 2 * self._buckets
+        self._histogram = LogHistogram()
+
+    def __getstate__(self):
+        # The lock can only be pickled while spawning a process (which then shares it)
+        spawning = multiprocessing_context.get_spawning_popen() is not None
+        return self.name, self.claim_lock if spawning else None
+
+    def __setstate__(self, state):
+        name, claim_lock = state
+        # Copies are unpickled by processes which multiprocessing started, and which share the resource tracker of the
+        # process which created the block (so the block stays registered with it, as created)
+        self._attach(name, claim_lock, untrack=False)
+
+    def __repr__(self):
+        return '<{name}: {shared!r} {slots} slots>'.format(
+            name=self.__class__.__name__, shared=self.name, slots=self.slots
+        )
+
+    def _offset(self, slot):
+        return _HEADER_WORDS + slot * self._slot_words
+
+    def _claim(self):
+        """Claims a slot for the current process
+
+        :return: The offset of the slot
+        :rtype: int
+        :raises RuntimeError: If every slot belongs to a running process
+        """
+        if self.claim_lock is None:
+            return self._claim_slot()
+        with self.claim_lock:
+            return self._claim_slot()
+
+    def _claim_slot(self):
+        pid = os.getpid()
+        ints = self._ints
+        for dead_owners in (False, True):
+            # Starting from a slot chosen by process ID makes it unlikely that two processes race for the same slot
+            for i in range(self.slots):
+                slot = (pid + i) % self.slots
+                offset = self._offset(slot)
+                owner = ints[offset + _SLOT_OWNER]
+                if owner == pid or not owner or (dead_owners and not _process_exists(owner)):
+                    ints[offset + _SLOT_OWNER] = pid
+                    if ints[offset + _SLOT_SEQUENCE] % 2:
+                        # The previous owner was killed mid-write, so the slot's sequence is made even again
+                        ints[offset + _SLOT_SEQUENCE] += 1
+                    self._pid = pid
+                    self._slot = slot
+                    return offset
+
+        raise RuntimeError('Every one of the {} slots of {!r} is claimed by a running process'.format(
+            self.slots, self.name
+        ))
+
+    def release(self):
+        """Gives up the slot of the current process (if it has claimed one), so that another process can claim it.
+        The statistics which the process recorded are kept.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                offset = self._offset(self._slot)
+                if self._ints[offset + _SLOT_OWNER] == self._pid:
+                    self._ints[offset + _SLOT_OWNER] = 0
+            self._pid = None
+            self._slot = None
+
+    def _writable_offset(self):
+        """Returns the offset of the current process's slot (while holding the lock), claiming it if necessary"""
+        if self._pid == os.getpid():
+            offset = self._offset(self._slot)
+            if self._ints[offset + _SLOT_OWNER] == self._pid:
+                return offset
+        # This process has not claimed a slot yet (or it inherited its parent's claim by forking, or another process
+        # claimed the same slot at the same time)
+        return self._claim()
+
+    def _begin_write(self, offset):
+        """Marks a slot as being written, first clearing it if it was recorded before the last reset.
+        Must be followed by :meth:`_end_write`, even if the write fails (or this fails).
+        """
+        ints = self._ints
+        ints[offset + _SLOT_SEQUENCE] += 1
+        epoch = ints[_HEADER_EPOCH]
+        if ints[offset + _SLOT_EPOCH] != epoch:
+            for word in range(offset + _SLOT_COUNT, offset + self._slot_words):
+                ints[word] = 0
+            ints[offset + _SLOT_EPOCH] = epoch
+
+    def _end_write(self, offset):
+        """Marks a slot as no longer being written (if it was marked as being written)"""
+        if self._ints[offset + _SLOT_SEQUENCE] % 2:
+            self._ints[offset + _SLOT_SEQUENCE] += 1
+
+    def record(self, runtime, elapsed):
+        """Records the timing of a single wrapped operation into the current process's slot
+        (see :meth:`~timerutil.stats.TimingStats.record`)
+        """
+        ints = self._ints
+        floats = self._floats
+        if self._buckets:
+            # Found before the write begins, so that invalid timings (e.g. NaN) are rejected without touching the slot
+            runtime_bucket = _SLOT_WORDS + self._histogram._index(runtime)
+            elapsed_bucket = _SLOT_WORDS + self._buckets + self._histogram._index(elapsed)
+
+        with self._lock:
+            offset = self._writable_offset()
+            try:
+                self._begin_write(offset)
+                if ints[offset + _SLOT_COUNT]:
+                    if runtime < floats[offset + _SLOT_MIN_RUNTIME]:
+                        floats[offset + _SLOT_MIN_RUNTIME] = runtime
+                    if runtime > floats[offset + _SLOT_MAX_RUNTIME]:
+                        floats[offset + _SLOT_MAX_RUNTIME] = runtime
+                    if elapsed < floats[offset + _SLOT_MIN_ELAPSED]:
+                        floats[offset + _SLOT_MIN_ELAPSED] = elapsed
+                    if elapsed > floats[offset + _SLOT_MAX_ELAPSED]:
+                        floats[offset + _SLOT_MAX_ELAPSED] = elapsed
+                else:
+                    floats[offset + _SLOT_MIN_RUNTIME] = floats[offset + _SLOT_MAX_RUNTIME] = runtime
+                    floats[offset + _SLOT_MIN_ELAPSED] = floats[offset + _SLOT_MAX_ELAPSED] = elapsed
+                ints[offset + _SLOT_COUNT] += 1
+                floats[offset + _SLOT_TOTAL_RUNTIME] += runtime
+                floats[offset + _SLOT_TOTAL_ELAPSED] += elapsed
+
+                if self._buckets:
+                    ints[offset + runtime_bucket] += 1
+                    ints[offset + elapsed_bucket] += 1
+            finally:
+                self._end_write(offset)
+
+    def merge(self, other):
+        """Adds everything recorded by another :class:`~timerutil.stats.TimingStats` (or SharedTimingStats)
+        to the current process's slot
+        """
+        other = other.snapshot()
+        if not other.count:
+            return
+
+        ints = self._ints
+        floats = self._floats
+        with self._lock:
+            offset = self._writable_offset()
+            try:
+                self._begin_write(offset)
+                empty = not ints[offset + _SLOT_COUNT]
+                for word, value, choose in ((_SLOT_MIN_RUNTIME, other.min_runtime, min),
+                                            (_SLOT_MAX_RUNTIME, other.max_runtime, max),
+                                            (_SLOT_MIN_ELAPSED, other.min_elapsed, min),
+                                            (_SLOT_MAX_ELAPSED, other.max_elapsed, max)):
+                    floats[offset + word] = value if empty else choose(floats[offset + word], value)
+                ints[offset + _SLOT_COUNT] += other.count
+                floats[offset + _SLOT_TOTAL_RUNTIME] += other.total_runtime
+                floats[offset + _SLOT_TOTAL_ELAPSED] += other.total_elapsed
+
+                if self._buckets and other.runtime_histogram is not None:
+                    buckets = offset + _SLOT_WORDS
+                    for start, histogram in ((buckets, other.runtime_histogram),
+                                             (buckets + self._buckets, other.elapsed_histogram)):
+                        for index, bucket_count in enumerate(histogram._counts):
+                            if bucket_count:
+                                ints[start + index] += bucket_count
+            finally:
+                self._end_write(offset)
+
+    def _read_slot(self, slot, epoch):
+        """Copies a consistent view of a slot, without blocking the process which writes to it
+
+        :return: The slot's owner and statistics, or ``None`` if nothing has been recorded into it since the last reset
+            (or if it is still being written after 0.1 seconds)
+        :rtype: tuple
+        """
+        ints = self._ints
+        offset = self._offset(slot)
+        end = offset + self._slot_words
+        spins = 0
+        give_up_at = None
+        while True:
+            sequence = ints[offset + _SLOT_SEQUENCE]
+            if not sequence % 2:
+                words = self._block.buf[offset * 8:end * 8].tobytes()
+                if ints[offset + _SLOT_SEQUENCE] == sequence:
+                    break
+            spins += 1
+            if spins >= _READ_SPINS:
+                # The writer may have been preempted mid-write, so let it run before retrying
+                spins = 0
+                now = get_time()
+                if give_up_at is None:
+                    give_up_at = now + _READ_TIMEOUT
+                elif now >= give_up_at:
+                    # The writer was most likely killed mid-write (the slot is repaired when it is next claimed)
+                    logger.warning('Skipping slot %s of %r, which has been written for over %s seconds',
+                                   slot, self.name, _READ_TIMEOUT)
+                    return None
+                time.sleep(0)
+
+        view = memoryview(words)
+        slot_ints = view.cast('q')
+        if slot_ints[_SLOT_EPOCH] != epoch or not slot_ints[_SLOT_COUNT]:
+            return None
+
+        slot_floats = view.cast('d')
+        stats = TimingStats(histograms=self.histograms)
+        stats.count = slot_ints[_SLOT_COUNT]
+        stats.total_runtime = slot_floats[_SLOT_TOTAL_RUNTIME]
+        stats.min_runtime = slot_floats[_SLOT_MIN_RUNTIME]
+        stats.max_runtime = slot_floats[_SLOT_MAX_RUNTIME]
+        stats.total_elapsed = slot_floats[_SLOT_TOTAL_ELAPSED]
+        stats.min_elapsed = slot_floats[_SLOT_MIN_ELAPSED]
+        stats.max_elapsed = slot_floats[_SLOT_MAX_ELAPSED]
+
+        if self._buckets:
+            for start, histogram, prefix in ((_SLOT_WORDS, stats.runtime_histogram, 'runtime'),
+                                             (_SLOT_WORDS + self._buckets, stats.elapsed_histogram, 'elapsed')):
+                histogram._counts = array(histogram._counts.typecode, slot_ints[start:start + self._buckets])
+                histogram.count = stats.count
+                histogram.total = getattr(stats, 'total_' + prefix)
+                histogram.min = getattr(stats, 'min_' + prefix)
+                histogram.max = getattr(stats, 'max_' + prefix)
+
+        return slot_ints[_SLOT_OWNER], stats
+
+    def _read_slots(self, reset=False):
+        """Copies every slot which has been recorded into since the last reset
+
+        :rtype: list[tuple]
+        """
+        epoch = self._ints[_HEADER_EPOCH]
+        copies = [copy for copy in (self._read_slot(slot, epoch) for slot in range(self.slots)) if copy is not None]
+        if reset:
+            # Writers clear their own slots once they see the new epoch, so the reader never writes to a slot
+            self._ints[_HEADER_EPOCH] = epoch + 1
+        return copies
+
+    def snapshot(self, reset=False):
+        """Merges the slots of every process into a single, independent :class:`~timerutil.stats.TimingStats`
+
+        :param reset: (Optional) If ``True``, reset the statistics of every process once they are copied
+            (see :meth:`reset`). Operations recorded while the slots are being copied may be discarded.
+            Defaults to ``False``.
+        :type reset: bool
+        :rtype: timerutil.stats.TimingStats
+        """
+        merged = TimingStats(histograms=self.histograms)
+        for _, stats in self._read_slots(reset=reset):
+            merged.merge(stats)
+        return merged
+
+    def per_process(self):
+        """Returns the statistics recorded into the slot of each process which owns one (including processes which
+        exited without releasing their slot)
+
+        A slot which was released keeps its statistics, so those of the slot's earlier owners are included.
+        Slots which are not currently owned are only included in :meth:`snapshot`.
+
+        :return: A mapping of process IDs to their :class:`~timerutil.stats.TimingStats`
+        :rtype: dict
+        """
+        return dict((owner, stats) for owner, stats in self._read_slots() if owner)
+
+    def reset(self):
+        """Discards everything that has been recorded so far, by every process.
+
+        Each process clears its own slot the next time it records, so that a reset never races with a writer.
+        """
+        self._ints[_HEADER_EPOCH] += 1
+
+    def as_dict(self):
+        """Returns a summary of every process's slot, merged (see :meth:`~timerutil.stats.TimingStats.as_dict`)
+
+        :rtype: dict
+        """
+        return self.snapshot().as_dict()
+
+    @property
+    def count(self):
+        """The number of operations recorded by every process"""
+        return self.snapshot().count
+
+    def close(self):
+        """Detaches the current process from the shared memory block. The block itself lives on, until it is unlinked.
+        """
+        self._ints.release()
+        self._floats.release()
+        self._block.close()
+
+    def __del__(self):
+        # The views of the block must be released before it can be closed (which happens when it is collected)
+        try:
+            self._ints.release()
+            self._floats.release()
+        except AttributeError:
+            pass
+
+    def unlink(self):
+        """Destroys the shared memory block (if this instance created it), once every process has closed it
+
+        :raises RuntimeError: If this instance attached to a block which was created by another instance
+        """
+        if not self._owner:
+            raise RuntimeError('Only the SharedTimingStats which created {!r} can unlink it'.format(self.name))
+
+        tracked_name = _tracked_name(self._block)
+        if tracked_name is not None:
+            # A process which shares this process's resource tracker may have unregistered the block when it attached
+            # (see `_untrack_block`), and unlinking unregisters it again
+            from multiprocessing import resource_tracker
+            resource_tracker.register(tracked_name, 'shared_memory')
+        self._block.unlink()
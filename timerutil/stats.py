@@ -0,0 +1,627 @@
+"""Provides thread-safe aggregation of the timing statistics recorded by :class:`~timerutil.waits.ObservableWaiter`
+(and its subclasses).
+
+Every :class:`~timerutil.waits.ObservableWaiter` aggregates the runtime and elapsed time of each operation it wraps,
+regardless of how many threads (or tasks) use it at once:
+    .. code-block:: python
+
+        timer = StopWatch()
+
+        @timer
+        def handle_request():
+            ...
+
+        # Later, perhaps from a different thread...
+        print('Handled', timer.stats.count, 'requests in', timer.stats.mean_runtime, 'seconds on average')
+
+Distributions can also be aggregated, in fixed memory, by opting into histograms:
+    .. code-block:: python
+
+        timer = StopWatch(histograms=True)
+        ...
+        print('p99 runtime:', timer.stats.runtime_histogram.p99)
+"""
+import math
+import threading
+import weakref
+from array import array
+
+from timerutil.compat import get_time_ns
+
+__all__ = [
+    'LapBuffer',
+    'LogHistogram',
+    'ShardedTimingStats',
+    'TimingStats'
+]
+
+class LapBuffer(object):
+    """A fixed-size ring buffer of integer nanosecond timestamps, backed by an :class:`array.array`,
+    for timing the iterations of hot loops without allocating a Python object per iteration.
+
+    Once full, the oldest timestamps are overwritten. The recorded timestamps can be exported without copying
+    (as :class:`memoryview` objects, or as a NumPy array when NumPy is installed) for vectorized analysis.
+
+    .. note:: This class is not thread-safe; use a separate buffer for each thread.
+
+    Usage:
+        .. code-block:: python
+
+            laps = LapBuffer(1000000)
+            lap = laps.lap
+
+            for item in items:
+                process(item)
+                lap()
+
+            durations = numpy.diff(laps.to_numpy())
+    """
+
+    def __init__(self, capacity, clock=get_time_ns):
+        """Initializes an empty LapBuffer
+
+        :param capacity: The number of timestamps which the buffer can hold
+        :type capacity: int
+        :param clock: (Optional) The clock used by :meth:`lap` and :meth:`split`, which must return integer
+            nanoseconds. Defaults to :func:`~timerutil.compat.get_time_ns`.
+        :type clock: callable
+        """
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+
+        self.capacity = capacity
+        self.clock = clock
+        self._timestamps = array('q', [0]) * capacity
+        self._recorded = 0
+
+    def __repr__(self):
+        return '<{name}: {count}/{capacity} timestamps>'.format(
+            name=self.__class__.__name__, count=len(self), capacity=self.capacity
+        )
+
+    def __len__(self):
+        """The number of timestamps currently held by the buffer"""
+        return min(self._recorded, self.capacity)
+
+    @property
+    def dropped(self):
+        """The number of timestamps which have been overwritten since the buffer was last cleared"""
+        return max(self._recorded - self.capacity, 0)
+
+    def record(self, timestamp):
+        """Records the given timestamp
+
+        :param timestamp: A timestamp, in integer nanoseconds
+        :type timestamp: int
+        """
+        self._timestamps[self._recorded % self.capacity] = timestamp
+        self._recorded += 1
+
+    def lap(self):
+        """Records the current time"""
+        self._timestamps[self._recorded % self.capacity] = self.clock()
+        self._recorded += 1
+
+    def split(self):
+        """Records the current time, and returns the nanoseconds elapsed since the previously recorded timestamp
+        (or ``0`` if this is the first timestamp)
+
+        :rtype: int
+        """
+        now = self.clock()
+        index = self._recorded % self.capacity
+        previous = self._timestamps[index - 1] if self._recorded else now
+        self._timestamps[index] = now
+        self._recorded += 1
+        return now - previous
+
+    def clear(self):
+        """Discards every recorded timestamp"""
+        self._recorded = 0
+
+    def timestamps(self):
+        """Returns the recorded timestamps in the order that they were recorded, without copying them.
+
+        Since the buffer wraps around once full, the timestamps are returned as one or two consecutive views.
+
+        :rtype: tuple of memoryview
+        """
+        view = memoryview(self._timestamps)
+        if self._recorded <= self.capacity:
+            return (view[:self._recorded],)
+
+        split_index = self._recorded % self.capacity
+        return tuple(part for part in (view[split_index:], view[:split_index]) if len(part))
+
+    def deltas(self):
+        """Returns the nanoseconds elapsed between each consecutive pair of recorded timestamps
+
+        :rtype: array.array
+        """
+        ordered = array('q')
+        for part in self.timestamps():
+            ordered.extend(part)
+        return array('q', (ordered[i] - ordered[i - 1] for i in range(1, len(ordered))))
+
+    def to_numpy(self):
+        """Returns the recorded timestamps (in the order that they were recorded) as a NumPy ``int64`` array.
+
+        The array shares memory with the buffer unless the buffer has wrapped around, in which case it is a copy.
+
+        :raises ImportError: If NumPy is not installed
+        :rtype: numpy.ndarray
+        """
+        import numpy
+
+        parts = [numpy.frombuffer(part, dtype=numpy.int64) for part in self.timestamps()]
+        return parts[0] if len(parts) == 1 else numpy.concatenate(parts)
+
+
+class LogHistogram(object):
+    """A histogram with logarithmically-sized buckets, in the style of HdrHistogram.
+
+    Every value between :attr:`lowest` and :attr:`highest` is counted in a bucket whose bounds are within
+    a relative :attr:`precision` of each other, so percentiles are reported to within that precision.
+    Values outside of that range are counted in an underflow or overflow bucket (and reported as the bound
+    they exceed). The buckets are allocated up front, so recording a value takes constant time and memory.
+
+    .. note:: This class is not thread-safe. :class:`TimingStats` serializes access to its histograms.
+
+    :ivar count: The number of values recorded
+    :vartype count: int
+    :ivar total: The sum of the values recorded
+    :vartype total: float
+    :ivar min: The smallest value recorded (or ``None`` if nothing has been recorded)
+    :vartype min: float
+    :ivar max: The largest value recorded (or ``None`` if nothing has been recorded)
+    :vartype max: float
+    """
+
+    def __init__(self, lowest=1e-6, highest=3600.0, precision=.01):
+        """Initializes an empty LogHistogram
+
+        :param lowest: (Optional) The smallest value which is counted precisely. Defaults to 1 microsecond.
+        :type lowest: float
+        :param highest: (Optional) The largest value which is counted precisely. Defaults to 1 hour.
+        :type highest: float
+        :param precision: (Optional) The relative width of each bucket. Defaults to 0.01 (1%).
+        :type precision: float
+        """
+        if not 0 < lowest < highest or precision <= 0:
+            raise ValueError('lowest must be positive and less than highest, and precision must be positive')
+
+        self.lowest = lowest
+        self.highest = highest
+        self.precision = precision
+        self._scale = 1 / math.log1p(precision)
+        # Bucket 0 counts underflow, and the last bucket counts overflow
+        self._bucket_count = int(math.ceil(math.log(highest / lowest) * self._scale)) + 2
+        self._counts = array('q', [0]) * self._bucket_count
+        self.reset()
+
+    def __repr__(self):
+        return '<{name}: {count} values>'.format(name=self.__class__.__name__, count=self.count)
+
+    def _index(self, value):
+        """Returns the index of the bucket which counts the given value"""
+        if value < self.lowest:
+            return 0
+        if value >= self.highest:
+            return self._bucket_count - 1
+        return min(int(math.log(value / self.lowest) * self._scale) + 1, self._bucket_count - 2)
+
+    def _bucket_value(self, index):
+        """Returns the value reported for the given bucket (the geometric midpoint of its bounds)"""
+        if index == 0:
+            return self.lowest
+        if index == self._bucket_count - 1:
+            return self.highest
+        return min(self.lowest * math.exp((index - .5) / self._scale), self.highest)
+
+    def reset(self):
+        """Discards every recorded value"""
+        for index in range(self._bucket_count):
+            self._counts[index] = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        """Records a single value
+
+        :param value: The value to record
+        :type value: float
+        """
+        self._counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Adds every value recorded by another histogram (with the same configuration) to this one
+
+        :param other: The histogram to merge into this one
+        :type other: LogHistogram
+        :raises ValueError: If the histograms are configured differently
+        """
+        if (other.lowest, other.highest, other.precision) != (self.lowest, self.highest, self.precision):
+            raise ValueError('Cannot merge histograms with different configurations')
+
+        for index, bucket_count in enumerate(other._counts):
+            if bucket_count:
+                self._counts[index] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def copy(self):
+        """Returns an independent copy of this histogram
+
+        :rtype: LogHistogram
+        """
+        histogram = LogHistogram(self.lowest, self.highest, self.precision)
+        histogram.merge(self)
+        return histogram
+
+    @property
+    def mean(self):
+        """The mean of the recorded values (or ``None`` if nothing has been recorded)"""
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percentile):
+        """Returns the value below which the given percentage of recorded values fall
+
+        :param percentile: The percentile to compute, between 0 and 100
+        :type percentile: float
+        :return: The value, or ``None`` if nothing has been recorded
+        :rtype: float
+        """
+        if not self.count:
+            return None
+
+        rank = max(int(math.ceil(self.count * percentile / 100.0)), 1)
+        seen = 0
+        for index, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen >= rank:
+                # The true value can't lie outside of the recorded extremes
+                return min(max(self._bucket_value(index), self.min), self.max)
+
+    @property
+    def p50(self):
+        """The median recorded value"""
+        return self.percentile(50)
+
+    @property
+    def p99(self):
+        """The 99th percentile of the recorded values"""
+        return self.percentile(99)
+
+    @property
+    def p999(self):
+        """The 99.9th percentile of the recorded values"""
+        return self.percentile(99.9)
+
+    def as_dict(self):
+        """Returns a summary of the recorded values
+
+        :rtype: dict
+        """
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'p50': self.p50,
+            'p99': self.p99,
+            'p999': self.p999,
+        }
+
+
+class TimingStats(object):
+    """Thread-safe running aggregates of the runtimes and elapsed times of wrapped operations, in seconds.
+
+    :ivar count: The number of operations recorded
+    :vartype count: int
+    :ivar total_runtime: The sum of the recorded runtimes
+    :vartype total_runtime: float
+    :ivar min_runtime: The shortest recorded runtime (or ``None`` if nothing has been recorded)
+    :vartype min_runtime: float
+    :ivar max_runtime: The longest recorded runtime (or ``None`` if nothing has been recorded)
+    :vartype max_runtime: float
+    :ivar total_elapsed: The sum of the recorded elapsed times
+    :vartype total_elapsed: float
+    :ivar min_elapsed: The shortest recorded elapsed time (or ``None`` if nothing has been recorded)
+    :vartype min_elapsed: float
+    :ivar max_elapsed: The longest recorded elapsed time (or ``None`` if nothing has been recorded)
+    :vartype max_elapsed: float
+    :ivar runtime_histogram: The distribution of the recorded runtimes (or ``None`` unless histograms are enabled)
+    :vartype runtime_histogram: LogHistogram
+    :ivar elapsed_histogram: The distribution of the recorded elapsed times
+        (or ``None`` unless histograms are enabled)
+    :vartype elapsed_histogram: LogHistogram
+    """
+
+    def __init__(self, histograms=False):
+        """Initializes an empty TimingStats
+
+        :param histograms: (Optional) If ``True``, also record the distributions of runtimes and elapsed times
+            in a :class:`LogHistogram` each. Defaults to ``False``.
+        :type histograms: bool
+        """
+        self._lock = threading.Lock()
+        self.runtime_histogram = LogHistogram() if histograms else None
+        self.elapsed_histogram = LogHistogram() if histograms else None
+        self.reset()
+
+    def __repr__(self):
+        return '<{name}: {count} operations>'.format(name=self.__class__.__name__, count=self.count)
+
+    def reset(self):
+        """Discards everything that has been recorded so far"""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        """Discards everything that has been recorded so far (while holding the lock)"""
+        self.count = 0
+        self.total_runtime = 0.0
+        self.min_runtime = None
+        self.max_runtime = None
+        self.total_elapsed = 0.0
+        self.min_elapsed = None
+        self.max_elapsed = None
+        if self.runtime_histogram is not None:
+            self.runtime_histogram.reset()
+            self.elapsed_histogram.reset()
+
+    def record(self, runtime, elapsed):
+        """Records the timing of a single wrapped operation
+
+        :param runtime: The duration of the wrapped operation, in seconds
+        :type runtime: float
+        :param elapsed: The total duration that the decorator/context manager was active, in seconds
+        :type elapsed: float
+        """
+        with self._lock:
+            self.count += 1
+            self.total_runtime += runtime
+            self.total_elapsed += elapsed
+
+            if self.min_runtime is None or runtime < self.min_runtime:
+                self.min_runtime = runtime
+            if self.max_runtime is None or runtime > self.max_runtime:
+                self.max_runtime = runtime
+            if self.min_elapsed is None or elapsed < self.min_elapsed:
+                self.min_elapsed = elapsed
+            if self.max_elapsed is None or elapsed > self.max_elapsed:
+                self.max_elapsed = elapsed
+
+            if self.runtime_histogram is not None:
+                self.runtime_histogram.record(runtime)
+                self.elapsed_histogram.record(elapsed)
+
+    def merge(self, other):
+        """Adds everything recorded by another TimingStats to this one
+
+        :param other: The statistics to merge into this one
+        :type other: TimingStats
+        """
+        other = other.snapshot()
+        with self._lock:
+            self.count += other.count
+            self.total_runtime += other.total_runtime
+            self.total_elapsed += other.total_elapsed
+
+            for name, choose in (('min_runtime', min), ('max_runtime', max),
+                                 ('min_elapsed', min), ('max_elapsed', max)):
+                values = [value for value in (getattr(self, name), getattr(other, name)) if value is not None]
+                setattr(self, name, choose(values) if values else None)
+
+            if self.runtime_histogram is not None and other.runtime_histogram is not None:
+                self.runtime_histogram.merge(other.runtime_histogram)
+                self.elapsed_histogram.merge(other.elapsed_histogram)
+
+    def snapshot(self, reset=False):
+        """Returns an independent copy of these statistics, e.g. for interval reporting
+
+        :param reset: (Optional) If ``True``, atomically reset these statistics after copying them.
+            Defaults to ``False``.
+        :type reset: bool
+        :rtype: TimingStats
+        """
+        copy = TimingStats()
+        with self._lock:
+            for name in ('count', 'total_runtime', 'min_runtime', 'max_runtime',
+                         'total_elapsed', 'min_elapsed', 'max_elapsed'):
+                setattr(copy, name, getattr(self, name))
+
+            if self.runtime_histogram is not None:
+                copy.runtime_histogram = self.runtime_histogram.copy()
+                copy.elapsed_histogram = self.elapsed_histogram.copy()
+
+            if reset:
+                self._clear()
+
+        return copy
+
+    @property
+    def mean_runtime(self):
+        """The mean of the recorded runtimes (or ``None`` if nothing has been recorded)"""
+        with self._lock:
+            return self.total_runtime / self.count if self.count else None
+
+    @property
+    def mean_elapsed(self):
+        """The mean of the recorded elapsed times (or ``None`` if nothing has been recorded)"""
+        with self._lock:
+            return self.total_elapsed / self.count if self.count else None
+
+    def as_dict(self):
+        """Returns a consistent snapshot of the recorded statistics
+
+        :rtype: dict
+        """
+        with self._lock:
+            summary = {
+                'count': self.count,
+                'total_runtime': self.total_runtime,
+                'min_runtime': self.min_runtime,
+                'max_runtime': self.max_runtime,
+                'mean_runtime': self.total_runtime / self.count if self.count else None,
+                'total_elapsed': self.total_elapsed,
+                'min_elapsed': self.min_elapsed,
+                'max_elapsed': self.max_elapsed,
+                'mean_elapsed': self.total_elapsed / self.count if self.count else None,
+            }
+
+            if self.runtime_histogram is not None:
+                summary['runtime_histogram'] = self.runtime_histogram.as_dict()
+                summary['elapsed_histogram'] = self.elapsed_histogram.as_dict()
+
+            return summary
+
+
+def _merged_attribute(name):
+    """Returns a property which reads the given :class:`TimingStats` attribute from a merged snapshot"""
+    return property(
+        lambda self: getattr(self.snapshot(), name),
+        doc='See :attr:`TimingStats.{}` (read from a merged snapshot)'.format(name)
+    )
+
+
+class _MergedTimingStats(object):
+    """A mixin which provides the read interface of :class:`TimingStats` to statistics which are recorded in parts,
+    by reading each attribute from a snapshot in which the parts are merged. Subclasses provide that snapshot,
+    as ``snapshot(reset=False)``.
+
+    Every attribute read takes a new snapshot, so to read several attributes consistently (or cheaply),
+    take a single :meth:`snapshot` instead.
+    """
+    total_runtime = _merged_attribute('total_runtime')
+    min_runtime = _merged_attribute('min_runtime')
+    max_runtime = _merged_attribute('max_runtime')
+    mean_runtime = _merged_attribute('mean_runtime')
+    total_elapsed = _merged_attribute('total_elapsed')
+    min_elapsed = _merged_attribute('min_elapsed')
+    max_elapsed = _merged_attribute('max_elapsed')
+    mean_elapsed = _merged_attribute('mean_elapsed')
+    runtime_histogram = _merged_attribute('runtime_histogram')
+    elapsed_histogram = _merged_attribute('elapsed_histogram')
+
+    def as_dict(self):
+        """Returns a summary of every part, merged (see :meth:`TimingStats.as_dict`)
+
+        :rtype: dict
+        """
+        return self.snapshot().as_dict()
+
+
+class _ThreadToken(object):
+    """Stored in a thread's local storage, so that it is discarded (and its weak references die) along with the thread
+    """
+    __slots__ = ('__weakref__',)
+
+
+class ShardedTimingStats(_MergedTimingStats):
+    """A drop-in replacement for :class:`TimingStats` which records into a separate shard for each thread,
+    so that threads never contend with each other when recording. The shards are only merged (into a
+    :class:`TimingStats`) when a snapshot is taken, or when an attribute of :class:`TimingStats` is read.
+
+    The shards of threads which have exited are folded into a single retired shard (whenever a shard is created,
+    or a snapshot is taken), so that a server which starts a thread per task does not accumulate shards.
+
+    Usage with an :class:`~timerutil.waits.ObservableWaiter` (or any of its subclasses):
+        .. code-block:: python
+
+            timer = StopWatch()
+            timer.stats = ShardedTimingStats(histograms=True)
+    """
+
+    def __init__(self, histograms=False):
+        """Initializes an empty ShardedTimingStats
+
+        :param histograms: (Optional) See :class:`TimingStats`
+        :type histograms: bool
+        """
+        self.histograms = histograms
+        self._local = threading.local()
+        # The shard of each live thread, along with a weak reference to a token which dies along with the thread
+        self._shards = []
+        # Everything recorded by threads which have exited
+        self._retired = TimingStats(histograms=histograms)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<{name}: {shards} shards>'.format(name=self.__class__.__name__, shards=len(self._shards))
+
+    def _shard(self):
+        """Returns the shard belonging to the current thread, creating it if necessary
+
+        :rtype: TimingStats
+        """
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = TimingStats(histograms=self.histograms)
+            token = self._local.token = _ThreadToken()
+            with self._lock:
+                self._retire_shards()
+                self._shards.append((weakref.ref(token), shard))
+            return shard
+
+    def _retire_shards(self):
+        """Folds the shards of threads which have exited into the retired shard (while holding the lock)"""
+        live_shards = []
+        for token, shard in self._shards:
+            if token() is None:
+                self._retired.merge(shard)
+            else:
+                live_shards.append((token, shard))
+        self._shards = live_shards
+
+    def _all_shards(self):
+        """Returns the retired shard, followed by the shard of each live thread
+
+        :rtype: list[TimingStats]
+        """
+        with self._lock:
+            self._retire_shards()
+            return [self._retired] + [shard for _, shard in self._shards]
+
+    def record(self, runtime, elapsed):
+        """Records the timing of a single wrapped operation (see :meth:`TimingStats.record`)"""
+        self._shard().record(runtime, elapsed)
+
+    def snapshot(self, reset=False):
+        """Merges every shard into a single, independent :class:`TimingStats`
+
+        :param reset: (Optional) If ``True``, reset each shard as it is merged. Defaults to ``False``.
+        :type reset: bool
+        :rtype: TimingStats
+        """
+        merged = TimingStats(histograms=self.histograms)
+        for shard in self._all_shards():
+            merged.merge(shard.snapshot(reset=reset))
+        return merged
+
+    def reset(self):
+        """Discards everything that has been recorded so far, by every thread"""
+        for shard in self._all_shards():
+            shard.reset()
+
+    def merge(self, other):
+        """Adds everything recorded by another :class:`TimingStats` (or ShardedTimingStats) to this one"""
+        self._shard().merge(other)
+
+    @property
+    def count(self):
+        """The number of operations recorded by every thread"""
+        return sum(shard.count for shard in self._all_shards())
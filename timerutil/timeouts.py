@@ -1,13 +1,30 @@
+import ctypes
 import errno
 import os
 import signal
+import threading
+from functools import partial
 
 from timerutil.compat import (
     ContextDecorator,
+    get_time,
     TimeoutError
 )
+from timerutil.deadlines import (
+    _pop_scope,
+    _push_scope
+)
+from timerutil.scheduling import DeadlineScheduler
+from timerutil.watchdog import default_watchdog
 
-__all__ = ['TimeoutManager']
+__all__ = [
+    'CooperativeTimeout',
+    'CooperativeTimeoutEngine',
+    'SignalTimeoutEngine',
+    'SoftTimeoutError',
+    'ThreadTimeoutEngine',
+    'TimeoutManager'
+]
 
 try:
     # By default, use the platform-specific error message associated with the :attr:`errno.ETIME` symbol
@@ -15,6 +32,280 @@ try:
 except ValueError:  # pragma: nocover
     DEFAULT_TIMEOUT_MESSAGE = 'Timer Expired'
 
+# The shortest delay used when re-arming the interval timer for a deadline which has already passed
+# (a delay of zero would disarm the timer instead)
+_MINIMUM_TIMER_DELAY = 1e-6
+
+# Messages for timeouts which have been injected into (but not yet raised by) other threads, keyed by thread ID
+_injected_messages = {}
+
+
+class SoftTimeoutError(TimeoutError):
+    """Raised when the soft deadline of a :class:`TimeoutManager` with a grace period expires.
+
+    The error may be caught so that the managed operation can wrap up (e.g. save partial results);
+    a hard :exc:`TimeoutError` follows if the block has not exited once the grace period has also expired.
+    """
+
+
+def _injected_message():
+    """Returns (and forgets) the message of the timeout which was injected into the current thread"""
+    return _injected_messages.pop(threading.get_ident(), DEFAULT_TIMEOUT_MESSAGE)
+
+
+class _InjectedTimeoutError(TimeoutError):
+    """The :exc:`TimeoutError` raised asynchronously within threads by the :class:`ThreadTimeoutEngine`.
+
+    Asynchronously-raised exceptions can only be given as classes, so the message belonging to the expired
+    :class:`TimeoutManager` is looked up when the exception is instantiated in the target thread.
+    """
+
+    def __init__(self, *args):
+        if not args:
+            args = (_injected_message(),)
+        super(_InjectedTimeoutError, self).__init__(*args)
+
+
+class _InjectedSoftTimeoutError(SoftTimeoutError):
+    """The :exc:`SoftTimeoutError` raised asynchronously within threads by the :class:`ThreadTimeoutEngine`
+    (see :class:`_InjectedTimeoutError`)
+    """
+
+    def __init__(self, *args):
+        if not args:
+            args = (_injected_message(),)
+        super(_InjectedSoftTimeoutError, self).__init__(*args)
+
+
+def _set_async_exc(thread_id, exc_type):
+    """Schedules an exception to be raised within a different thread (or, given ``None``, withdraws it)
+
+    .. note:: The exception is raised the next time the target thread executes Python bytecode,
+        so it cannot interrupt a blocking call into C code (such as :func:`time.sleep`) until that call returns.
+    """
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id),
+        None if exc_type is None else ctypes.py_object(exc_type)
+    )
+
+
+class _TimerEntry(object):
+    """Tracks a single active deadline on behalf of the :class:`TimeoutManager` which scheduled it"""
+    __slots__ = (
+        'deadline', 'manager', 'engine', 'expired', 'thread_id', 'handle', 'scope', 'checkpoint',
+        'hard_deadline', 'soft_expired', 'pending', 'watch'
+    )
+
+    def __init__(self, deadline, manager, engine, hard_deadline=None):
+        self.deadline = deadline
+        self.manager = manager
+        self.engine = engine
+        self.expired = False
+        # While a soft deadline is pending, the deadline which follows it once the grace period has expired
+        self.hard_deadline = hard_deadline
+        self.soft_expired = False
+        # Whether an expiry has been flagged for a cooperative checkpoint to raise
+        self.pending = False
+        self.thread_id = None
+        self.handle = None
+        self.scope = None
+        self.checkpoint = None
+        # The block registered with the manager's watchdog, if it has one
+        self.watch = None
+
+
+class SignalTimeoutEngine(object):
+    """Enforces :class:`TimeoutManager` deadlines with ``SIGALRM``, and therefore only in the main thread.
+
+    Any number of nested deadlines are multiplexed onto the single ``ITIMER_REAL`` interval timer
+    (and ``SIGALRM`` handler) available to the process. The timer is always armed for the earliest pending deadline,
+    and is re-armed whenever a deadline is added or removed. When the timer fires, the :exc:`TimeoutError`
+    is raised on behalf of the outermost block whose deadline has actually passed.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._original_alarm_handler = None
+
+    def arm(self, entry):
+        """Adds a deadline to the stack and re-arms the timer
+
+        :param entry: The deadline to schedule
+        :type entry: _TimerEntry
+        """
+        if not self._entries:
+            # Save the current SIGALRM handler to restore once the last deadline is removed
+            self._original_alarm_handler = signal.signal(signal.SIGALRM, self._alarm_handler)
+
+        self._entries.append(entry)
+        self._rearm()
+
+    def disarm(self, entry):
+        """Removes a deadline from the stack and re-arms the timer for whichever deadlines remain
+
+        :param entry: The deadline to remove
+        :type entry: _TimerEntry
+        """
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        self._entries.remove(entry)
+
+        if self._entries:
+            self._rearm()
+        else:
+            signal.signal(signal.SIGALRM, self._original_alarm_handler)
+            self._original_alarm_handler = None
+
+    def _rearm(self):
+        """Arms the interval timer for the earliest deadline which has not yet expired (or disarms it if none remain)
+        """
+        pending = [entry.deadline for entry in self._entries if not entry.expired]
+        if pending:
+            signal.setitimer(signal.ITIMER_REAL, max(min(pending) - get_time(), _MINIMUM_TIMER_DELAY))
+        else:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    def _alarm_handler(self, signum, frame):
+        """Dispatches ``SIGALRM`` to the outermost :class:`TimeoutManager` whose deadline has passed
+        """
+        now = get_time()
+        for entry in self._entries:
+            if not entry.expired and entry.deadline <= now:
+                if entry.hard_deadline is not None:
+                    # Only the soft deadline has passed, so begin the grace period
+                    entry.manager._begin_grace_period(entry)
+                    self._rearm()
+                    entry.manager._soft_timeout_handler(signum, frame)
+                    continue
+
+                entry.expired = True
+                self._rearm()
+                if entry.watch is not None:
+                    entry.watch.capture(frame)
+                entry.manager._timeout_handler(signum, frame)
+
+        # Nothing has expired yet (e.g. the signal arrived early), so wait for the next deadline
+        self._rearm()
+
+
+class ThreadTimeoutEngine(object):
+    """Enforces :class:`TimeoutManager` deadlines in any thread, by raising the :exc:`TimeoutError` asynchronously
+    within the thread which entered the expired block.
+
+    Deadlines from every thread share a single :class:`~timerutil.scheduling.DeadlineScheduler`
+    (and therefore a single background thread), so arming and disarming a deadline costs ``O(log n)``.
+
+    .. note:: This engine relies on ``PyThreadState_SetAsyncExc``, which is specific to CPython.
+        The :exc:`TimeoutError` is raised the next time the thread executes Python bytecode, so a thread
+        which is blocked within C code (such as :func:`time.sleep`) is only interrupted once that call returns.
+    """
+
+    def __init__(self, scheduler=None):
+        """Initializes a new ThreadTimeoutEngine
+
+        :param scheduler: (Optional) The scheduler used to track deadlines. By default, a new scheduler is created.
+        :type scheduler: timerutil.scheduling.DeadlineScheduler
+        """
+        self.scheduler = scheduler if scheduler is not None else DeadlineScheduler('timerutil-timeout-engine')
+
+    def arm(self, entry):
+        """Schedules the :exc:`TimeoutError` for a deadline belonging to the current thread
+
+        :param entry: The deadline to schedule
+        :type entry: _TimerEntry
+        """
+        entry.thread_id = threading.get_ident()
+        entry.handle = self.scheduler.schedule(entry.deadline, partial(self._expire, entry))
+
+    def disarm(self, entry):
+        """Cancels a deadline, withdrawing its :exc:`TimeoutError` if that has been scheduled but not yet raised
+
+        :param entry: The deadline to cancel
+        :type entry: _TimerEntry
+        """
+        if not self.scheduler.cancel(entry.handle) or entry.soft_expired:
+            _set_async_exc(entry.thread_id, None)
+            _injected_messages.pop(entry.thread_id, None)
+
+    def _expire(self, entry):
+        """Raises a :exc:`TimeoutError` within the thread that owns an expired deadline
+        (or, if only its soft deadline has expired, a :exc:`SoftTimeoutError` or the soft timeout callback)
+        """
+        manager = entry.manager
+        if entry.hard_deadline is not None:
+            manager._begin_grace_period(entry)
+            entry.handle = self.scheduler.schedule(entry.deadline, partial(self._expire, entry))
+            if manager.soft_timeout_callback is not None:
+                manager.soft_timeout_callback()
+                return
+            exc_type = _InjectedSoftTimeoutError
+        else:
+            entry.expired = True
+            if entry.watch is not None:
+                entry.watch.capture()
+            exc_type = _InjectedTimeoutError
+
+        _injected_messages[entry.thread_id] = manager.timeout_message
+        _set_async_exc(entry.thread_id, exc_type)
+
+
+class CooperativeTimeoutEngine(object):
+    """Tracks :class:`CooperativeTimeout` deadlines without ever interrupting the thread which entered them.
+
+    Expired deadlines are only flagged (from the thread of a :class:`~timerutil.scheduling.DeadlineScheduler`),
+    and the :exc:`TimeoutError` is raised by the next call to :attr:`CooperativeTimeout.checkpoint`.
+    Deadlines which poll the clock themselves (see the ``check_interval`` of :class:`CooperativeTimeout`)
+    are not scheduled at all.
+    """
+
+    def __init__(self, scheduler=None):
+        """Initializes a new CooperativeTimeoutEngine
+
+        :param scheduler: (Optional) The scheduler used to track deadlines. By default, a new scheduler is created.
+        :type scheduler: timerutil.scheduling.DeadlineScheduler
+        """
+        self.scheduler = scheduler if scheduler is not None else DeadlineScheduler('timerutil-cooperative-engine')
+
+    def arm(self, entry):
+        """Schedules a deadline to be flagged once it expires, unless its manager polls the clock instead
+
+        :param entry: The deadline to schedule
+        :type entry: _TimerEntry
+        """
+        if not getattr(entry.manager, 'check_interval', None):
+            entry.handle = self.scheduler.schedule(entry.deadline, partial(self._expire, entry))
+
+    def disarm(self, entry):
+        """Cancels a deadline
+
+        :param entry: The deadline to cancel
+        :type entry: _TimerEntry
+        """
+        if entry.handle is not None:
+            self.scheduler.cancel(entry.handle)
+
+    def _expire(self, entry):
+        """Flags an expired deadline, to be raised by the next checkpoint
+        (or, if only its soft deadline has expired, runs the soft timeout callback if there is one)
+        """
+        manager = entry.manager
+        if entry.hard_deadline is not None:
+            manager._begin_grace_period(entry)
+            entry.handle = self.scheduler.schedule(entry.deadline, partial(self._expire, entry))
+            if manager.soft_timeout_callback is not None:
+                manager.soft_timeout_callback()
+                return
+        else:
+            entry.expired = True
+            if entry.watch is not None:
+                entry.watch.capture()
+        entry.pending = True
+
+
+signal_engine = SignalTimeoutEngine()
+thread_engine = ThreadTimeoutEngine()
+# Shares the thread engine's scheduler, so that cooperative timeouts do not start another thread
+cooperative_engine = CooperativeTimeoutEngine(thread_engine.scheduler)
+
 
 class TimeoutManager(ContextDecorator):
     """A class for easily putting time restrictions on things
@@ -49,24 +340,113 @@ class TimeoutManager(ContextDecorator):
                 something_that_should_not_exceed_ten_seconds()
 
             print('Maybe exceeded 10 seconds')
+
+    Timeouts may be given as fractions of a second, and the time that was left on the clock is available after exit:
+        .. code-block:: python
+
+            with TimeoutManager(0.25) as manager:
+                something_that_should_not_exceed_a_quarter_second()
+
+            print('Finished with', manager.last_remaining, 'seconds to spare')
+
+    Blocks may be nested; each deadline is enforced independently, and a :exc:`TimeoutError` is only ever
+    suppressed by the (outermost) manager whose own deadline expired:
+        .. code-block:: python
+
+            with TimeoutManager(10):
+                with TimeoutManager(1, suppress_timeout_errors=True):
+                    something_that_might_exceed_one_second()
+
+                something_else_that_should_finish_within_the_remaining_time()
+
+    Outside of the main thread (where signals cannot be used), timeouts are enforced by the shared
+    :class:`ThreadTimeoutEngine` instead, so the same usage works within worker threads:
+        .. code-block:: python
+
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                executor.map(TimeoutManager(10)(something_that_should_not_exceed_ten_seconds), range(1000))
+
+    The deadline also propagates to the code running underneath it (see :mod:`timerutil.deadlines`),
+    which can size its own timeouts from the time that remains:
+        .. code-block:: python
+
+            with TimeoutManager(10):
+                response = session.get(url, timeout=timerutil.remaining())
+
+    Given a grace period, a timeout happens in two stages. Once the (soft) deadline expires, a catchable
+    :exc:`SoftTimeoutError` is raised (or a callback is run instead), so that the operation can wrap up;
+    if the block still has not exited once the grace period has also expired, a hard :exc:`TimeoutError` follows:
+        .. code-block:: python
+
+            with TimeoutManager(60, grace_period=5):
+                try:
+                    for section in report.sections:
+                        render(section)
+                except SoftTimeoutError:
+                    save_partial_report(report)
+
+    :ivar last_remaining: The number of seconds that were left before the timeout would have expired
+        when the managed operation last finished, or ``0`` if the operation timed out
+        (including when only the soft deadline expired)
+    :vartype last_remaining: float
+    :ivar last_timed_out: Whether this instance's own deadline (soft or hard) expired while the managed operation
+        last ran. Unlike ``last_remaining == 0``, this is not set by an operation which merely finished at its
+        deadline, before the timeout fired.
+    :vartype last_timed_out: bool
     """
 
-    def __init__(self, seconds, timeout_message=DEFAULT_TIMEOUT_MESSAGE, suppress_timeout_errors=False):
+    def __init__(self, seconds, timeout_message=DEFAULT_TIMEOUT_MESSAGE, suppress_timeout_errors=False, engine=None,
+                 grace_period=None, soft_timeout_callback=None, watchdog=None):
         """Initializes and configures a new TimeoutManager
 
         :param seconds: The number of seconds after which the managed operation should time out
-        :type seconds: int
+        :type seconds: int, float
         :param timeout_message: (Optional) Message provided when a :exc:`TimeoutError` is raised.
             Defaults to :attr:`~DEFAULT_TIMEOUT_MESSAGE` defined by this module.
         :type timeout_message: str
         :param suppress_timeout_errors: (Optional) If ``True``, operations which have timed out will silently fail.
             Defaults to ``False`` so that timeouts will result in a :exc:`TimeoutError` being raised.
         :type suppress_timeout_errors: bool
+        :param engine: (Optional) The engine used to enforce timeouts. By default, timeouts are enforced by
+            the module's :class:`SignalTimeoutEngine` when entered from the main thread, or otherwise by
+            the module's :class:`ThreadTimeoutEngine`.
+        :type engine: SignalTimeoutEngine, ThreadTimeoutEngine
+        :param grace_period: (Optional) If given, ``seconds`` is a soft deadline, at which a :exc:`SoftTimeoutError`
+            is raised (or ``soft_timeout_callback`` is run), and the hard :exc:`TimeoutError` only follows
+            this many seconds later. By default, there is only a hard deadline.
+        :type grace_period: int, float
+        :param soft_timeout_callback: (Optional) A callable (taking no arguments) which is run at the soft deadline,
+            instead of raising a :exc:`SoftTimeoutError`. It runs in the signal handler of the main thread,
+            or in the scheduler thread of the engine enforcing timeouts in other threads, so it should be brief.
+        :type soft_timeout_callback: callable
+        :param watchdog: (Optional) A watchdog which logs the stack of a block once it has used most of its budget,
+            and attaches the stack at expiry to the :exc:`TimeoutError` (see :class:`~timerutil.watchdog.Watchdog`),
+            or ``True`` to use the process-wide :data:`~timerutil.watchdog.default_watchdog`. Blocks are not watched
+            by default.
+        :type watchdog: timerutil.watchdog.Watchdog, bool
         """
+        if soft_timeout_callback is not None and grace_period is None:
+            raise ValueError('soft_timeout_callback requires a grace_period')
+
         self.seconds = seconds
         self.timeout_message = timeout_message
         self.suppress_errors = bool(suppress_timeout_errors)
-        self._original_alarm_handler = None
+        self.engine = engine
+        self.grace_period = grace_period
+        self.soft_timeout_callback = soft_timeout_callback
+        self.watchdog = default_watchdog if watchdog is True else (None if watchdog is False else watchdog)
+        self.last_remaining = None
+        self.last_timed_out = None
+        self._local = threading.local()
+
+    @property
+    def _entries(self):
+        """The deadlines which the current thread has entered (and not yet exited) through this instance"""
+        try:
+            return self._local.entries
+        except AttributeError:
+            self._local.entries = []
+            return self._local.entries
 
     def __repr__(self):
         return '<{name}: {seconds} seconds>'.format(name=self.__class__.__name__, seconds=self.seconds)
@@ -76,17 +456,47 @@ class TimeoutManager(ContextDecorator):
         """
         raise TimeoutError(self.timeout_message)
 
+    def _soft_timeout_handler(self, signum, frame):
+        """Runs the soft timeout callback, or if there is none, raises a :exc:`SoftTimeoutError`
+        with the configured message
+        """
+        if self.soft_timeout_callback is not None:
+            self.soft_timeout_callback()
+        else:
+            raise SoftTimeoutError(self.timeout_message)
+
+    @staticmethod
+    def _begin_grace_period(entry):
+        """Moves a deadline whose soft deadline has passed onto its hard deadline"""
+        entry.deadline, entry.hard_deadline = entry.hard_deadline, None
+        entry.soft_expired = True
+
+    def _new_entry(self, engine):
+        """Creates the deadline for a new invocation, starting now
+
+        :rtype: _TimerEntry
+        """
+        deadline = get_time() + self.seconds
+        if self.grace_period is None:
+            return _TimerEntry(deadline, self, engine)
+        return _TimerEntry(deadline, self, engine, hard_deadline=deadline + self.grace_period)
+
     def __enter__(self):
         """Starts the timeout countdown
 
         :return: The current instance
         :rtype: TimeoutManager
         """
-        # Save the current SIGALRM handler to restore upon exiting
-        self._original_alarm_handler = signal.signal(signal.SIGALRM, self._timeout_handler)
+        engine = self.engine
+        if engine is None:
+            engine = signal_engine if threading.current_thread() is threading.main_thread() else thread_engine
 
-        signal.signal(signal.SIGALRM, self._timeout_handler)
-        signal.alarm(self.seconds)
+        entry = self._new_entry(engine)
+        entry.scope = _push_scope(entry.deadline, self)
+        if self.watchdog is not None:
+            entry.watch = self.watchdog.watch(self, self.seconds + (self.grace_period or 0))
+        self._entries.append(entry)
+        engine.arm(entry)
 
         return self
 
@@ -95,12 +505,158 @@ class TimeoutManager(ContextDecorator):
         or because the operation timed out.
 
         This method will allow a `TimeoutError` raised during the operation to propagate
-        unless this `TimeoutManager` instance was configured to suppress `TimeoutError` exceptions.
+        unless this `TimeoutManager` instance was configured to suppress `TimeoutError` exceptions
+        and the error was raised because this instance's own deadline expired.
         """
-        # Restore the SIGALRM handler
-        signal.signal(signal.SIGALRM, self._original_alarm_handler)
-        signal.alarm(0)
+        entry = self._entries.pop()
+        entry.engine.disarm(entry)
+        _pop_scope(entry.scope)
+
+        timed_out = self.last_timed_out = entry.expired or entry.soft_expired
+        self.last_remaining = 0 if timed_out else max(0, entry.deadline - get_time())
 
-        if self.suppress_errors and exc_type is TimeoutError:
+        if entry.watch is not None:
+            if entry.expired and isinstance(exc_val, TimeoutError):
+                self.watchdog.unwatch(entry.watch, exc_val, exc_tb)
+            else:
+                self.watchdog.unwatch(entry.watch)
+
+        if self.suppress_errors and timed_out and exc_type is not None and issubclass(exc_type, TimeoutError):
             # Suppress the `TimeoutError` so that the timeout is silenced
             return True
+
+
+class CooperativeTimeout(TimeoutManager):
+    """A :class:`TimeoutManager` which never interrupts the managed operation. Instead, the operation periodically
+    calls :attr:`checkpoint`, which raises the :exc:`TimeoutError` once the deadline has passed.
+
+    Since the :exc:`TimeoutError` can only be raised at a checkpoint, it never fires in the middle of a call into
+    C code or within a ``finally`` block, and no signals are used, so cooperative timeouts work in any thread.
+    Messages, suppression and grace periods behave the same as for :class:`TimeoutManager`
+    (a :exc:`SoftTimeoutError` is raised by the first checkpoint after the soft deadline).
+
+    Checkpoints are cheap enough for hot loops: by default, a background thread flags the deadline once it expires,
+    so a checkpoint only needs to read that flag. Alternatively, given a ``check_interval``, no background thread is
+    involved and the clock is read on every ``check_interval``-th checkpoint instead:
+        .. code-block:: python
+
+            with CooperativeTimeout(60, check_interval=10000) as timeout:
+                checkpoint = timeout.checkpoint
+                for row in rows:
+                    score(row)
+                    checkpoint()
+
+    .. note:: A checkpoint only checks the innermost deadline which its own instance has established
+        for the current thread. Call the checkpoints of enclosing instances to check their deadlines too.
+
+    :ivar check_interval: The number of checkpoints between reads of the clock,
+        or ``None`` if the deadline is flagged by a background thread
+    :vartype check_interval: int
+    """
+
+    def __init__(self, seconds, timeout_message=DEFAULT_TIMEOUT_MESSAGE, suppress_timeout_errors=False,
+                 check_interval=None, engine=None, grace_period=None, soft_timeout_callback=None, watchdog=None):
+        """Initializes and configures a new CooperativeTimeout
+
+        :param seconds: The number of seconds after which the managed operation should time out
+        :type seconds: int, float
+        :param timeout_message: (Optional) See :class:`TimeoutManager`
+        :type timeout_message: str
+        :param suppress_timeout_errors: (Optional) See :class:`TimeoutManager`
+        :type suppress_timeout_errors: bool
+        :param check_interval: (Optional) If given, read the clock on every ``check_interval``-th checkpoint
+            (rather than relying on a background thread to flag the deadline). Defaults to ``None``.
+        :type check_interval: int
+        :param engine: (Optional) The engine used to track deadlines.
+            Defaults to the module's :class:`CooperativeTimeoutEngine`.
+        :type engine: CooperativeTimeoutEngine
+        :param grace_period: (Optional) See :class:`TimeoutManager`
+        :type grace_period: int, float
+        :param soft_timeout_callback: (Optional) See :class:`TimeoutManager`. It runs in the scheduler thread,
+            or if ``check_interval`` is given, within the checkpoint.
+        :type soft_timeout_callback: callable
+        :param watchdog: (Optional) See :class:`TimeoutManager`
+        :type watchdog: timerutil.watchdog.Watchdog, bool
+        """
+        if check_interval is not None and check_interval < 1:
+            raise ValueError('check_interval must be positive')
+
+        super(CooperativeTimeout, self).__init__(
+            seconds,
+            timeout_message=timeout_message,
+            suppress_timeout_errors=suppress_timeout_errors,
+            engine=engine if engine is not None else cooperative_engine,
+            grace_period=grace_period,
+            soft_timeout_callback=soft_timeout_callback,
+            watchdog=watchdog
+        )
+        self.check_interval = check_interval
+
+    @property
+    def checkpoint(self):
+        """The checkpoint function for the innermost deadline which this instance has established
+        for the current thread. Calling it raises a :exc:`TimeoutError` if the deadline has passed.
+
+        For the lowest overhead within hot loops, look the function up once, before the loop begins.
+
+        :rtype: callable
+        """
+        return self._entries[-1].checkpoint
+
+    def __enter__(self):
+        """Starts the timeout countdown
+
+        :return: The current instance
+        :rtype: CooperativeTimeout
+        """
+        super(CooperativeTimeout, self).__enter__()
+        entry = self._entries[-1]
+        entry.checkpoint = self._make_checkpoint(entry)
+        return self
+
+    def _make_checkpoint(self, entry):
+        """Builds the checkpoint function for a deadline
+
+        :param entry: The deadline checked by the checkpoint
+        :type entry: _TimerEntry
+        :rtype: callable
+        """
+        check_interval = self.check_interval
+        raise_pending = self._raise_pending
+
+        if check_interval is None:
+            def checkpoint():
+                if entry.pending:
+                    raise_pending(entry)
+
+            return checkpoint
+
+        # Start at one, so that the first checkpoint reads the clock
+        countdown = [1]
+
+        def checkpoint():
+            countdown[0] -= 1
+            if countdown[0]:
+                return
+            countdown[0] = check_interval
+            if get_time() >= entry.deadline:
+                if entry.hard_deadline is not None:
+                    self._begin_grace_period(entry)
+                    if self.soft_timeout_callback is not None:
+                        self.soft_timeout_callback()
+                        return
+                else:
+                    entry.expired = True
+                entry.pending = True
+                raise_pending(entry)
+
+        return checkpoint
+
+    def _raise_pending(self, entry):
+        """Raises the expiry which has been flagged for a deadline: a :exc:`TimeoutError` once its hard deadline
+        has passed, or otherwise (once only) a :exc:`SoftTimeoutError`
+        """
+        if entry.expired:
+            raise TimeoutError(self.timeout_message)
+        entry.pending = False
+        raise SoftTimeoutError(self.timeout_message)
@@ -0,0 +1,355 @@
+"""Provides hierarchical span tracing: nested timed blocks form a tree of spans, which can be exported
+for flame graphs (see :meth:`Tracer.collapsed`) or for ``chrome://tracing``/Perfetto (see :meth:`Tracer.chrome_trace`).
+
+The innermost open span is tracked in a :class:`contextvars.ContextVar`, so spans opened by an :mod:`asyncio` task
+become children of the span that was open when the task was created. A new thread starts with an empty context (so its
+spans are roots) unless it is run in a copy of the creating thread's context, e.g.
+``threading.Thread(target=contextvars.copy_context().run, args=(work,))``.
+The easiest way to record spans is to give each :class:`~timerutil.waits.StopWatch` a tracer:
+    .. code-block:: python
+
+        @StopWatch(tracer=True)
+        def handle_request(request):
+            with StopWatch(name='load', tracer=True):
+                rows = load(request)
+            with StopWatch(name='render', tracer=True):
+                return render(rows)
+
+        ...
+        with open('requests.folded', 'w') as f:
+            get_default_tracer().write_collapsed(f)  # then: flamegraph.pl requests.folded > requests.svg
+
+Spans are recorded into preallocated arrays, so recording one costs a couple of clock readings and array stores;
+names are only formatted (and the tree only assembled) on export.
+"""
+import itertools
+import json
+import os
+import threading
+from array import array
+from contextvars import ContextVar
+
+from timerutil.compat import get_clock
+
+__all__ = [
+    'get_default_tracer',
+    'Span',
+    'Tracer'
+]
+
+# The default number of spans which a `Tracer` can record
+DEFAULT_CAPACITY = 1 << 16
+
+# The innermost open span of each tracer in the current thread/task, as (tracer, index) pairs, innermost last
+_open_spans = ContextVar('timerutil_spans', default=())
+
+
+class Span(object):
+    """A single completed span, as exported by :meth:`Tracer.spans`
+
+    :ivar index: The position of the span within its tracer
+    :vartype index: int
+    :ivar name: The name of the span
+    :vartype name: str
+    :ivar parent: The index of the parent span, or ``None`` for a root span
+    :vartype parent: int
+    :ivar thread_id: The identifier of the thread which opened the span
+    :vartype thread_id: int
+    :ivar start_ns: The time (in integer nanoseconds, according to the tracer's clock) at which the span opened
+    :vartype start_ns: int
+    :ivar end_ns: The time at which the span closed
+    :vartype end_ns: int
+    :ivar inclusive_time: The number of seconds that the span was open for
+    :vartype inclusive_time: float
+    :ivar exclusive_time: The number of seconds that the span was open for, excluding time spent in its children
+    :vartype exclusive_time: float
+    """
+    __slots__ = ('index', 'name', 'parent', 'thread_id', 'start_ns', 'end_ns', 'inclusive_time', 'exclusive_time')
+
+    def __init__(self, index, name, parent, thread_id, start_ns, end_ns, exclusive_ns):
+        self.index = index
+        self.name = name
+        self.parent = parent
+        self.thread_id = thread_id
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.inclusive_time = (end_ns - start_ns) / 1e9
+        self.exclusive_time = exclusive_ns / 1e9
+
+    def __repr__(self):
+        return '<{name}: {span_name!r} inclusive_time={inclusive!r} exclusive_time={exclusive!r}>'.format(
+            name=self.__class__.__name__,
+            span_name=self.name,
+            inclusive=self.inclusive_time,
+            exclusive=self.exclusive_time
+        )
+
+
+class _SpanScope(object):
+    """Context manager which records a single span (see :meth:`Tracer.span`)"""
+    __slots__ = ('tracer', 'name', 'index')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.index = -1
+
+    def __enter__(self):
+        self.index = self.tracer.start(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.tracer.finish(self.index)
+
+
+class Tracer(object):
+    """Records a tree of spans into preallocated arrays of fixed capacity.
+
+    Once the tracer is full, further spans are counted in :attr:`dropped` but not recorded (so that the recorded spans
+    always form a consistent tree); call :meth:`clear` to start over. Spans which are still open are not exported.
+
+    Usage:
+        .. code-block:: python
+
+            tracer = Tracer()
+
+            with tracer.span('request'):
+                with tracer.span('query'):
+                    ...
+
+            for span in tracer.spans():
+                print(span.name, span.inclusive_time, span.exclusive_time)
+
+    .. note:: Spans opened by concurrent tasks may overlap their parent (and each other), in which case a parent's
+        exclusive time is clamped at zero.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, clock=None):
+        """Initializes a Tracer
+
+        :param capacity: (Optional) The largest number of spans recorded. Defaults to 65536.
+        :type capacity: int
+        :param clock: (Optional) The clock (or the name of a clock within :data:`~timerutil.compat.CLOCKS`)
+            used to time spans. Defaults to the ``monotonic`` clock.
+        :type clock: str, timerutil.compat.Clock
+        """
+        if capacity <= 0:
+            raise ValueError('capacity must be greater than 0')
+
+        self.capacity = capacity
+        self.clock = get_clock(clock)
+        self._get_time_ns = self.clock.time_ns
+        self._starts = array('q', [0]) * capacity
+        self._ends = array('q', [0]) * capacity
+        self._parents = array('q', [0]) * capacity
+        self._name_ids = array('q', [0]) * capacity
+        self._threads = array('Q', [0]) * capacity
+        # Interned span names, and the index of each within that list
+        self._names = []
+        self._name_index = {}
+        self._lock = threading.Lock()
+        # Allocates the index of each new span without a lock (`next` is atomic)
+        self._indexes = itertools.count()
+        self._dropped = 0
+
+    def __repr__(self):
+        return '<{name}: {count}/{capacity} spans>'.format(
+            name=self.__class__.__name__, count=len(self), capacity=self.capacity
+        )
+
+    def __len__(self):
+        """The number of spans recorded (including those still open)"""
+        return self.capacity - self._starts.count(0)
+
+    @property
+    def dropped(self):
+        """The number of spans which were not recorded because the tracer was full"""
+        return self._dropped
+
+    def _name_id(self, name):
+        name_id = self._name_index.get(name)
+        if name_id is None:
+            with self._lock:
+                name_id = self._name_index.get(name)
+                if name_id is None:
+                    name_id = len(self._names)
+                    self._names.append(name)
+                    self._name_index[name] = name_id
+        return name_id
+
+    def _innermost(self, open_spans):
+        """Returns the index of this tracer's innermost span among the given open spans, or -1"""
+        for tracer, index in reversed(open_spans):
+            if tracer is self:
+                return index
+        return -1
+
+    def start(self, name):
+        """Opens a span as a child of the innermost open span of the current thread/task
+
+        :param name: The name of the span
+        :type name: str
+        :return: The index of the new span, to be passed to :meth:`finish` (``-1`` if the tracer is full)
+        :rtype: int
+        """
+        index = next(self._indexes)
+        if index >= self.capacity:
+            with self._lock:
+                self._dropped += 1
+            return -1
+
+        open_spans = _open_spans.get()
+        self._name_ids[index] = self._name_id(name)
+        self._parents[index] = self._innermost(open_spans)
+        self._threads[index] = threading.get_ident()
+        _open_spans.set(open_spans + ((self, index),))
+        self._starts[index] = self._get_time_ns()
+        return index
+
+    def finish(self, index):
+        """Closes a span opened by :meth:`start`, making its parent the innermost open span again
+
+        :param index: The index returned by :meth:`start`
+        :type index: int
+        """
+        if index < 0:
+            return
+        self._ends[index] = self._get_time_ns()
+
+        open_spans = _open_spans.get()
+        if open_spans and open_spans[-1][1] == index and open_spans[-1][0] is self:
+            _open_spans.set(open_spans[:-1])
+            return
+        # The span was not the innermost open span (of any tracer), so it is removed from the middle
+        _open_spans.set(tuple(
+            (tracer, open_index) for tracer, open_index in open_spans if open_index != index or tracer is not self
+        ))
+
+    def span(self, name):
+        """Returns a context manager which records a span around its block
+
+        :param name: The name of the span
+        :type name: str
+        """
+        return _SpanScope(self, name)
+
+    def clear(self):
+        """Forgets every recorded span. Must not be called while spans are open."""
+        with self._lock:
+            self._indexes = itertools.count()
+            self._dropped = 0
+            self._starts = array('q', [0]) * self.capacity
+            self._ends = array('q', [0]) * self.capacity
+
+    def _completed(self):
+        """Returns the indexes of the completed spans, and their exclusive times (in nanoseconds)
+
+        :rtype: tuple
+        """
+        starts, ends, parents = self._starts, self._ends, self._parents
+        indexes = [index for index in range(self.capacity) if ends[index]]
+
+        children_ns = dict.fromkeys(indexes, 0)
+        for index in indexes:
+            parent = parents[index]
+            if parent in children_ns:
+                children_ns[parent] += ends[index] - starts[index]
+
+        return indexes, dict(
+            (index, max(ends[index] - starts[index] - children_ns[index], 0)) for index in indexes
+        )
+
+    def spans(self):
+        """Returns every completed span, in the order in which they were opened
+
+        :rtype: list[Span]
+        """
+        indexes, exclusive = self._completed()
+        names = self._names
+        return [
+            Span(
+                index,
+                names[self._name_ids[index]],
+                None if self._parents[index] < 0 else self._parents[index],
+                self._threads[index],
+                self._starts[index],
+                self._ends[index],
+                exclusive[index]
+            )
+            for index in indexes
+        ]
+
+    def _stack(self, index, stacks):
+        """Returns the ``;``-separated names of a span and its ancestors (outermost first), memoized in ``stacks``"""
+        stack = stacks.get(index)
+        if stack is None:
+            name = self._names[self._name_ids[index]].replace(';', ':')
+            parent = self._parents[index]
+            stack = name if parent < 0 else self._stack(parent, stacks) + ';' + name
+            stacks[index] = stack
+        return stack
+
+    def collapsed(self):
+        """Exports the exclusive time of each distinct stack of spans in the collapsed-stack format read by
+        ``flamegraph.pl`` and speedscope: one ``outer;inner;innermost <microseconds>`` line per stack
+
+        :rtype: str
+        """
+        indexes, exclusive = self._completed()
+        totals = {}
+        stacks = {}
+        for index in indexes:
+            stack = self._stack(index, stacks)
+            totals[stack] = totals.get(stack, 0) + exclusive[index]
+
+        return ''.join(
+            '{} {}\n'.format(stack, int(round(total / 1e3))) for stack, total in sorted(totals.items())
+        )
+
+    def write_collapsed(self, file):
+        """Writes :meth:`collapsed` to a text file object"""
+        file.write(self.collapsed())
+
+    def chrome_trace(self):
+        """Exports every completed span as a complete (``"ph": "X"``) event of the Chrome trace event format,
+        which can be loaded by ``chrome://tracing``, Perfetto and speedscope
+
+        :return: A JSON-serializable trace
+        :rtype: dict
+        """
+        pid = os.getpid()
+        events = [
+            {
+                'name': span.name,
+                'ph': 'X',
+                'ts': span.start_ns / 1e3,
+                'dur': (span.end_ns - span.start_ns) / 1e3,
+                'pid': pid,
+                'tid': span.thread_id,
+                'args': {'exclusive_us': span.exclusive_time * 1e6}
+            }
+            for span in self.spans()
+        ]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, file):
+        """Writes :meth:`chrome_trace` to a text file object, as JSON"""
+        json.dump(self.chrome_trace(), file)
+
+
+# The process-wide tracer, used by `StopWatch(tracer=True)`; created on first use, since its arrays are large
+_default_tracer = None
+_default_tracer_lock = threading.Lock()
+
+
+def get_default_tracer():
+    """Returns the process-wide tracer (used by ``StopWatch(tracer=True)``), creating it on first use
+
+    :rtype: Tracer
+    """
+    global _default_tracer
+    if _default_tracer is None:
+        with _default_tracer_lock:
+            if _default_tracer is None:
+                _default_tracer = Tracer()
+    return _default_tracer
@@ -9,21 +9,127 @@ if the given email address is valid but if the email address is invalid, it usua
 We can ensure that it always takes 2 seconds to execute whenever it's called.
 
 This is less useful if your function's normal execution time is subject to a lot of jitter.
+
+Every class in this module keeps its timing state per invocation (scoped to the current thread, or to the current
+:mod:`asyncio` task), so a single instance may safely decorate a function which is called concurrently.
 """
+import collections
+import itertools
+import math
+import threading
 import time
+import weakref
+from contextvars import ContextVar
 
 from timerutil.compat import (
     ContextDecorator,
+    get_clock,
     get_time
 )
+from timerutil.scheduling import default_sleep_scheduler
+from timerutil.stats import (
+    LapBuffer,
+    LogHistogram,
+    TimingStats
+)
+from timerutil.tracing import get_default_tracer
+from timerutil.watchdog import default_watchdog
 
 __all__ = [
+    'AdaptiveWaiter',
     'ObservableWaiter',
     'StopWatch',
+    'Ticker',
     'Waiter'
 ]
 
 
+# The invocations which the current thread/task has entered (and not yet exited), innermost last,
+# as (waiter, invocation) pairs
+_active_calls = ContextVar('timerutil_active_calls', default=())
+# Each Waiter holds one of these variables, whose value is a (weak reference to the Waiter, invocation) record of the
+# invocation which the current thread/task most recently exited. The variables of Waiters which no longer exist are
+# reused (and their stale records ignored), so contexts only grow with the number of Waiters which exist at once.
+_free_last_call_vars = []
+_last_call_var_ids = itertools.count()
+_last_call_vars_lock = threading.Lock()
+
+
+def _acquire_last_call_var():
+    with _last_call_vars_lock:
+        if _free_last_call_vars:
+            return _free_last_call_vars.pop()
+    return ContextVar('timerutil_last_call_{}'.format(next(_last_call_var_ids)), default=None)
+
+
+def _release_last_call_var(var):
+    with _last_call_vars_lock:
+        _free_last_call_vars.append(var)
+
+# Bounds on the margin before the target at which precise waits switch from sleeping to spinning, in seconds
+_MINIMUM_SPIN_MARGIN = 50e-6
+_MAXIMUM_SPIN_MARGIN = 20e-3
+
+
+class _WaiterCall(object):
+    """The timing state of a single invocation of a :class:`Waiter`"""
+    __slots__ = ('start_time', 'runtime', 'elapsed', 'error', 'span', 'watch')
+
+    def __init__(self, start_time=None):
+        self.start_time = start_time
+        self.runtime = None
+        self.elapsed = None
+        self.error = None
+        # The index of the span recorded for this invocation (see `timerutil.tracing.Tracer`)
+        self.span = -1
+        # The block registered with a watchdog for this invocation (see `timerutil.watchdog.Watchdog`)
+        self.watch = None
+
+
+class _SleepCalibrator(object):
+    """Estimates how far :func:`time.sleep` overshoots its requested duration on this host,
+    which determines how early precise waits stop sleeping and start spinning.
+
+    The estimate starts from a brief calibration (performed the first time it is needed), and is kept up to date
+    with the overshoot observed by every precise wait.
+    """
+
+    def __init__(self, samples=64, percentile=.95, safety_factor=1.5):
+        self.percentile = percentile
+        self.safety_factor = safety_factor
+        self._overshoots = collections.deque(maxlen=samples)
+        self._margin = None
+
+    @property
+    def margin(self):
+        """The number of seconds before a target time at which precise waits should stop sleeping"""
+        if self._margin is None:
+            self.calibrate()
+        return self._margin
+
+    def calibrate(self, iterations=10, duration=.001):
+        """Measures the overshoot of a number of short sleeps"""
+        for _ in range(iterations):
+            start = get_time()
+            time.sleep(duration)
+            self._overshoots.append(get_time() - start - duration)
+        self._update()
+
+    def observe(self, overshoot):
+        """Records the overshoot of a sleep performed during a precise wait"""
+        self._overshoots.append(overshoot)
+        if len(self._overshoots) % 8 == 0:
+            self._update()
+
+    def _update(self):
+        overshoots = sorted(self._overshoots)
+        estimate = overshoots[min(int(len(overshoots) * self.percentile), len(overshoots) - 1)] * self.safety_factor
+        self._margin = min(max(estimate, _MINIMUM_SPIN_MARGIN), _MAXIMUM_SPIN_MARGIN)
+
+
+_sleep_calibrator = _SleepCalibrator()
+
+
 class Waiter(ContextDecorator):
     """Context manager/decorator which prevents an operation
     from finishing before a given number of seconds has elapsed.
@@ -47,17 +153,150 @@ class Waiter(ContextDecorator):
 
             # Ten seconds later...
             print("Done waiting!")
+
+    Since :func:`time.sleep` tends to overshoot (by an amount which itself varies with load), a Waiter may be
+    configured to exit more precisely, at the cost of briefly spinning on the CPU. A precise Waiter sleeps until
+    shortly before the target time (by a margin calibrated from the sleep overshoot observed on the host),
+    then yields repeatedly until the target time is reached:
+        .. code-block:: python
+
+            @Waiter(.25, precise=True)
+            def reset_password(email):
+                ...
+
+    When very many Waiters sleep concurrently, they may share a single scheduler thread which releases them
+    in batches (see :class:`~timerutil.scheduling.SleepScheduler`), rather than each arming its own timer:
+        .. code-block:: python
+
+            @Waiter(.25, scheduler=True)
+            def reset_password(email):
+                ...
+
+    :ivar scheduler: The scheduler which releases this Waiter, or ``None`` if it sleeps on its own
+    :vartype scheduler: timerutil.scheduling.SleepScheduler
     """
 
-    def __init__(self, minimum_time):
+    def __init__(self, minimum_time, precise=False, clock=None, scheduler=None):
         """Initializes a Waiter
 
         :param minimum_time: The number of seconds that must elapse before the Waiter exits
         :type minimum_time: int, float
+        :param precise: (Optional) If ``True``, finish waiting by spinning (rather than sleeping) for a short,
+            automatically-calibrated period before the target time. Defaults to ``False``.
+        :type precise: bool
+        :param clock: (Optional) The clock (or the name of a clock within :data:`~timerutil.compat.CLOCKS`)
+            used to measure time. Defaults to the ``monotonic`` clock.
+        :type clock: str, timerutil.compat.Clock
+        :param scheduler: (Optional) A shared scheduler which releases sleeping Waiters (see
+            :class:`~timerutil.scheduling.SleepScheduler`), or ``True`` to use the process-wide
+            :data:`~timerutil.scheduling.default_sleep_scheduler`. By default, each Waiter sleeps on its own.
+        :type scheduler: timerutil.scheduling.SleepScheduler, bool
+        :raises ValueError: If a minimum time is given along with a clock which measures CPU time
+            (which does not advance while waiting)
         """
         super(ContextDecorator, self).__init__()
+        self.clock = get_clock(clock)
+        if self.clock.cpu_time and minimum_time:
+            raise ValueError('A minimum time cannot be enforced with the {} clock'.format(self.clock.name))
+
         self.minimum_time = minimum_time
-        self._start_time = None
+        self.precise = bool(precise)
+        self.scheduler = default_sleep_scheduler if scheduler is True else (scheduler or None)
+        self._get_time = self.clock.time
+        # Identifies this Waiter's records within its (reusable) variable, without keeping it alive
+        self._ref = weakref.ref(self)
+        self._last_call_var = _acquire_last_call_var()
+        weakref.finalize(self, _release_last_call_var, self._last_call_var)
+        # The invocation which was most recently exited by any thread/task
+        self._latest_call = None
+
+    def _enter_call(self):
+        """Starts timing a new invocation within the current thread/task
+
+        :rtype: _WaiterCall
+        """
+        call = _WaiterCall(self._get_time())
+        self._push_call(call)
+        return call
+
+    def _push_call(self, call):
+        """Makes an invocation the innermost one which the current thread/task has entered"""
+        _active_calls.set(_active_calls.get() + ((self, call),))
+
+    def _active_call(self):
+        """Returns the innermost invocation of this instance which the current thread/task has entered
+        but not yet exited, or ``None``
+
+        :rtype: _WaiterCall
+        """
+        active_calls = _active_calls.get()
+        if active_calls and active_calls[-1][0] is self:
+            return active_calls[-1][1]
+        for waiter, call in reversed(active_calls):
+            if waiter is self:
+                return call
+        return None
+
+    def _current_call(self):
+        """Returns the innermost invocation which the current thread/task has entered but not yet exited
+
+        :rtype: _WaiterCall
+        """
+        call = self._active_call()
+        if call is None:
+            # The countdown was not started by `__enter__`, so begin tracking it now
+            call = _WaiterCall()
+            self._push_call(call)
+        return call
+
+    def _exit_call(self):
+        """Stops tracking the innermost invocation of the current thread/task, which becomes its last invocation
+
+        :rtype: _WaiterCall
+        """
+        active_calls = _active_calls.get()
+        index = len(active_calls) - 1
+        # Invocations of different Waiters may be exited out of order (e.g. by interleaved generators)
+        while index >= 0 and active_calls[index][0] is not self:
+            index -= 1
+
+        if index < 0:
+            # The countdown was not started by `__enter__`
+            call = _WaiterCall()
+        else:
+            call = active_calls[index][1]
+            _active_calls.set(active_calls[:index] + active_calls[index + 1:])
+        self._set_last_call(call)
+        return call
+
+    def _set_last_call(self, call):
+        """Records the invocation which the current thread/task (and any thread/task) most recently exited"""
+        self._last_call_var.set((self._ref, call))
+        self._latest_call = call
+
+    def _get_last_call(self):
+        """Returns the invocation which the current thread/task most recently exited,
+        or if it has not used this instance, the invocation which was most recently exited by any thread/task
+
+        :rtype: _WaiterCall
+        """
+        record = self._last_call_var.get()
+        if record is None or record[0] is not self._ref:
+            # Either unused by the current thread/task, or left over from a Waiter which no longer exists
+            return self._latest_call
+        return record[1]
+
+    @property
+    def _start_time(self):
+        """The time at which the current (or else the last) invocation within the current thread/task began"""
+        call = self._active_call()
+        if call is None:
+            call = self._get_last_call()
+        return None if call is None else call.start_time
+
+    @_start_time.setter
+    def _start_time(self, value):
+        self._current_call().start_time = value
 
     def __enter__(self):
         """Begins a countdown for the configured duration
@@ -65,27 +304,82 @@ class Waiter(ContextDecorator):
         :return: This :class:`~Waiter` instance
         :rtype: Waiter
         """
-        self._start_time = get_time()
+        self._enter_call()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Blocks until the configured duration has elapsed
         """
-        try:
-            time.sleep(self.minimum_time - (get_time() - self._start_time))
-        except (ValueError, IOError):
-            pass
+        call = self._exit_call()
+        self._sleep_until(call.start_time + self.minimum_time)
+
+    def _sleep_until(self, target):
+        """Blocks until the given time
+
+        :param target: The time (according to :attr:`clock`) until which to block
+        :type target: float
+        """
+        get_time = self._get_time
+        sleep = time.sleep if self.scheduler is None else self.scheduler.sleep
+        if not self.precise:
+            try:
+                sleep(target - get_time())
+            except (ValueError, IOError):
+                pass
+            return
+
+        spin_start = target - _sleep_calibrator.margin
+        remaining = spin_start - get_time()
+        if remaining > 0:
+            sleep(remaining)
+            _sleep_calibrator.observe(get_time() - spin_start)
+
+        while get_time() < target:
+            # Yield to other threads while spinning
+            time.sleep(0)
+
+    def pace(self, iterable, interval=None, policy='burst'):
+        """Yields the items of an iterable at a fixed rate, using this Waiter's clock and sleeping behavior
+        (see :class:`Ticker`)
+
+        Usage:
+            .. code-block:: python
+
+                for record in Waiter(0, precise=True).pace(records, interval=.01):
+                    send(record)  # 100 records per second, without drifting
+
+        :param iterable: The items to yield
+        :param interval: (Optional) The number of seconds between items. Defaults to :attr:`minimum_time`.
+        :type interval: int, float
+        :param policy: (Optional) How ticks missed by a slow consumer are handled (see :class:`Ticker`).
+            Defaults to ``'burst'``.
+        :type policy: str
+        """
+        ticker = Ticker(
+            self.minimum_time if interval is None else interval,
+            policy=policy,
+            clock=self.clock,
+            precise=self.precise,
+            scheduler=self.scheduler
+        )
+        return ticker.pace(iterable)
 
 
 class ObservableWaiter(Waiter):
     """A :class:`~Waiter` subclass which behaves exactly the same as its parent,
     except that it records usage statistics for inspection.
 
-    :ivar last_runtime: The total duration of the last wrapped operation, in seconds
+    :ivar last_runtime: The total duration of the last wrapped operation, in seconds. This is the last operation
+        wrapped within the current thread/task, or if there is none, the last operation wrapped by any thread/task.
     :vartype last_runtime: float
     :ivar last_elapsed: The total duration that the decorator/context manager was active, in seconds.
         This should always be greater than or (rarely) equal to :attr:`~last_runtime`.
     :vartype last_elapsed: float
+    :ivar last_error: The difference between the time at which the last wrapped operation exited and its target
+        exit time (:attr:`minimum_time` after it began), in seconds. Positive values indicate a late exit.
+    :vartype last_error: float
+    :ivar stats: Aggregate statistics for every wrapped operation, across all threads/tasks
+    :vartype stats: timerutil.stats.TimingStats
 
     Usage as a decorator:
         .. code-block:: python
@@ -124,19 +418,188 @@ class ObservableWaiter(Waiter):
             )
     """
 
-    def __init__(self, minimum_time):
-        super(ObservableWaiter, self).__init__(minimum_time)
-        self.last_runtime = None
-        self.last_elapsed = None
+    def __init__(self, minimum_time, precise=False, histograms=False, clock=None, scheduler=None):
+        """Initializes an ObservableWaiter
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        # Record the approximate runtime of the wrapped operation
-        self.last_runtime = get_time() - self._start_time
+        :param minimum_time: The number of seconds that must elapse before the Waiter exits
+        :type minimum_time: int, float
+        :param precise: (Optional) See :class:`~Waiter`
+        :type precise: bool
+        :param histograms: (Optional) If ``True``, :attr:`stats` also records the distributions of runtimes
+            and elapsed times (see :class:`~timerutil.stats.LogHistogram`). Defaults to ``False``.
+        :type histograms: bool
+        :param clock: (Optional) See :class:`~Waiter`
+        :type clock: str, timerutil.compat.Clock
+        :param scheduler: (Optional) See :class:`~Waiter`
+        :type scheduler: timerutil.scheduling.SleepScheduler, bool
+        """
+        super(ObservableWaiter, self).__init__(minimum_time, precise=precise, clock=clock, scheduler=scheduler)
+        self.stats = TimingStats(histograms=histograms)
+
+    @property
+    def last_runtime(self):
+        call = self._get_last_call()
+        return None if call is None else call.runtime
+
+    @last_runtime.setter
+    def last_runtime(self, value):
+        self._get_or_create_last_call().runtime = value
+
+    @property
+    def last_elapsed(self):
+        call = self._get_last_call()
+        return None if call is None else call.elapsed
+
+    @last_elapsed.setter
+    def last_elapsed(self, value):
+        self._get_or_create_last_call().elapsed = value
+
+    @property
+    def last_error(self):
+        call = self._get_last_call()
+        return None if call is None else call.error
+
+    def _get_or_create_last_call(self):
+        call = self._get_last_call()
+        if call is None:
+            call = _WaiterCall()
+            self._set_last_call(call)
+        return call
+
+    def _record_runtime(self):
+        """Records the approximate runtime of the wrapped operation
+
+        :rtype: _WaiterCall
+        """
+        call = self._current_call()
+        call.runtime = self._get_time() - call.start_time
+        return call
 
+    def _record_elapsed(self, call):
+        """Records the duration of time since the invocation began, and adds the invocation to :attr:`stats`"""
+        call.elapsed = self._get_time() - call.start_time
+        call.error = call.elapsed - self.minimum_time
+        self.stats.record(call.runtime, call.elapsed)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        call = self._record_runtime()
         super(ObservableWaiter, self).__exit__(exc_type, exc_val, exc_tb)
+        self._record_elapsed(call)
+
+
+class AdaptiveWaiter(ObservableWaiter):
+    """An :class:`~ObservableWaiter` which chooses its own :attr:`minimum_time`, based upon a high percentile
+    of the runtimes it has recently observed (plus a safety margin).
+
+    So that the target cannot itself become a timing side channel (or be dragged around by a few outliers),
+    it is only recomputed after every :attr:`update_interval` operations, it is rounded up to a multiple of
+    :attr:`granularity`, and each update may change it by no more than a fraction (:attr:`max_step`) of its value.
+
+    :ivar minimum_time: The current target duration, in seconds
+    :vartype minimum_time: float
+    :ivar overruns: The number of wrapped operations whose runtime exceeded the target in effect at the time
+    :vartype overruns: int
+
+    Usage as a decorator:
+        .. code-block:: python
+
+            waiter = AdaptiveWaiter(initial_time=.5, percentile=.99, margin=.2)
+
+            @waiter
+            def reset_password(email):
+                ...
+
+            print('Padding to', waiter.minimum_time, 'seconds; overrun rate:', waiter.overrun_rate)
+    """
+
+    def __init__(self, initial_time, percentile=.99, margin=.1, window=1000, update_interval=100, max_step=.1,
+                 granularity=.001, floor=0, ceiling=None, precise=False, histograms=False, clock=None,
+                 scheduler=None):
+        """Initializes an AdaptiveWaiter
+
+        :param initial_time: The (positive) target duration used until enough runtimes have been observed, in seconds
+        :type initial_time: int, float
+        :param percentile: (Optional) The percentile of recent runtimes (between 0 and 1) to target. Defaults to 0.99.
+        :type percentile: float
+        :param margin: (Optional) The fraction by which the target exceeds the chosen percentile. Defaults to 0.1.
+        :type margin: float
+        :param window: (Optional) The number of recent runtimes considered. Defaults to 1000.
+        :type window: int
+        :param update_interval: (Optional) The number of operations between updates to the target. Defaults to 100.
+        :type update_interval: int
+        :param max_step: (Optional) The largest fraction by which a single update may change the target.
+            Defaults to 0.1.
+        :type max_step: float
+        :param granularity: (Optional) The target is always a multiple of this many seconds. Defaults to 0.001.
+        :type granularity: float
+        :param floor: (Optional) The smallest allowed target, in seconds. Defaults to 0.
+        :type floor: int, float
+        :param ceiling: (Optional) The largest allowed target, in seconds. Unbounded by default.
+        :type ceiling: int, float
+        :param precise: (Optional) See :class:`~Waiter`
+        :type precise: bool
+        :param histograms: (Optional) See :class:`~ObservableWaiter`
+        :type histograms: bool
+        :param clock: (Optional) See :class:`~Waiter`
+        :type clock: str, timerutil.compat.Clock
+        :param scheduler: (Optional) See :class:`~Waiter`
+        :type scheduler: timerutil.scheduling.SleepScheduler, bool
+        """
+        if initial_time <= 0:
+            raise ValueError('initial_time must be positive')
+
+        super(AdaptiveWaiter, self).__init__(
+            initial_time, precise=precise, histograms=histograms, clock=clock, scheduler=scheduler
+        )
+        self.percentile = percentile
+        self.margin = margin
+        self.update_interval = update_interval
+        self.max_step = max_step
+        self.granularity = granularity
+        self.floor = floor
+        self.ceiling = ceiling
+        self.overruns = 0
+        self._runtimes = collections.deque(maxlen=window)
+        self._observed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def overrun_rate(self):
+        """The fraction of wrapped operations whose runtime exceeded the target in effect at the time"""
+        count = self.stats.count
+        return self.overruns / float(count) if count else 0.0
+
+    def _record_elapsed(self, call):
+        super(AdaptiveWaiter, self)._record_elapsed(call)
+
+        with self._lock:
+            if call.runtime > self.minimum_time:
+                self.overruns += 1
+            self._runtimes.append(call.runtime)
+            self._observed += 1
+
+            if self._observed % self.update_interval == 0:
+                self.minimum_time = self._next_target()
+
+    def _next_target(self):
+        """Computes the next target duration from the recently observed runtimes
+
+        :rtype: float
+        """
+        runtimes = sorted(self._runtimes)
+        index = min(int(math.ceil(len(runtimes) * self.percentile)) - 1, len(runtimes) - 1)
+        candidate = runtimes[max(index, 0)] * (1 + self.margin)
 
-        # Record the duration of time since `__enter__` began
-        self.last_elapsed = get_time() - self._start_time
+        # Limit the size of each step, then round up to the configured granularity
+        current = self.minimum_time
+        candidate = min(max(candidate, current * (1 - self.max_step)), current * (1 + self.max_step))
+        # (allowing for floating point error, so that exact multiples are not rounded up to the next one)
+        candidate = math.ceil(candidate / self.granularity - 1e-9) * self.granularity
+
+        candidate = max(candidate, self.floor)
+        if self.ceiling is not None:
+            candidate = min(candidate, self.ceiling)
+        return candidate
 
 
 class StopWatch(ObservableWaiter):
@@ -171,10 +634,120 @@ class StopWatch(ObservableWaiter):
 
             logging.log(logging.INFO, 'Watched some things for %r seconds', timer.last_runtime)
 
+    Example of timing each iteration of a hot loop, without allocating per iteration, by recording laps
+    into a preallocated buffer (see :class:`~timerutil.stats.LapBuffer`):
+        .. code-block:: python
+
+            timer = StopWatch(laps=100000)
+            lap = timer.lap
+
+            for item in items:
+                process(item)
+                lap()
+
+            durations = timer.laps.deltas()
+
+    Example of recording nested StopWatches as a tree of spans, for flame graphs
+    (see :class:`~timerutil.tracing.Tracer`):
+        .. code-block:: python
+
+            @StopWatch(tracer=True)
+            def handle_request(request):
+                with StopWatch(name='query', tracer=True):
+                    ...
+
+            print(timerutil.tracing.get_default_tracer().collapsed())
+
+    :ivar laps: The buffer of lap timestamps, or ``None`` if lap recording was not enabled
+    :vartype laps: timerutil.stats.LapBuffer
+    :ivar tracer: The tracer which records a span for each invocation, or ``None``
+    :vartype tracer: timerutil.tracing.Tracer
+    :ivar watchdog: The watchdog which watches each invocation, or ``None``
+    :vartype watchdog: timerutil.watchdog.Watchdog
     """
-    def __init__(self):
-        """Initializes a StopWatch for observing the execution time of wrapped operations"""
-        super(StopWatch, self).__init__(0)
+    def __init__(self, histograms=False, laps=0, clock=None, subtract_overhead=False, tracer=None, name=None,
+                 watchdog=None):
+        """Initializes a StopWatch for observing the execution time of wrapped operations
+
+        :param histograms: (Optional) See :class:`~ObservableWaiter`
+        :type histograms: bool
+        :param laps: (Optional) If nonzero, enables :meth:`lap` and :meth:`split`, and sets the number of lap
+            timestamps kept before the oldest are overwritten. Defaults to ``0`` (disabled).
+        :type laps: int
+        :param clock: (Optional) See :class:`~Waiter`. Unlike other Waiters, a StopWatch may use a clock which
+            measures CPU time (such as ``'process_time'`` or ``'thread_time'``).
+        :type clock: str, timerutil.compat.Clock
+        :param subtract_overhead: (Optional) If ``True``, the measured overhead of reading the clock
+            (see :attr:`timerutil.compat.Clock.overhead`) is subtracted from each recorded runtime.
+            Defaults to ``False``.
+        :type subtract_overhead: bool
+        :param tracer: (Optional) A tracer which records each invocation as a span (nested under the span of any
+            enclosing StopWatch), or ``True`` to use the process-wide tracer
+            (see :func:`~timerutil.tracing.get_default_tracer`).
+            Spans are not recorded by default.
+        :type tracer: timerutil.tracing.Tracer, bool
+        :param name: (Optional) The name of the recorded spans. Defaults to the qualified name of the decorated
+            function, or else ``'StopWatch'``.
+        :type name: str
+        :param watchdog: (Optional) A watchdog which logs the stack of each invocation that runs for longer than
+            its ``stall_threshold`` (see :class:`~timerutil.watchdog.Watchdog`), or ``True`` to use
+            the process-wide :data:`~timerutil.watchdog.default_watchdog` (which reports invocations after 60 seconds).
+            Invocations are not watched by default.
+        :type watchdog: timerutil.watchdog.Watchdog, bool
+        """
+        super(StopWatch, self).__init__(0, histograms=histograms, clock=clock)
+        self.subtract_overhead = bool(subtract_overhead)
+        self.laps = LapBuffer(laps, clock=self.clock.time_ns) if laps else None
+        self.tracer = get_default_tracer() if tracer is True else (None if tracer is False else tracer)
+        self.watchdog = default_watchdog if watchdog is True else (None if watchdog is False else watchdog)
+        self.name = name
+
+    def __call__(self, func):
+        if self.name is None:
+            self.name = getattr(func, '__qualname__', func.__name__)
+        return super(StopWatch, self).__call__(func)
+
+    def __enter__(self):
+        call = self._enter_call()
+        if self.tracer is not None:
+            call.span = self.tracer.start(self.name or self.__class__.__name__)
+        if self.watchdog is not None:
+            call.watch = self.watchdog.watch(self.name or self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        call = self._current_call()
+        if self.tracer is not None:
+            self.tracer.finish(call.span)
+        if call.watch is not None:
+            self.watchdog.unwatch(call.watch)
+        super(StopWatch, self).__exit__(exc_type, exc_val, exc_tb)
+
+    def _record_runtime(self):
+        call = super(StopWatch, self)._record_runtime()
+        if self.subtract_overhead:
+            call.runtime = max(call.runtime - self.clock.overhead, 0)
+        return call
+
+    def lap(self):
+        """Records the current time (in integer nanoseconds) into the :attr:`laps` buffer
+
+        :raises RuntimeError: If lap recording was not enabled
+        """
+        if self.laps is None:
+            raise RuntimeError('lap recording is not enabled for this StopWatch')
+        self.laps.lap()
+
+    def split(self):
+        """Records the current time into the :attr:`laps` buffer, and returns the nanoseconds elapsed
+        since the previous lap (see :meth:`timerutil.stats.LapBuffer.split`)
+
+        :raises RuntimeError: If lap recording was not enabled
+        :rtype: int
+        """
+        if self.laps is None:
+            raise RuntimeError('lap recording is not enabled for this StopWatch')
+        return self.laps.split()
 
     def __setattr__(self, name, value):
         """Prevents the :attr:`minimum_time` attribute from being set to a nonzero value.
@@ -185,3 +758,145 @@ class StopWatch(ObservableWaiter):
         if name == 'minimum_time' and value != 0:
             raise AttributeError('minimum_time attribute is read-only')
         super(StopWatch, self).__setattr__(name, value)
+
+
+class Ticker(object):
+    """Fires at a fixed rate, scheduling each tick against an absolute time (``start + index * interval``)
+    rather than against the end of the previous tick, so that errors do not accumulate and the rate never drifts.
+
+    When the consumer falls behind (by at least one whole interval), missed ticks are handled by the configured
+    ``policy``:
+
+    - ``'burst'``: every missed tick is fired immediately, one after another, until the ticker has caught up.
+      The total number of ticks always matches the elapsed time.
+    - ``'skip'``: missed ticks are dropped, and the ticker waits for the next scheduled tick.
+    - ``'coalesce'``: missed ticks are collapsed into a single tick, which is fired immediately.
+
+    Usage:
+        .. code-block:: python
+
+            ticker = Ticker(.01)  # 100 ticks per second
+            for record in ticker.pace(records):
+                send(record)
+
+            print('Mean lag:', ticker.lag.mean, 'seconds; missed', ticker.missed, 'ticks')
+
+    :ivar interval: The number of seconds between ticks
+    :vartype interval: float
+    :ivar policy: The policy for missed ticks
+    :vartype policy: str
+    :ivar start: The time (according to :attr:`clock`) of the first tick, or ``None`` until the first tick
+    :vartype start: float
+    :ivar ticks: The number of ticks fired
+    :vartype ticks: int
+    :ivar missed: The number of ticks dropped (by the ``'skip'`` policy) or merged (by the ``'coalesce'`` policy)
+    :vartype missed: int
+    :ivar lag: The distribution of delays between the scheduled and actual time of each tick, in seconds
+    :vartype lag: timerutil.stats.LogHistogram
+    """
+    POLICIES = ('burst', 'skip', 'coalesce')
+
+    def __init__(self, interval, policy='burst', start=None, clock=None, precise=False, scheduler=None):
+        """Initializes a Ticker
+
+        :param interval: The (positive) number of seconds between ticks
+        :type interval: int, float
+        :param policy: (Optional) One of ``'burst'``, ``'skip'`` or ``'coalesce'``. Defaults to ``'burst'``.
+        :type policy: str
+        :param start: (Optional) The time (according to ``clock``) of the first tick.
+            Defaults to the time of the first call to :meth:`wait`.
+        :type start: float
+        :param clock: (Optional) See :class:`~Waiter`
+        :type clock: str, timerutil.compat.Clock
+        :param precise: (Optional) See :class:`~Waiter`
+        :type precise: bool
+        :param scheduler: (Optional) See :class:`~Waiter`
+        :type scheduler: timerutil.scheduling.SleepScheduler, bool
+        """
+        if interval <= 0:
+            raise ValueError('interval must be positive')
+        if policy not in self.POLICIES:
+            raise ValueError('policy must be one of: {}'.format(', '.join(self.POLICIES)))
+
+        self.interval = interval
+        self.policy = policy
+        self.start = start
+        self.ticks = 0
+        self.missed = 0
+        self.lag = LogHistogram()
+        # Sleeps on behalf of the ticker
+        self._waiter = Waiter(0, precise=precise, clock=clock, scheduler=scheduler)
+        self._get_time = self._waiter.clock.time
+        self._next_index = 0
+
+    def __repr__(self):
+        return '<{name}: every {interval} seconds ({policy})>'.format(
+            name=self.__class__.__name__, interval=self.interval, policy=self.policy
+        )
+
+    def wait(self):
+        """Blocks until the next tick
+
+        :return: The index of the tick which was fired (the first tick is ``0``)
+        :rtype: int
+        """
+        now = self._get_time()
+        if self.start is None:
+            self.start = now
+
+        index = self._next_index
+        target = self.start + index * self.interval
+        if now < target:
+            self._waiter._sleep_until(target)
+            now = self._get_time()
+        else:
+            # The index of the latest tick which is already due
+            due = int((now - self.start) // self.interval)
+            if due > index and self.policy != 'burst':
+                if self.policy == 'skip':
+                    self.missed += due + 1 - index
+                    index = due + 1
+                    target = self.start + index * self.interval
+                    self._waiter._sleep_until(target)
+                    now = self._get_time()
+                else:
+                    self.missed += due - index
+                    index = due
+                    target = self.start + index * self.interval
+
+        self._next_index = index + 1
+        self.ticks += 1
+        self.lag.record(max(now - target, 0))
+        return index
+
+    def __iter__(self):
+        """Yields the index of each tick, as it is fired"""
+        while True:
+            yield self.wait()
+
+    def pace(self, iterable):
+        """Yields the items of an iterable, one per tick
+
+        :param iterable: The items to yield
+        """
+        for item in iterable:
+            self.wait()
+            yield item
+
+    def reset(self, start=None):
+        """Restarts the schedule (from the given time, or else from the next call to :meth:`wait`),
+        and clears the statistics
+
+        :param start: (Optional) The time (according to :attr:`clock`) of the first tick
+        :type start: float
+        """
+        self.start = start
+        self.ticks = 0
+        self.missed = 0
+        self.lag.reset()
+        self._next_index = 0
+
+    @property
+    def clock(self):
+        """The clock against which ticks are scheduled"""
+        return self._waiter.clock
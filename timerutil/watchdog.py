@@ -0,0 +1,236 @@
+"""Provides a watchdog thread which logs where stalled blocks are stuck, by capturing the stack of the thread
+running them.
+
+A :class:`~timerutil.timeouts.TimeoutManager` (or :class:`~timerutil.waits.StopWatch`) given a watchdog registers
+each block it runs. Once a block has used a warning fraction of its budget, the watchdog logs a snapshot of the
+owning thread's stack; when the budget expires, the stack at expiry is logged and attached to the
+:exc:`TimeoutError` (as its ``stack`` attribute, and as a note where exceptions support them):
+    .. code-block:: python
+
+        @TimeoutManager(30, watchdog=True)
+        def handle_job(job):
+            ...
+
+Registering a block only stores a record in a dictionary (which is atomic in CPython), so the watchdog adds no lock
+acquisition to entering or exiting a block. The watchdog thread polls the registered blocks every ``interval`` seconds,
+so warnings may be logged up to that late, and blocks shorter than the interval may never be seen at all.
+"""
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from timerutil.compat import get_time
+
+__all__ = [
+    'default_watchdog',
+    'Watchdog'
+]
+
+logger = logging.getLogger(__name__)
+
+# The number of seconds after which the default watchdog reports a block without a budget
+DEFAULT_STALL_THRESHOLD = 60
+
+
+def _format_stack(frame):
+    """Formats the stack ending at the given frame, outermost first"""
+    return ''.join(traceback.format_stack(frame))
+
+
+class _WatchedBlock(object):
+    """A single block which is registered with a :class:`Watchdog`"""
+    __slots__ = ('name', 'thread_id', 'started', 'expires_at', 'warned', 'expiry_stack', 'expiry_logged')
+
+    def __init__(self, name, budget):
+        self.name = name
+        self.thread_id = threading.get_ident()
+        self.started = get_time()
+        self.expires_at = None if budget is None else self.started + budget
+        self.warned = False
+        # The formatted stack of the owning thread when the budget expired
+        self.expiry_stack = None
+        self.expiry_logged = False
+
+    def capture(self, frame=None):
+        """Records the stack of the owning thread as its stack at expiry (unless that has already been recorded)
+
+        :param frame: (Optional) The owning thread's current frame, if known (e.g. within a signal handler).
+            By default, the frame is looked up with :func:`sys._current_frames`.
+        """
+        if self.expiry_stack is None:
+            if frame is None:
+                frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.expiry_stack = _format_stack(frame)
+
+
+class Watchdog(object):
+    """Watches registered blocks from a daemon thread, logging the stack of the thread running a block once it has
+    used ``warning_fraction`` of its budget, and again when the budget expires.
+
+    Blocks without a budget (e.g. those of a :class:`~timerutil.waits.StopWatch`) are only reported once they
+    have been running for ``stall_threshold`` seconds, if a threshold is given.
+
+    Usage:
+        .. code-block:: python
+
+            watchdog = Watchdog(interval=.5, warning_fraction=.5, stall_threshold=10)
+
+            with TimeoutManager(60, watchdog=watchdog):
+                ...
+
+            with StopWatch(name='nightly-export', watchdog=watchdog):
+                ...
+
+    :ivar interval: The number of seconds between polls of the registered blocks
+    :vartype interval: float
+    :ivar warning_fraction: The fraction of its budget after which a block's stack is logged
+    :vartype warning_fraction: float
+    :ivar stall_threshold: The number of seconds after which the stack of a block without a budget is logged,
+        or ``None`` if such blocks are never reported
+    :vartype stall_threshold: float
+    """
+
+    def __init__(self, interval=.1, warning_fraction=.8, stall_threshold=None, logger=logger):
+        """Initializes a Watchdog. Its thread is started once the first block is registered.
+
+        :param interval: (Optional) The number of seconds between polls of the registered blocks. Defaults to 0.1.
+        :type interval: float
+        :param warning_fraction: (Optional) The fraction of its budget after which a block's stack is logged.
+            Defaults to 0.8.
+        :type warning_fraction: float
+        :param stall_threshold: (Optional) The number of seconds after which the stack of a block without a budget
+            is logged. By default, such blocks are never reported.
+        :type stall_threshold: float
+        :param logger: (Optional) The logger to which stacks are logged. Defaults to this module's logger.
+        :type logger: logging.Logger
+        """
+        if interval <= 0:
+            raise ValueError('interval must be greater than 0')
+        if not 0 < warning_fraction <= 1:
+            raise ValueError('warning_fraction must be within (0, 1]')
+
+        self.interval = interval
+        self.warning_fraction = warning_fraction
+        self.stall_threshold = stall_threshold
+        self.logger = logger
+        self._blocks = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<{name}: {count} blocks>'.format(name=self.__class__.__name__, count=len(self))
+
+    def __len__(self):
+        """The number of blocks currently registered"""
+        return len(self._blocks)
+
+    def watch(self, name, budget=None):
+        """Registers a block which the current thread is about to run
+
+        :param name: The name of the block, as logged
+        :type name: str
+        :param budget: (Optional) The number of seconds after which the block expires. By default, the block
+            has no budget.
+        :type budget: int, float
+        :return: A handle, to be passed to :meth:`unwatch` once the block exits
+        """
+        if self._thread is None:
+            self._start()
+
+        block = _WatchedBlock(name, budget)
+        self._blocks[id(block)] = block
+        return block
+
+    def unwatch(self, block, exception=None, tb=None):
+        """Removes a block which has exited, logging its stack at expiry if the watchdog has not done so already
+
+        :param block: The handle returned by :meth:`watch`
+        :param exception: (Optional) The exception raised because the block expired, to which the stack at expiry
+            is attached (as its ``stack`` attribute, and as a note where exceptions support them)
+        :type exception: BaseException
+        :param tb: (Optional) The traceback of that exception, which stands in for the stack at expiry
+            if no stack was captured when the block expired
+        :type tb: types.TracebackType
+        """
+        self._blocks.pop(id(block), None)
+        if exception is not None:
+            if block.expiry_stack is None and tb is not None:
+                block.expiry_stack = ''.join(traceback.format_tb(tb))
+            if block.expiry_stack is not None:
+                exception.stack = block.expiry_stack
+                if hasattr(exception, 'add_note'):
+                    exception.add_note('Stack when {} expired:\n{}'.format(block.name, block.expiry_stack.rstrip()))
+
+        if block.expiry_stack is not None and not block.expiry_logged:
+            self._log_expiry(block)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='timerutil-watchdog')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _run(self):
+        """The main loop of the watchdog thread"""
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception:
+                self.logger.exception('Unhandled exception in %r', self)
+
+    def check(self, now=None):
+        """Logs the stack of every registered block which has passed its warning point (or expired) since the last
+        check. This is called by the watchdog thread, but may also be called directly.
+
+        :param now: (Optional) The current time (as returned by :func:`~timerutil.compat.get_time`)
+        :type now: float
+        """
+        now = get_time() if now is None else now
+        frames = None
+
+        for block in self._blocks.copy().values():
+            if block.expires_at is None:
+                if self.stall_threshold is None or block.warned or now - block.started < self.stall_threshold:
+                    continue
+            elif now >= block.expires_at:
+                if not block.expiry_logged:
+                    block.capture()
+                    self._log_expiry(block)
+                continue
+            elif block.warned or now - block.started < (block.expires_at - block.started) * self.warning_fraction:
+                continue
+
+            block.warned = True
+            if frames is None:
+                frames = sys._current_frames()
+            frame = frames.get(block.thread_id)
+            if frame is not None:
+                self._log_warning(block, now, _format_stack(frame))
+
+    def _log_warning(self, block, now, stack):
+        if block.expires_at is None:
+            self.logger.warning(
+                '%s has been running for %.3f seconds (thread %s):\n%s',
+                block.name, now - block.started, block.thread_id, stack
+            )
+        else:
+            self.logger.warning(
+                '%s has used %.3f of its %.3f seconds (thread %s):\n%s',
+                block.name, now - block.started, block.expires_at - block.started, block.thread_id, stack
+            )
+
+    def _log_expiry(self, block):
+        block.expiry_logged = True
+        self.logger.error(
+            '%s expired after %.3f seconds (thread %s):\n%s',
+            block.name, block.expires_at - block.started, block.thread_id, block.expiry_stack
+        )
+
+
+# The process-wide watchdog, used by `TimeoutManager(watchdog=True)` and `StopWatch(watchdog=True)`
+default_watchdog = Watchdog(stall_threshold=DEFAULT_STALL_THRESHOLD)